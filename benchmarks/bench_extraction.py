@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+正文提取吞吐量基准：比较 inline / thread / process 三种提取方式在不同工作数量下的页面/秒
+
+用法:
+    python benchmarks/bench_extraction.py --pages 64 --paragraphs 400 --output extraction.json
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import platform
+
+from local_web_search.extraction import configure_extraction, extract_html, get_extraction_executor, shutdown_extraction
+
+
+def make_article(index: int, paragraphs: int) -> str:
+    """生成一个带导航、广告和长正文的文章页面"""
+    body = "\n".join(
+        f"<p>Paragraph {i} of article {index}. " + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8
+        + f'<a href="https://example.com/{index}/{i}">link {i}</a></p>'
+        for i in range(paragraphs)
+    )
+    return f"""<!DOCTYPE html>
+<html><head><title>Article {index}</title></head>
+<body>
+<nav>{"".join(f'<a href="/nav/{i}">Nav {i}</a>' for i in range(50))}</nav>
+<div class="ads">Buy now!</div>
+<article><h1>Article {index}</h1>{body}</article>
+<footer>{"".join(f'<a href="/footer/{i}">Footer {i}</a>' for i in range(50))}</footer>
+</body></html>"""
+
+
+async def run_case(pages, mode: str, workers: int) -> dict:
+    configure_extraction(mode=mode, workers=workers)
+    try:
+        executor = get_extraction_executor()
+        if executor is not None:
+            # 预热：启动所有工作进程并完成依赖导入，不计入测量时间
+            await asyncio.gather(*[extract_html(pages[0]) for _ in range(workers)])
+
+        started = time.perf_counter()
+        await asyncio.gather(*[extract_html(page) for page in pages])
+        elapsed = time.perf_counter() - started
+    finally:
+        shutdown_extraction()
+    return {
+        "mode": mode,
+        "workers": workers,
+        "pages": len(pages),
+        "seconds": round(elapsed, 4),
+        "pages_per_sec": round(len(pages) / elapsed, 2)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="正文提取吞吐量基准")
+    parser.add_argument("--pages", type=int, default=64, help="提取的页面数量")
+    parser.add_argument("--paragraphs", type=int, default=400, help="每个页面的段落数")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="测试的最大工作数量")
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    pages = [make_article(i, args.paragraphs) for i in range(args.pages)]
+    worker_counts = sorted({1, 2, 4, 8, args.max_workers} & set(range(1, args.max_workers + 1)))
+
+    results = [await run_case(pages, "inline", 1)]
+    for mode in ["thread", "process"]:
+        for workers in worker_counts:
+            results.append(await run_case(pages, mode, workers))
+
+    for result in results:
+        print(f"{result['mode']:8} workers={result['workers']:<3} {result['pages_per_sec']:>8} pages/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "extraction",
+                "cpu_count": os.cpu_count(),
+                "python": platform.python_version(),
+                "page_bytes": len(pages[0]),
+                "results": results
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
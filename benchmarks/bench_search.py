@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+离线端到端基准：用本地服务器代替搜索引擎和结果网站，测量 search() 的延迟分位数、
+不同 concurrency 下的页面/秒以及各阶段耗时，结果写入JSON文件以便在不同提交之间比较
+
+用法:
+    python benchmarks/bench_search.py --queries 20 --concurrency 1,5,10 --output bench.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+import urllib.request
+from typing import Any, Dict, List
+
+from fixture_server import FixtureServer, DEFAULT_MIX
+
+from local_web_search.local_web_search import (
+    launch_browser, search, get_search_url, _search_page, _visit_link_with_retry
+)
+from local_web_search.extraction import configure_extraction, parse_html, shutdown_extraction
+from local_web_search.scheduler import HostScheduler
+from local_web_search.metrics import get_metrics, stage_summary
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """返回 p50/p90/p99/最大值/平均值（最近秩法）"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+    return {
+        "p50": round(pick(50), 4),
+        "p90": round(pick(90), 4),
+        "p99": round(pick(99), 4),
+        "max": round(ordered[-1], 4),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "count": len(ordered)
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def measure_stages(browser, server: FixtureServer, engine: str, repeats: int) -> Dict[str, Any]:
+    """分别测量搜索页、各类结果页访问和正文提取的耗时"""
+    stages: Dict[str, List[float]] = {"serp": []}
+    for i in range(repeats):
+        url = get_search_url(f"stage query {i}", engine=engine)
+        started = time.perf_counter()
+        await browser["with_page"](lambda page: _search_page(page, url, engine=engine))
+        stages["serp"].append(time.perf_counter() - started)
+
+    for kind in sorted(set(DEFAULT_MIX)):
+        key = f"visit_{kind}"
+        stages[key] = []
+        for i in range(repeats):
+            url = f"{server.base_url}/{kind}/stage-{i}"
+            started = time.perf_counter()
+            try:
+                await browser["with_page"](lambda page: _visit_link_with_retry(page, url, max_retries=1))
+            except Exception:
+                pass
+            stages[key].append(time.perf_counter() - started)
+
+    html = urllib.request.urlopen(f"{server.base_url}/article/extract").read().decode("utf-8")
+    stages["extract_article"] = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        parse_html(html)
+        stages["extract_article"].append(time.perf_counter() - started)
+
+    return {name: percentiles(values) for name, values in stages.items()}
+
+
+async def run_concurrency(browser, queries: List[str], concurrency: int, args) -> Dict[str, Any]:
+    """依次执行所有查询，统计端到端延迟、整体页面/秒和流水线内部各阶段的耗时"""
+    get_metrics().reset()
+    latencies = []
+    pages = 0
+    started = time.perf_counter()
+    for query in queries:
+        query_started = time.perf_counter()
+        results = await search(
+            browser=browser,
+            query=query,
+            max_results=args.max_results,
+            concurrency=concurrency,
+            fetch_mode=args.fetch_mode,
+            engine=args.engine,
+            # 所有结果页都在同一个本地主机上，放开按主机的限制
+            host_scheduler=HostScheduler(max_per_host=1000, host_overrides={}),
+            time_budget=args.time_budget
+        )
+        latencies.append(time.perf_counter() - query_started)
+        pages += len(results["results"])
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "queries": len(queries),
+        "pages": pages,
+        "seconds": round(elapsed, 4),
+        "pages_per_sec": round(pages / elapsed, 3) if elapsed else 0.0,
+        "latency": percentiles(latencies),
+        "pipeline_stages": stage_summary(),
+        "failures": dict(get_metrics().failures),
+        "retries": dict(get_metrics().retries)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="离线端到端搜索基准")
+    parser.add_argument("--queries", type=int, default=10, help="每个并发度执行的查询数量")
+    parser.add_argument("--concurrency", default="1,2,5,10", help="逗号分隔的并发度列表")
+    parser.add_argument("--max-results", type=int, default=10, help="每个查询的结果数量")
+    parser.add_argument("--engine", default="google", choices=["google", "bing", "duckduckgo"])
+    parser.add_argument("--fetch-mode", default="browser", choices=["browser", "http", "auto"])
+    parser.add_argument("--time-budget", type=float, help="每个查询的时间预算（秒）")
+    parser.add_argument("--stage-repeats", type=int, default=5, help="各阶段单独测量的重复次数")
+    parser.add_argument("--slow-delay", type=float, default=3.0, help="慢页面的响应延迟（秒）")
+    parser.add_argument("--serp-padding", type=int, default=0, help="搜索结果页中无关 div 的数量")
+    parser.add_argument("--extract-mode", default="process", choices=["process", "thread", "inline"])
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    concurrency_levels = [int(value) for value in args.concurrency.split(",") if value.strip()]
+    queries = [f"benchmark query {i}" for i in range(args.queries)]
+
+    configure_extraction(mode=args.extract_mode)
+    with FixtureServer(serp_padding=args.serp_padding, slow_delay=args.slow_delay) as server:
+        os.environ["LOCAL_WEB_SEARCH_BASE_URL"] = server.base_url
+
+        launch_started = time.perf_counter()
+        browser = await launch_browser(show=False)
+        launch_seconds = time.perf_counter() - launch_started
+        try:
+            stages = await measure_stages(browser, server, args.engine, args.stage_repeats)
+            runs = [await run_concurrency(browser, queries, level, args) for level in concurrency_levels]
+            page_pool = browser["page_stats"]()
+        finally:
+            await browser["close"]()
+            shutdown_extraction()
+
+    report = {
+        "benchmark": "search",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "browser_launch_seconds": round(launch_seconds, 4),
+        "stages": stages,
+        "page_pool": page_pool,
+        "runs": runs
+    }
+
+    for run in runs:
+        latency = run["latency"]
+        print(f"concurrency={run['concurrency']:<3} {run['pages_per_sec']:>7} pages/s  "
+              f"p50={latency['p50']}s p90={latency['p90']}s p99={latency['p99']}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Google 搜索结果页链接提取基准：比较原来逐个扫描 div 的脚本和只遍历结果锚点的脚本
+
+两个脚本在同一个页面上运行，先检查结果一致，再比较耗时。默认使用 fixture_server
+生成的搜索结果页（--padding 控制与结果无关的 div 数量），也可以用 --fixture 传入保存的真实页面。
+
+用法:
+    python benchmarks/bench_serp_links.py --results 10,100 --padding 0,2000,10000 --output serp_links.json
+    python benchmarks/bench_serp_links.py --fixture saved_serp.html
+"""
+
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, Tuple
+
+from fixture_server import DEFAULT_MIX, render_google, result_links
+
+from local_web_search.local_web_search import launch_browser
+from local_web_search.engines import GOOGLE_LINKS_SCRIPT
+
+# 改写之前的提取脚本（原样保留，用于比较）
+LEGACY_GOOGLE_LINKS_SCRIPT = """
+    () => {
+        const links = [];
+        const document = window.document;
+
+        const isValidUrl = (url) => {
+            // Basic check, can be improved
+            return url && (url.startsWith('http://') || url.startsWith('https://'));
+        };
+
+        try {
+            // Try selecting result blocks more generally. Google often uses divs directly under #search or #rso.
+            // Let's try finding divs that contain both an h3 and an a[href].
+            const resultsContainer = document.querySelector('#search') || document.querySelector('#rso') || document.body; // Fallback to body
+            const candidates = Array.from(resultsContainer.querySelectorAll('div')); // Consider direct children or more specific divs if needed
+
+            candidates.forEach(element => {
+                // Find the first link and h3 within this div. Be mindful that structure might vary.
+                const linkElement = element.querySelector('a[href]');
+                const titleElement = element.querySelector('h3');
+
+                if (linkElement && titleElement) {
+                    const url = linkElement.getAttribute('href');
+                    const title = titleElement.textContent || "";
+
+                    // Further checks: ensure it's a plausible result link
+                    // Avoid internal links, related searches, fragments etc.
+                    if (url && isValidUrl(url) && title && url.startsWith('http') && !url.includes('google.com/') && !url.startsWith('#')) {
+
+                        // Check if we've already added a very similar URL (e.g., http vs https, slight param diffs)
+                        let urlObj;
+                        try {
+                            urlObj = new URL(url);
+                        } catch (e) {
+                            // If URL is invalid, skip
+                            console.error(`Invalid URL encountered: ${url}`);
+                            return;
+                        }
+                        const simplifiedUrl = urlObj.hostname + urlObj.pathname;
+                        const alreadyExists = links.some(l => {
+                            try {
+                                const existingUrlObj = new URL(l.url);
+                                return (existingUrlObj.hostname + existingUrlObj.pathname) === simplifiedUrl;
+                            } catch { return false; } // Ignore errors comparing potentially invalid existing URLs
+                        });
+
+                        if (!alreadyExists) {
+                            links.push({ title: title.trim(), url: url });
+                        }
+                    }
+                }
+            });
+
+            // Fallback if the general approach yields no results
+            if (links.length === 0) {
+                 console.log("Primary selector logic failed, trying fallback class selectors...");
+                 // Example fallback selectors (these WILL change frequently and need updates)
+                 // Combine common older and newer patterns observed over time. Inspect page source for current ones.
+                 document.querySelectorAll('div.g, div.Gx5Zad, div.DhN8Cf, div.tF2Cxc, [data-hveid]').forEach(element => { // Added [data-hveid] as another potential container attribute
+                     const linkElement = element.querySelector('a[href]');
+                     const titleElement = element.querySelector('h3');
+
+                     if (linkElement && titleElement) {
+                         const url = linkElement.getAttribute('href');
+                         const title = titleElement.textContent || "";
+                         if (url && isValidUrl(url) && title && url.startsWith('http') && !url.includes('google.com/') && !url.startsWith('#')) {
+                             let urlObj;
+                             try {
+                                 urlObj = new URL(url);
+                             } catch (e) {
+                                 console.error(`Invalid URL encountered in fallback: ${url}`);
+                                 return;
+                             }
+                             const simplifiedUrl = urlObj.hostname + urlObj.pathname;
+                             const alreadyExists = links.some(l => {
+                                try {
+                                    const existingUrlObj = new URL(l.url);
+                                    return (existingUrlObj.hostname + existingUrlObj.pathname) === simplifiedUrl;
+                                } catch { return false; }
+                             });
+                             if (!alreadyExists) {
+                                 links.push({ title: title.trim(), url: url });
+                             }
+                         }
+                     }
+                 });
+            }
+
+        } catch (error) {
+            console.error('Error extracting links:', error);
+        }
+
+        // Limit the number of results explicitly here if needed, although search URL param 'num' should handle it.
+        // return links.slice(0, 10); // Example limit if too many irrelevant results are caught
+
+        return links;
+    }
+"""
+
+
+async def time_script(page, script: str, repeats: int) -> Tuple[List[Dict[str, str]], float]:
+    """运行提取脚本 repeats 次，返回结果和每次的平均耗时（秒）"""
+    links = await page.evaluate(script)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        await page.evaluate(script)
+    return links, (time.perf_counter() - started) / repeats
+
+
+async def run_fixture(browser, name: str, html: str, repeats: int) -> Dict[str, Any]:
+    async def measure(page):
+        await page.set_content(html)
+        legacy_links, legacy_seconds = await time_script(page, LEGACY_GOOGLE_LINKS_SCRIPT, repeats)
+        links, seconds = await time_script(page, GOOGLE_LINKS_SCRIPT, repeats)
+        element_count = await page.evaluate("() => document.getElementsByTagName('*').length")
+        return {
+            "fixture": name,
+            "bytes": len(html),
+            "elements": element_count,
+            "links": len(links),
+            "same_results": links == legacy_links,
+            "legacy_ms": round(legacy_seconds * 1000, 3),
+            "linear_ms": round(seconds * 1000, 3),
+            "speedup": round(legacy_seconds / seconds, 2) if seconds else None
+        }
+
+    return await browser["with_page"](measure)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Google 搜索结果页链接提取基准")
+    parser.add_argument("--results", default="10,100", help="逗号分隔的结果数量列表")
+    parser.add_argument("--padding", default="0,2000,10000", help="逗号分隔的无关 div 数量列表")
+    parser.add_argument("--fixture", action="append", default=[], help="保存的搜索结果页HTML文件，可以重复指定")
+    parser.add_argument("--repeats", type=int, default=20, help="每个脚本的重复次数")
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    fixtures = []
+    for path in args.fixture:
+        with open(path, "r", encoding="utf-8") as f:
+            fixtures.append((path, f.read()))
+    if not args.fixture:
+        for count in [int(value) for value in args.results.split(",") if value.strip()]:
+            for padding in [int(value) for value in args.padding.split(",") if value.strip()]:
+                query = f"serp benchmark {count}"
+                links = result_links("https://example.com", query, count, DEFAULT_MIX)
+                # 重复出现的结果应被去重
+                links += links[:count // 10]
+                fixtures.append((f"results={count},padding={padding}", render_google(query, links, padding)))
+
+    browser = await launch_browser(show=False)
+    try:
+        results = [await run_fixture(browser, name, html, args.repeats) for name, html in fixtures]
+    finally:
+        await browser["close"]()
+
+    for result in results:
+        print(f"{result['fixture']:<32} elements={result['elements']:<7} links={result['links']:<4} "
+              f"same={result['same_results']!s:<5} legacy={result['legacy_ms']:>9}ms "
+              f"linear={result['linear_ms']:>8}ms  x{result['speedup']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "serp_links", "repeats": args.repeats, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+启动时间基准：测量导入各模块的耗时（以及导入时加载了哪些重量级依赖），
+和 MCP 服务器从启动进程到完成握手、再到第一次 web_search 返回结果的时间（开启和关闭预热）
+
+用法:
+    python benchmarks/bench_startup.py --repeats 5 --idle 2 --output startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from typing import Any, Dict, List
+
+from fixture_server import FixtureServer
+
+from bench_search import git_commit, percentiles
+
+# 导入后检查这些依赖是否已经加载
+HEAVY_MODULES = ["playwright", "bs4", "readability", "lxml", "html2text", "httpx", "click"]
+
+IMPORT_TARGETS = ["local_web_search.mcp_server", "local_web_search.local_web_search", "local_web_search.cli"]
+
+IMPORT_SCRIPT = """
+import sys, json, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+SERVER_SCRIPT = """
+import os
+os.chdir({cwd!r})
+from local_web_search.mcp_server import main
+main()
+"""
+
+
+def measure_import(module: str, repeats: int) -> Dict[str, Any]:
+    """在新的解释器中导入模块，返回耗时分位数和导入时加载的重量级依赖"""
+    times, loaded = [], []
+    for _ in range(repeats):
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)], text=True
+        )
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result["seconds"])
+        loaded = result["loaded"]
+    return {"seconds": percentiles(times), "heavy_modules_loaded": loaded}
+
+
+async def measure_first_result(server: FixtureServer, prewarm: bool, idle: float, max_results: int) -> Dict[str, float]:
+    """启动 MCP 服务器，测量握手完成和第一次 web_search 返回的时间
+
+    idle: 握手后等待多久再发起搜索，模拟客户端在第一次调用工具之前的空闲时间
+    """
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    with tempfile.TemporaryDirectory() as cwd:
+        # 关闭缓存和本地索引，每次都是真正的冷启动
+        config = {"prewarm": prewarm, "contentCache": False, "serpCache": False, "pageIndex": False}
+        with open(os.path.join(cwd, "local-web-search.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        params = StdioServerParameters(
+            command=sys.executable,
+            args=["-c", SERVER_SCRIPT.format(cwd=cwd)],
+            env={**os.environ, "LOCAL_WEB_SEARCH_BASE_URL": server.base_url}
+        )
+        started = time.perf_counter()
+        async with stdio_client(params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                initialized = time.perf_counter()
+                await asyncio.sleep(idle)
+                search_started = time.perf_counter()
+                await session.call_tool("web_search", {"query": "startup benchmark", "max_results": max_results})
+                finished = time.perf_counter()
+    return {
+        "initialize": initialized - started,
+        "first_search": finished - search_started,
+        "time_to_first_result": finished - started - idle
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="导入时间和首次搜索时间基准")
+    parser.add_argument("--repeats", type=int, default=5, help="每项测量的重复次数")
+    parser.add_argument("--idle", type=float, default=2.0, help="握手后等待多久再发起第一次搜索（秒）")
+    parser.add_argument("--max-results", type=int, default=3, help="第一次搜索的结果数量")
+    parser.add_argument("--skip-server", action="store_true", help="只测量导入时间")
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    imports = {module: measure_import(module, args.repeats) for module in IMPORT_TARGETS}
+
+    servers: Dict[str, Any] = {}
+    if not args.skip_server:
+        with FixtureServer() as server:
+            for prewarm in (False, True):
+                runs: List[Dict[str, float]] = [
+                    await measure_first_result(server, prewarm, args.idle, args.max_results)
+                    for _ in range(args.repeats)
+                ]
+                servers["prewarm" if prewarm else "cold"] = {
+                    key: percentiles([run[key] for run in runs]) for key in runs[0]
+                }
+
+    report = {
+        "benchmark": "startup",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "imports": imports,
+        "server": servers
+    }
+
+    for module, result in imports.items():
+        print(f"import {module:<36} p50={result['seconds']['p50']}s  heavy={result['heavy_modules_loaded']}")
+    for mode, result in servers.items():
+        print(f"{mode:<8} initialize p50={result['initialize']['p50']}s  "
+              f"first_search p50={result['first_search']['p50']}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+基准测试用的本地HTTP服务器：代替搜索引擎和结果网站
+
+- /search?...&udm=14    Google 结构的搜索结果页
+- /search?...&count=N   Bing 结构的搜索结果页
+- /html/?q=...          DuckDuckGo（静态版）结构的搜索结果页
+- /article/<slug>       普通文章
+- /slow/<slug>          延迟 SLOW_DELAY 秒返回的文章
+- /huge/<slug>          约 HUGE_BYTES 字节的超大文章
+- /js/<slug>            正文由页面内联脚本渲染的单页应用
+- /fail/<slug>          返回 500
+- /throttle/<slug>      返回 429 和 Retry-After
+
+搜索结果页的结构按照真实页面的标记整理，结果链接在各类页面之间按固定比例分配，
+同一个查询总是得到相同的结果，便于在不同提交之间比较。
+
+单独运行时在前台启动服务器:
+    python benchmarks/fixture_server.py --port 8765
+"""
+
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlparse
+
+SLOW_DELAY = 3.0
+HUGE_BYTES = 4 * 1024 * 1024
+JS_RENDER_DELAY_MS = 300
+
+# 默认每 10 个结果中各类页面的数量
+DEFAULT_MIX = ["article"] * 6 + ["slow", "huge", "js", "fail"]
+
+LOREM = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt "
+         "ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation. ")
+
+
+# 正文用的词表：由音节拼成的几百个词，各页面的正文按标题随机生成，互相不构成近似重复
+_SYLLABLES = ["ka", "lo", "mi", "ru", "sen", "ta", "vo", "pe", "dri", "nu", "ol", "ex", "zan", "qui", "bor", "fe",
+              "gal", "hi", "jun", "wes"]
+VOCABULARY = [a + b for a in _SYLLABLES for b in _SYLLABLES]
+
+# 每个页面生成的不同段落数，更长的页面循环使用这些段落
+DISTINCT_PARAGRAPHS = 30
+PARAGRAPH_WORDS = 80
+
+
+def _query_seed(query: str) -> int:
+    return zlib.crc32(query.encode("utf-8"))
+
+
+def page_paragraphs(title: str, count: int) -> List[str]:
+    """为页面生成确定的段落，同一个标题总是得到相同的正文，不同标题的正文互不重复"""
+    rng = random.Random(_query_seed(title))
+    distinct = [
+        " ".join(rng.choices(VOCABULARY, k=PARAGRAPH_WORDS)).capitalize() + "."
+        for _ in range(min(count, DISTINCT_PARAGRAPHS))
+    ]
+    return [distinct[i % len(distinct)] for i in range(count)]
+
+
+def result_links(base_url: str, query: str, count: int, mix: List[str],
+                 offset: int = 0) -> List[Tuple[str, str, str]]:
+    """为查询生成确定的 (标题, URL, 摘要) 列表，offset 为翻页时跳过的结果数"""
+    seed = _query_seed(query)
+    slug = quote("-".join(query.lower().split())[:40] or "q")
+    links = []
+    for i in range(offset, offset + count):
+        kind = mix[(seed + i) % len(mix)]
+        url = f"{base_url}/{kind}/{slug}-{seed % 1000}-{i}"
+        links.append((f"{query} result {i} ({kind})", url, f"Snippet {i} for {query}. " + LOREM[:120]))
+    return links
+
+
+def render_google(query: str, links, padding: int = 0) -> str:
+    blocks = "".join(f"""
+<div class="g"><div class="tF2Cxc" data-hveid="CA{i}QAA"><div class="yuRUbf"><div><span>
+<a href="{escape(url)}" data-ved="2ahUKE{i}"><h3 class="LC20lb MBeuO DKV0Md">{escape(title)}</h3>
+<div class="notranslate"><cite class="tjvcx">{escape(url)}</cite></div></a></span></div></div>
+<div class="VwiC3b yXK7lf"><span>{escape(snippet)}</span></div></div></div>""" for i, (title, url, snippet) in enumerate(links))
+    # 真实的搜索结果页里有大量与结果无关的嵌套 div
+    filler = "".join(
+        f'<div class="MjjYud"><div jscontroller="SC7lYd" data-rpos="{i}"><div><div><span>related {i}</span></div></div></div></div>'
+        for i in range(padding)
+    )
+    return f"""<!DOCTYPE html><html><head><title>{escape(query)} - Google Search</title></head>
+<body><div id="main"><div id="cnt"><div id="rcnt"><div id="center_col"><div id="res"><div id="search">
+<div><div id="rso">{blocks}{filler}</div></div></div></div></div></div></div></div>
+<div id="footcnt"><a href="https://www.google.com/preferences">Settings</a></div></body></html>"""
+
+
+def render_bing(query: str, links, padding: int = 0) -> str:
+    blocks = "".join(f"""
+<li class="b_algo" data-id="{i}"><h2><a href="{escape(url)}" h="ID=SERP,{5000 + i}.1">{escape(title)}</a></h2>
+<div class="b_caption"><div class="b_attribution"><cite>{escape(url)}</cite></div><p class="b_lineclamp2">{escape(snippet)}</p></div></li>"""
+                     for i, (title, url, snippet) in enumerate(links))
+    filler = "".join(f'<li class="b_ans"><div><div>related {i}</div></div></li>' for i in range(padding))
+    return f"""<!DOCTYPE html><html><head><title>{escape(query)} - Search</title></head>
+<body><div id="b_content"><main aria-label="Search Results"><ol id="b_results">{blocks}{filler}</ol></main></div></body></html>"""
+
+
+def render_duckduckgo(query: str, links, padding: int = 0) -> str:
+    blocks = "".join(f"""
+<div class="result results_links results_links_deep web-result"><div class="links_main links_deep result__body">
+<h2 class="result__title"><a rel="nofollow" class="result__a" href="//duckduckgo.com/l/?uddg={quote(url, safe='')}&amp;rut=x{i}">{escape(title)}</a></h2>
+<a class="result__snippet" href="//duckduckgo.com/l/?uddg={quote(url, safe='')}">{escape(snippet)}</a></div></div>"""
+                     for i, (title, url, snippet) in enumerate(links))
+    filler = "".join(f'<div class="result--more"><div>related {i}</div></div>' for i in range(padding))
+    return f"""<!DOCTYPE html><html><head><title>{escape(query)} at DuckDuckGo</title></head>
+<body><div id="links" class="results">{blocks}{filler}</div></body></html>"""
+
+
+def render_article(title: str, paragraphs: int = 30) -> str:
+    body = "".join(f"<p>Paragraph {i}. {text}</p>" for i, text in enumerate(page_paragraphs(title, paragraphs)))
+    return f"""<!DOCTYPE html><html><head><title>{escape(title)}</title></head>
+<body><nav>{"".join(f'<a href="/nav/{i}">Section {i}</a>' for i in range(20))}</nav>
+<div class="ads">Sponsored</div>
+<article><h1>{escape(title)}</h1>{body}</article>
+<footer>Footer links</footer></body></html>"""
+
+
+def render_js_app(title: str, paragraphs: int = 20) -> str:
+    return f"""<!DOCTYPE html><html><head><title>{escape(title)}</title></head>
+<body><noscript>You need to enable JavaScript to run this app.</noscript><div id="root"></div>
+<script>
+setTimeout(() => {{
+    const article = document.createElement('article');
+    article.innerHTML = '<h1>{escape(title)}</h1>' + {json.dumps(page_paragraphs(title, paragraphs))}.map((text, i) =>
+        '<p>Rendered paragraph ' + i + '. ' + text + '</p>').join('');
+    document.getElementById('root').appendChild(article);
+}}, {JS_RENDER_DELAY_MS});
+</script></body></html>"""
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    server_version = "FixtureServer/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: str, headers: Optional[dict] = None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        server = self.server
+        server.requests += 1
+
+        if parsed.path in ("/search", "/html", "/html/"):
+            query = params.get("q", "")
+            if parsed.path.startswith("/html"):
+                renderer, count = render_duckduckgo, server.default_results
+                offset = int(params.get("s", 0))
+            elif "udm" in params:
+                renderer, count = render_google, int(params.get("num", server.default_results))
+                offset = int(params.get("start", 0))
+            else:
+                renderer, count = render_bing, int(params.get("count", server.default_results))
+                offset = int(params.get("first", 1)) - 1
+            links = result_links(server.base_url, query, count, server.mix, offset)
+            return self._send(200, renderer(query, links, server.serp_padding))
+
+        parts = parsed.path.strip("/").split("/", 1)
+        kind, slug = (parts + [""])[:2]
+        title = f"Fixture {kind} {slug}"
+        if kind == "article":
+            return self._send(200, render_article(title))
+        if kind == "slow":
+            time.sleep(server.slow_delay)
+            return self._send(200, render_article(title))
+        if kind == "huge":
+            return self._send(200, render_article(title, paragraphs=max(1, HUGE_BYTES // (PARAGRAPH_WORDS * 6))))
+        if kind == "js":
+            return self._send(200, render_js_app(title))
+        if kind == "fail":
+            return self._send(500, "<html><body>Internal Server Error</body></html>")
+        if kind == "throttle":
+            return self._send(429, "<html><body>Too Many Requests</body></html>", {"Retry-After": "1"})
+        return self._send(404, "<html><body>Not Found</body></html>")
+
+
+class FixtureServer:
+    """在后台线程中运行的本地基准服务器"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, mix: Optional[List[str]] = None,
+                 default_results: int = 10, serp_padding: int = 0, slow_delay: float = SLOW_DELAY):
+        self.httpd = ThreadingHTTPServer((host, port), FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.httpd.mix = mix or DEFAULT_MIX
+        self.httpd.default_results = default_results
+        self.httpd.serp_padding = serp_padding
+        self.httpd.slow_delay = slow_delay
+        self.httpd.requests = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return self.httpd.base_url
+
+    @property
+    def requests(self) -> int:
+        return self.httpd.requests
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="基准测试用的本地HTTP服务器")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serp-padding", type=int, default=0, help="搜索结果页中无关 div 的数量")
+    args = parser.parse_args()
+    server = FixtureServer(port=args.port, serp_padding=args.serp_padding)
+    print(f"serving on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -2,8 +2,14 @@
 本地网页搜索工具包
 """
 
-from .mcp_server import web_search
-
 __version__ = "0.1.0"
 
-__all__ = ["web_search"] 
\ No newline at end of file
+__all__ = ["web_search"]
+
+
+def __getattr__(name):
+    # MCP 服务器（以及 FastMCP）只在用到时导入，导入包内其他模块不会加载服务器
+    if name == "web_search":
+        from .mcp_server import web_search
+        return web_search
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,327 @@
+"""
+浏览器池：长期持有浏览器上下文，避免每次搜索都冷启动浏览器
+
+每个上下文是一个独立的浏览器进程（分片），页面按未完成页面数最少的原则分配到各个分片，
+并发可以扩展到多个CPU核上。
+"""
+
+import os
+import shutil
+import asyncio
+import logging
+import tempfile
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .local_web_search import launch_browser
+from .memory import browser_memory, process_rss
+
+logger = logging.getLogger(__name__)
+
+
+# 不指定 userDataDir 时各分片的用户数据目录所在的根目录，在多次运行之间保留 cookie 和同意状态
+DEFAULT_USER_DATA_ROOT = os.path.join(tempfile.gettempdir(), "local-web-search-python-pool")
+
+# 用户数据目录被其他浏览器进程占用时，启动失败的错误信息中出现的内容
+PROFILE_LOCK_MARKERS = ("ProcessSingleton", "SingletonLock", "profile appears to be in use",
+                        "user data directory is already in use")
+
+
+def _user_data_dir_in_use(path: str) -> bool:
+    """是否有正在运行的浏览器进程在使用该用户数据目录（检查 Chromium 的单实例锁）"""
+    if os.name == "nt":
+        # Windows 上浏览器运行期间 lockfile 无法删除
+        lockfile = os.path.join(path, "lockfile")
+        if not os.path.exists(lockfile):
+            return False
+        try:
+            os.remove(lockfile)
+        except OSError:
+            return True
+        return False
+    try:
+        # SingletonLock 是指向 "主机名-进程号" 的符号链接，浏览器异常退出后可能残留
+        target = os.readlink(os.path.join(path, "SingletonLock"))
+    except OSError:
+        return False
+    pid = target.rsplit("-", 1)[-1]
+    if not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _is_profile_lock_error(error: BaseException) -> bool:
+    """启动失败是否因为用户数据目录正被其他浏览器进程使用"""
+    message = str(error)
+    return any(marker in message for marker in PROFILE_LOCK_MARKERS)
+
+
+def _shard_user_data_dirs(size: int, user_data_root: Optional[str]) -> List[str]:
+    """各分片的用户数据目录：user_data_root（默认 DEFAULT_USER_DATA_ROOT）下的 0、1、2… 子目录，在多次运行之间保留"""
+    root = user_data_root or DEFAULT_USER_DATA_ROOT
+    return [os.path.join(root, str(i)) for i in range(size)]
+
+
+async def launch_browser_pool(size: int = 1, max_pages_per_context: int = 200,
+                              show: bool = False, proxy: Optional[str] = None,
+                              browser: Optional[str] = None,
+                              profile_path: Optional[str] = None,
+                              user_data_root: Optional[str] = None,
+                              max_context_rss: Optional[int] = None,
+                              rss_check_interval: int = 20,
+                              **page_options) -> Dict[str, Any]:
+    """创建浏览器池并返回与 launch_browser 相同接口的方法
+
+    size 个上下文分别是独立的浏览器进程，各自使用隔离的用户数据目录；
+    每次借用时选择未完成页面最少的上下文。
+    上下文在首次使用时启动；崩溃的上下文会在下次借用时重新启动；
+    每个上下文打开 max_pages_per_context 个页面后会被回收并替换；指定 max_context_rss（字节）时，
+    每 rss_check_interval 个页面检查一次浏览器进程树的常驻内存，超过时同样回收。
+    被替换的上下文还有页面没有结束时，新的上下文改用临时的用户数据目录，不与它争用同一个目录。
+    page_options（page_pool_size、page_max_uses、page_max_lifetime）传给 launch_browser，控制页面复用。
+    """
+    if profile_path and size > 1:
+        # 同一个配置文件目录不能被多个浏览器同时使用
+        logger.warning("profile_path 只能被一个浏览器上下文使用，浏览器池大小调整为 1")
+        size = 1
+    size = max(1, size)
+
+    user_data_dirs = _shard_user_data_dirs(size, user_data_root)
+    # 当前进程独立的临时目录，分片的目录不可用时使用，关闭浏览器池时删除
+    temp_root: Optional[str] = None
+    slots: List[Dict[str, Any]] = [
+        {
+            "index": i,
+            "entry": None,
+            "lock": asyncio.Lock(),
+            "launches": 0,
+            "outstanding": 0,
+            "user_data_dir": user_data_dirs[i],
+            "memory": None
+        }
+        for i in range(size)
+    ]
+    retiring: List[Dict[str, Any]] = []
+    # 后台关闭失效上下文的任务，关闭浏览器池时等待它们结束
+    closing: Set[asyncio.Task] = set()
+    # 仍被本进程的上下文（包括等待关闭的上下文）占用的用户数据目录 -> 占用它的上下文；
+    # 浏览器进程退出前目录上的单实例锁不会释放，同一个目录不能同时启动新的上下文
+    held_dirs: Dict[str, Dict[str, Any]] = {}
+    counters = {"next": 0, "pages": 0, "relaunches": 0, "recycled": 0, "recycled_memory": 0}
+    closed = False
+
+    def _browser_data_dir(slot: Dict[str, Any]) -> str:
+        """浏览器进程实际使用的用户数据目录，用于查找进程统计内存"""
+        if slot["entry"]:
+            return slot["entry"]["user_data_dir"]
+        return os.path.dirname(profile_path) if profile_path else slot["user_data_dir"]
+
+    def _temp_data_dir(slot: Dict[str, Any]) -> str:
+        """当前进程独立的临时用户数据目录，关闭浏览器池时删除"""
+        nonlocal temp_root
+        if temp_root is None:
+            temp_root = tempfile.mkdtemp(prefix=f"local-web-search-{os.getpid()}-")
+        return os.path.join(temp_root, f"{slot['index']}-{slot['launches']}")
+
+    async def _launch_data_dir(slot: Dict[str, Any]) -> Tuple[str, bool]:
+        """为新的上下文选择用户数据目录，返回 (目录, 是否为临时目录)
+
+        分片的目录仍被上一代上下文占用（回收时还有页面没有结束，或崩溃的上下文还没有关闭完），
+        或正被同一台机器上的其他服务器进程使用时，改用临时目录；profile_path 无法换目录，等待上一代上下文关闭。
+        每次启动前都重新检查，其他进程的浏览器池也是在首次使用时才启动各个分片。
+        """
+        if profile_path:
+            data_dir = os.path.dirname(profile_path)
+            previous = held_dirs.get(data_dir)
+            if previous is not None:
+                await previous["closed"].wait()
+            return data_dir, False
+        if slot["user_data_dir"] in held_dirs:
+            return _temp_data_dir(slot), True
+        if await asyncio.to_thread(_user_data_dir_in_use, slot["user_data_dir"]):
+            logger.info(f"用户数据目录 {slot['user_data_dir']} 正被其他浏览器进程使用，改用临时目录")
+            return _temp_data_dir(slot), True
+        return slot["user_data_dir"], False
+
+    async def _close_entry(entry: Dict[str, Any]):
+        """关闭一个上下文，忽略已经崩溃的上下文抛出的错误；关闭后释放它的用户数据目录"""
+        try:
+            await entry["browser"]["close"]()
+        except Exception as e:
+            logger.debug(f"关闭浏览器上下文失败: {str(e)}")
+        finally:
+            if held_dirs.get(entry["user_data_dir"]) is entry:
+                del held_dirs[entry["user_data_dir"]]
+            if entry["temporary"]:
+                shutil.rmtree(entry["user_data_dir"], ignore_errors=True)
+            entry["closed"].set()
+
+    async def _acquire(slot: Dict[str, Any]) -> Dict[str, Any]:
+        """获取槽位中可用的上下文，必要时启动或重新启动"""
+        async with slot["lock"]:
+            entry = slot["entry"]
+            if entry and not entry["browser"]["is_alive"]():
+                logger.warning(f"浏览器上下文 {slot['index']} 已失效，重新启动")
+                counters["relaunches"] += 1
+                slot["entry"] = None
+                task = asyncio.create_task(_close_entry(entry))
+                closing.add(task)
+                task.add_done_callback(closing.discard)
+                entry = None
+
+            if entry is None:
+                data_dir, temporary = await _launch_data_dir(slot)
+                try:
+                    browser_instance = await launch_browser(
+                        show=show, proxy=proxy, browser=browser,
+                        profile_path=profile_path, user_data_dir=data_dir, **page_options
+                    )
+                except Exception as e:
+                    # 检查之后目录才被其他进程占用时，启动会因单实例锁失败，改用临时目录再启动一次
+                    if profile_path or temporary or not _is_profile_lock_error(e):
+                        raise
+                    logger.warning(f"用户数据目录 {data_dir} 被占用，改用临时目录: {str(e)}")
+                    data_dir, temporary = _temp_data_dir(slot), True
+                    browser_instance = await launch_browser(
+                        show=show, proxy=proxy, browser=browser,
+                        profile_path=profile_path, user_data_dir=data_dir, **page_options
+                    )
+                entry = {"browser": browser_instance, "pages": 0, "active": 0, "retired": False,
+                         "user_data_dir": data_dir, "temporary": temporary, "closed": asyncio.Event()}
+                held_dirs[data_dir] = entry
+                slot["entry"] = entry
+                slot["launches"] += 1
+
+            entry["pages"] += 1
+            entry["active"] += 1
+            if entry["pages"] >= max_pages_per_context:
+                # 达到页面上限，后续请求使用新的上下文；当前上下文在页面全部结束后关闭
+                _retire(slot, entry)
+                counters["recycled"] += 1
+            elif max_context_rss and entry["pages"] % rss_check_interval == 0:
+                # 渲染进程的内存随打开的页面增长，超过上限时同样换用新的上下文
+                slot["memory"] = await asyncio.to_thread(browser_memory, entry["user_data_dir"])
+                if slot["memory"] and slot["memory"]["rss"] >= max_context_rss:
+                    logger.info(f"浏览器上下文 {slot['index']} 占用 {slot['memory']['rss'] / 2**20:.0f} MB，回收")
+                    _retire(slot, entry)
+                    counters["recycled_memory"] += 1
+            return entry
+
+    def _retire(slot: Dict[str, Any], entry: Dict[str, Any]):
+        """不再把新页面分配给该上下文，等已借出的页面全部结束后关闭"""
+        entry["retired"] = True
+        slot["entry"] = None
+        retiring.append(entry)
+
+    async def _release(entry: Dict[str, Any]):
+        entry["active"] -= 1
+        if entry["retired"] and entry["active"] == 0 and entry in retiring:
+            retiring.remove(entry)
+            await _close_entry(entry)
+
+    async def with_page(fn):
+        """从池中借用上下文执行页面函数"""
+        if closed:
+            raise RuntimeError("浏览器池已关闭")
+
+        slot = _pick_slot()
+        slot["outstanding"] += 1
+        counters["pages"] += 1
+
+        try:
+            for attempt in range(2):
+                entry = await _acquire(slot)
+                try:
+                    return await entry["browser"]["with_page"](fn)
+                except Exception:
+                    # 上下文在执行过程中崩溃时，换一个新的上下文重试一次
+                    if attempt == 0 and not entry["browser"]["is_alive"]() and not closed:
+                        logger.warning(f"浏览器上下文 {slot['index']} 在使用中崩溃，重试")
+                        continue
+                    raise
+                finally:
+                    await _release(entry)
+        finally:
+            slot["outstanding"] -= 1
+
+    def _pick_slot() -> Dict[str, Any]:
+        """选择未完成页面最少的分片；数量相同时轮流选择，避免总是压在第一个分片上"""
+        start = counters["next"] % len(slots)
+        counters["next"] += 1
+        ordered = slots[start:] + slots[:start]
+        return min(ordered, key=lambda slot: slot["outstanding"])
+
+    async def warm():
+        """预先启动所有上下文（各分片同时启动）"""
+        async def warm_slot(slot):
+            entry = await _acquire(slot)
+            entry["pages"] -= 1
+            await _release(entry)
+
+        await asyncio.gather(*[warm_slot(slot) for slot in slots])
+
+    async def close():
+        """关闭池中的所有上下文"""
+        nonlocal closed
+        closed = True
+        entries = [slot["entry"] for slot in slots if slot["entry"]] + retiring
+        for slot in slots:
+            slot["entry"] = None
+        retiring.clear()
+        await asyncio.gather(*[_close_entry(entry) for entry in entries], *closing)
+        if temp_root:
+            # 临时的用户数据目录只属于这个进程，关闭后删除
+            shutil.rmtree(temp_root, ignore_errors=True)
+        logger.info("close browser pool")
+
+    def is_alive() -> bool:
+        return not closed
+
+    def stats() -> Dict[str, Any]:
+        """返回浏览器池统计信息"""
+        return {
+            "size": len(slots),
+            "pid": os.getpid(),
+            "pages": counters["pages"],
+            "relaunches": counters["relaunches"],
+            "recycled": counters["recycled"],
+            "recycled_memory": counters["recycled_memory"],
+            "contexts": [
+                {
+                    "index": slot["index"],
+                    "launches": slot["launches"],
+                    "outstanding": slot["outstanding"],
+                    "user_data_dir": slot["entry"]["user_data_dir"] if slot["entry"] else slot["user_data_dir"],
+                    "pages": slot["entry"]["pages"] if slot["entry"] else 0,
+                    "active": slot["entry"]["active"] if slot["entry"] else 0,
+                    "page_pool": slot["entry"]["browser"]["page_stats"]() if slot["entry"] else None
+                }
+                for slot in slots
+            ]
+        }
+
+    def memory() -> Dict[str, Any]:
+        """本进程和每个浏览器进程树的常驻内存（字节），无法统计时为None"""
+        return {
+            "python": {"pid": os.getpid(), "rss": process_rss()},
+            "max_context_rss": max_context_rss,
+            "recycled_memory": counters["recycled_memory"],
+            "contexts": [
+                {"index": slot["index"], **(browser_memory(_browser_data_dir(slot)) or {"rss": None})}
+                for slot in slots
+            ]
+        }
+
+    return {
+        "close": close,
+        "with_page": with_page,
+        "is_alive": is_alive,
+        "warm": warm,
+        "stats": stats,
+        "memory": memory
+    }
@@ -0,0 +1,277 @@
+"""
+本地缓存：基于 SQLite 保存已提取的页面内容和搜索结果页链接
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import logging
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "local-web-search-cache.sqlite3")
+
+
+class _SqliteStore:
+    """SQLite 存储基类
+
+    使用 WAL 模式，多个进程可以安全地共享同一个文件。
+    方法都是同步的，在事件循环中应通过 asyncio.to_thread 调用。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or DEFAULT_CACHE_PATH
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开连接，成功时提交事务，结束后关闭连接"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    """给旧版本创建的表补上新增的列"""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+class ContentCache(_SqliteStore):
+    """页面内容缓存，以规范化URL为键，支持 TTL 过期和 LRU 淘汰
+
+    提取时按输出份额提前停止的正文只有开头一部分，complete 为 False；
+    读取方需要更长的正文时应重新提取。
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 24 * 3600, max_entries: int = 5000):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS content_cache (
+                    url TEXT PRIMARY KEY,
+                    title TEXT,
+                    content TEXT,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    complete INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+            _add_column(conn, "content_cache", "complete", "INTEGER NOT NULL DEFAULT 1")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_content_cache_accessed ON content_cache(accessed_at)")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """读取缓存内容（title、content 和 complete），过期或不存在时返回None"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT title, content, created_at, complete FROM content_cache WHERE url = ?", (url,)
+                ).fetchone()
+                if row is None or now - row[2] > self.ttl:
+                    if row is not None:
+                        conn.execute("DELETE FROM content_cache WHERE url = ?", (url,))
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE content_cache SET accessed_at = ? WHERE url = ?", (now, url))
+        except sqlite3.Error as e:
+            logger.debug(f"读取内容缓存失败 {url}: {str(e)}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {"title": row[0], "content": row[1], "complete": bool(row[3])}
+
+    def set(self, url: str, title: str, content: str, complete: bool = True):
+        """写入缓存内容，超过容量时淘汰最久未访问的条目；complete 为 False 表示只有正文的开头"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO content_cache (url, title, content, created_at, accessed_at, complete) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, title, content, now, now, int(complete))
+                )
+                conn.execute(
+                    "DELETE FROM content_cache WHERE url IN ("
+                    "SELECT url FROM content_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            logger.debug(f"写入内容缓存失败 {url}: {str(e)}")
+
+    def clear(self):
+        """清空缓存"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM content_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        try:
+            with self._connect() as conn:
+                entries = conn.execute("SELECT COUNT(*) FROM content_cache").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class SerpCache(_SqliteStore):
+    """搜索结果页链接缓存，以查询参数为键，默认有效期较短
+
+    同时对进行中的请求去重：相同查询并发到达时只导航一次搜索页。
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 600, max_entries: int = 1000):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._inflight: Dict[str, Dict[str, Any]] = {}
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS serp_cache (
+                    key TEXT PRIMARY KEY,
+                    links TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_serp_cache_created ON serp_cache(created_at)")
+
+    @staticmethod
+    def make_key(query: str, engine: str = "google", exclude_domains: Optional[List[str]] = None,
+                 max_results: int = 10, page: int = 0) -> str:
+        """根据 get_search_url 的参数生成缓存键"""
+        normalized = {
+            "query": " ".join(query.lower().split()),
+            "engine": engine.lower(),
+            "exclude_domains": sorted({d.strip().lower() for d in exclude_domains or [] if d.strip()}),
+            "max_results": max_results
+        }
+        if page:
+            # 第一页的键与加入翻页之前相同，已有的缓存仍然有效
+            normalized["page"] = page
+        return hashlib.sha1(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """读取缓存的链接列表，过期或不存在时返回None"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT links, created_at FROM serp_cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.debug(f"读取搜索结果缓存失败: {str(e)}")
+            row = None
+        if row is None or time.time() - row[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, links: List[Dict[str, str]]):
+        """写入链接列表，同时清理过期和超出容量的条目"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO serp_cache (key, links, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(links, ensure_ascii=False), now)
+                )
+                conn.execute("DELETE FROM serp_cache WHERE created_at < ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM serp_cache WHERE key IN ("
+                    "SELECT key FROM serp_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            logger.debug(f"写入搜索结果缓存失败: {str(e)}")
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[List[Dict[str, str]]]],
+                           refresh: bool = False) -> List[Dict[str, str]]:
+        """优先返回缓存；未命中时调用 fetch，并让相同键的并发请求共享这一次结果
+
+        refresh 为 True 时跳过读取缓存，但仍会写入新结果。
+        """
+        if not refresh:
+            cached = await asyncio.to_thread(self.get, key)
+            if cached is not None:
+                return cached
+
+        entry = self._inflight.get(key)
+        if entry is not None:
+            self.shared += 1
+        else:
+            # 请求在缓存自己的任务中执行，某个等待者被取消（达到目标、对冲落败、时间预算用尽）不会影响其他等待者
+            task = asyncio.create_task(self._fetch_and_store(key, fetch))
+            # 没有其他等待者时也要取出异常，避免 "exception was never retrieved" 警告
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            entry = {"task": task, "waiters": 0}
+            self._inflight[key] = entry
+            task.add_done_callback(lambda t: self._release_inflight(key, entry))
+
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(entry["task"])
+        finally:
+            entry["waiters"] -= 1
+            if entry["waiters"] == 0 and not entry["task"].done():
+                # 所有等待者都已离开，取消请求；之后到达的相同请求重新发起
+                self._release_inflight(key, entry)
+                entry["task"].cancel()
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[List[Dict[str, str]]]]) -> List[Dict[str, str]]:
+        links = await fetch()
+        if links:
+            # 空结果可能是验证码或临时错误，不缓存
+            await asyncio.to_thread(self.set, key, links)
+        return links
+
+    def _release_inflight(self, key: str, entry: Dict[str, Any]):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    def clear(self):
+        """清空缓存"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM serp_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        try:
+            with self._connect() as conn:
+                entries = conn.execute("SELECT COUNT(*) FROM serp_cache").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_inflight": self.shared,
+            "hit_rate": self.hits / total if total else 0.0
+        }
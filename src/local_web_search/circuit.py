@@ -0,0 +1,184 @@
+"""
+按主机熔断：连续失败（超时、错误状态码、验证码、网络错误等）达到阈值的主机在冷却期内直接跳过
+
+状态保存在 SQLite 中（默认与页面内容缓存同一个文件），服务器重启后仍然有效。
+冷却期结束后放行一个探测请求：成功则恢复，失败则以加倍的冷却期重新熔断。
+"""
+
+import time
+import sqlite3
+import logging
+from typing import Any, Dict, Optional
+
+from .cache import _SqliteStore
+from .metrics import classify_failure
+from .scheduler import THROTTLE_STATUSES, get_host
+
+logger = logging.getLogger(__name__)
+
+# 重试有意义的失败类别：限流和服务端错误通常是暂时的，网络错误和未知错误保持原来的重试行为
+RETRYABLE_KINDS = {"throttled", "http_5xx", "network", "other"}
+
+# 说明主机本身有问题的失败类别；404 之类的客户端错误、页面过大和提取为空只与单个页面有关
+# （提取为空也可能只是 HTTP 快速通道取不到动态页面），不计入熔断
+HOST_FAILURE_KINDS = {"timeout", "throttled", "http_5xx", "denied", "captcha", "network"}
+
+# 冷却期结束后等待探测结果的时间（秒），探测的页面没有被访问时到期后再放行一个
+PROBE_TIMEOUT = 60.0
+
+# 超过这么久没有更新的主机状态在启动时删除（秒）
+STALE_AFTER = 7 * 24 * 3600
+
+
+class PageBlockedError(Exception):
+    """结果页是验证码、人机验证或同意页，而不是正文"""
+
+    failure_reason = "captcha"
+
+    def __init__(self, url: str, reason: str):
+        super().__init__(f"页面被拦截（{reason}）: {url}")
+        self.url = url
+        self.reason = reason
+
+
+def failure_kind(reason: str) -> str:
+    """把失败原因（classify_failure 的结果）归为类别
+
+    timeout、throttled（429/503）、http_5xx、denied（401/403）、http_4xx、captcha、
+    empty（提取为空）、oversize、network 或 other
+    """
+    if reason.startswith("http_") and reason[5:].isdigit():
+        status = int(reason[5:])
+        if status in THROTTLE_STATUSES:
+            return "throttled"
+        if status in (401, 403):
+            return "denied"
+        return "http_5xx" if status >= 500 else "http_4xx"
+    if reason == "blocked":
+        return "captcha"
+    if reason in ("timeout", "captcha", "empty", "oversize", "network"):
+        return reason
+    return "other"
+
+
+def is_retryable(error: BaseException) -> bool:
+    """该异常是否值得重试；超时、客户端错误、验证码和页面过大重试也不会有不同的结果"""
+    return failure_kind(classify_failure(error)) in RETRYABLE_KINDS
+
+
+class HostCircuitBreaker(_SqliteStore):
+    """按主机的熔断器
+
+    failure_threshold: 连续多少次主机级别的失败后熔断
+    cooldown: 第一次熔断的冷却期（秒），之后每次重新熔断加倍，最多 max_cooldown
+    判断是否放行只读内存中的状态，写入 SQLite 的方法是同步的，在事件循环中应通过 asyncio.to_thread 调用。
+    """
+
+    def __init__(self, path: Optional[str] = None, failure_threshold: int = 3,
+                 cooldown: float = 600.0, max_cooldown: float = 6 * 3600):
+        super().__init__(path)
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.skipped = 0
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS host_circuit (
+                    host TEXT PRIMARY KEY,
+                    failures INTEGER NOT NULL,
+                    opens INTEGER NOT NULL,
+                    opened_until REAL NOT NULL,
+                    reason TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("DELETE FROM host_circuit WHERE updated_at < ?", (now - STALE_AFTER,))
+            rows = conn.execute(
+                "SELECT host, failures, opens, opened_until, reason FROM host_circuit"
+            ).fetchall()
+        for host, failures, opens, opened_until, reason in rows:
+            self._hosts[host] = {"failures": failures, "opens": opens,
+                                 "opened_until": opened_until, "reason": reason}
+
+    def allow(self, url: str) -> bool:
+        """该URL所在的主机是否放行；冷却期结束后只放行一个探测请求"""
+        state = self._hosts.get(get_host(url))
+        if state is None or state["failures"] < self.failure_threshold:
+            return True
+        now = time.time()
+        if now < state["opened_until"]:
+            self.skipped += 1
+            return False
+        # 半开：放行这一个请求，探测结果出来之前其他请求继续跳过
+        state["opened_until"] = now + PROBE_TIMEOUT
+        return True
+
+    def record_success(self, url: str):
+        """页面成功提取，主机恢复正常"""
+        host = get_host(url)
+        if host not in self._hosts:
+            return
+        del self._hosts[host]
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM host_circuit WHERE host = ?", (host,))
+        except sqlite3.Error as e:
+            logger.debug(f"写入熔断状态失败 {host}: {str(e)}")
+
+    def record_failure(self, url: str, reason: str):
+        """记录一次失败（classify_failure 的结果），只有主机级别的失败计入熔断"""
+        if failure_kind(reason) not in HOST_FAILURE_KINDS:
+            return
+        host = get_host(url)
+        if not host:
+            return
+        now = time.time()
+        state = self._hosts.setdefault(host, {"failures": 0, "opens": 0, "opened_until": 0.0, "reason": None})
+        state["failures"] += 1
+        state["reason"] = reason
+        if state["failures"] >= self.failure_threshold:
+            # 达到阈值时熔断；半开状态下探测失败时以加倍的冷却期重新熔断
+            cooldown = min(self.cooldown * (2 ** state["opens"]), self.max_cooldown)
+            state["opens"] += 1
+            state["opened_until"] = now + cooldown
+            logger.info(f"{host} 连续失败 {state['failures']} 次（{reason}），{cooldown:.0f} 秒内跳过")
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO host_circuit (host, failures, opens, opened_until, reason, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (host, state["failures"], state["opens"], state["opened_until"], reason, now)
+                )
+        except sqlite3.Error as e:
+            logger.debug(f"写入熔断状态失败 {host}: {str(e)}")
+
+    def clear(self):
+        """清除所有主机的状态"""
+        self._hosts.clear()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM host_circuit")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回熔断中的主机（剩余冷却时间和最近的失败原因）以及因熔断跳过的链接数"""
+        now = time.time()
+        return {
+            "path": self.path,
+            "skipped": self.skipped,
+            "open": {
+                host: {
+                    "failures": state["failures"],
+                    "opens": state["opens"],
+                    "reason": state["reason"],
+                    "remaining": round(state["opened_until"] - now, 1)
+                }
+                for host, state in self._hosts.items()
+                if state["failures"] >= self.failure_threshold and state["opened_until"] > now
+            },
+            "failing": {
+                host: {"failures": state["failures"], "reason": state["reason"]}
+                for host, state in self._hosts.items()
+                if state["failures"] < self.failure_threshold
+            }
+        }
@@ -0,0 +1,256 @@
+"""
+命令行接口
+
+与 MCP 服务器分开，服务器启动时不需要导入 click。
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+
+import click
+
+from .local_web_search import (
+    search_many, load_config, create_content_cache, create_serp_cache, create_page_index,
+    create_circuit_breaker, create_host_scheduler, page_pool_options, context_recycle_options, get_browser_profiles, FIXED_READY_WAIT
+)
+from .browser_pool import launch_browser_pool
+from .index import DEFAULT_INDEX_MAX_BYTES, DEFAULT_TOKENIZER, PageIndex
+from .dedupe import DEFAULT_DUPLICATE_THRESHOLD
+from .engines import ENGINES, ENGINE_MODES
+from .extraction import (
+    DEFAULT_MAX_HTML_BYTES, EXTRACTION_MODES, OVERSIZE_POLICIES, configure_extraction, shutdown_extraction
+)
+from .http_fetch import FETCH_MODES, get_http_client, close_http_client
+
+logger = logging.getLogger(__name__)
+
+
+@click.group()
+def cli():
+    """本地网页搜索工具"""
+    # 日志只在命令行入口配置，导入本包不会修改调用方的日志设置
+    logging.basicConfig(level=logging.INFO)
+
+
+@cli.command()
+@click.option("-q", "--query", required=True, help="搜索查询")
+@click.option("-c", "--concurrency", default=5, help="并发数量")
+@click.option("--show", is_flag=True, help="显示浏览器")
+@click.option("--browser", help="选择浏览器（chrome或edge）")
+@click.option("--max-results", default=10, type=int, help="每个查询的最大结果数")
+@click.option("--exclude-domain", multiple=True, help="排除的域名")
+@click.option("--truncate", type=int, help="截断页面内容的字符数")
+@click.option("--output-budget", type=int, help="每个查询所有结果正文的总字符数，按排名分给各个结果")
+@click.option("--proxy", help="使用代理")
+@click.option("--profile-path", help="浏览器配置文件路径")
+@click.option("--no-cache", is_flag=True, help="不使用页面内容缓存和搜索结果页缓存")
+@click.option("--cache-path", help="页面内容缓存文件路径")
+@click.option("--cache-ttl", type=float, help="页面内容缓存有效期（秒）")
+@click.option("--cache-max-entries", type=int, help="页面内容缓存最大条目数")
+@click.option("--refresh-serp", is_flag=True, help="忽略搜索结果页缓存，重新打开搜索页")
+@click.option("--extract-mode", type=click.Choice(EXTRACTION_MODES), help="正文提取方式（进程池、线程池或在事件循环中直接运行）")
+@click.option("--extract-workers", type=int, help="正文提取的工作进程/线程数量，默认等于CPU核数")
+@click.option("--ready-timeout", type=float, help="等待动态页面内容稳定的最长时间（秒）")
+@click.option("--fetch-mode", type=click.Choice(FETCH_MODES), help="结果页获取方式（浏览器、HTTP，或先HTTP后浏览器）")
+@click.option("--stream", is_flag=True, help="每个结果完成后立即输出一行JSON（NDJSON）")
+@click.option("--host-concurrency", type=int, help="每个主机的最大并发请求数")
+@click.option("--host-interval", type=float, help="同一主机两次请求之间的最小间隔（秒）")
+@click.option("--engine", type=click.Choice(ENGINES), help="搜索引擎")
+@click.option("--fallback-engine", type=click.Choice(ENGINES), multiple=True, help="对冲/合并模式下使用的其他搜索引擎")
+@click.option("--engine-mode", type=click.Choice(ENGINE_MODES), help="单引擎、对冲请求或多引擎合并")
+@click.option("--hedge-delay", type=float, help="对冲模式下主引擎多久未返回就启动备用引擎（秒）")
+@click.option("--time-budget", type=float, help="每个查询的时间预算（秒），用尽时返回已完成的结果")
+@click.option("--metrics", is_flag=True, help="搜索结束后把每个查询各阶段的耗时明细输出到标准错误")
+@click.option("--keep-duplicates", is_flag=True, help="保留正文近似重复（转载、镜像）的结果")
+@click.option("--browsers", type=int, help="启动的浏览器进程数量，页面按未完成页面数分配到各个浏览器")
+@click.option("--no-index", is_flag=True, help="不把提取的页面写入本地全文索引")
+@click.option("--local-first", is_flag=True, help="先从本地全文索引中检索，结果不够时再搜索")
+@click.option("--max-html-bytes", type=int, help="页面HTML的大小上限（字节），0 表示不限制")
+@click.option("--oversize-html", type=click.Choice(OVERSIZE_POLICIES), help="超过大小上限的页面截断后提取或跳过")
+def search_cmd(query, concurrency, show, browser, max_results, exclude_domain, truncate, output_budget, proxy, profile_path,
+               no_cache, cache_path, cache_ttl, cache_max_entries, refresh_serp, extract_mode, extract_workers,
+               ready_timeout, fetch_mode, stream, host_concurrency, host_interval,
+               engine, fallback_engine, engine_mode, hedge_delay, time_budget, metrics, keep_duplicates, browsers,
+               no_index, local_first, max_html_bytes, oversize_html):
+    """执行搜索命令"""
+    # 使用 asyncio.run 运行异步函数
+    asyncio.run(_search_cmd_async(query, concurrency, show, browser, max_results, exclude_domain, truncate, proxy, profile_path,
+                                  no_cache, cache_path, cache_ttl, cache_max_entries, refresh_serp,
+                                  extract_mode, extract_workers, ready_timeout, fetch_mode, stream,
+                                  host_concurrency, host_interval, engine, fallback_engine, engine_mode, hedge_delay,
+                                  time_budget, metrics, keep_duplicates, browsers, output_budget,
+                                  no_index, local_first, max_html_bytes, oversize_html))
+
+# 将原来的 search_cmd 函数移到这里，并重命名
+async def _search_cmd_async(query, concurrency, show, browser, max_results, exclude_domain, truncate, proxy, profile_path,
+                            no_cache=False, cache_path=None, cache_ttl=None, cache_max_entries=None, refresh_serp=False,
+                            extract_mode=None, extract_workers=None, ready_timeout=None, fetch_mode=None, stream=False,
+                            host_concurrency=None, host_interval=None, engine=None, fallback_engine=None,
+                            engine_mode=None, hedge_delay=None, time_budget=None, metrics=False,
+                            keep_duplicates=False, browsers=None, output_budget=None, no_index=False,
+                            local_first=False, max_html_bytes=None, oversize_html=None):
+    # 合并配置文件和命令行参数
+    config = load_config()
+    
+    # 命令行参数优先级高于配置文件
+    if not query and "query" in config:
+        query = config["query"]
+    
+    concurrency = concurrency or config.get("concurrency", 5)
+    show = show or config.get("show", False)
+    browser = browser or config.get("browser")
+    max_results = max_results or config.get("maxResults", 10)
+    truncate = truncate or config.get("truncate")
+    output_budget = output_budget or config.get("outputBudget")
+    proxy = proxy or config.get("proxy")
+    ready_timeout = ready_timeout or config.get("readyTimeout", FIXED_READY_WAIT)
+    fetch_mode = fetch_mode or config.get("fetchMode", "browser")
+    engine = engine or config.get("engine", "google")
+    fallback_engines = list(fallback_engine) or config.get("fallbackEngines")
+    engine_mode = engine_mode or config.get("engineMode", "single")
+    hedge_delay = hedge_delay or config.get("hedgeDelay", 3.0)
+    time_budget = time_budget or config.get("timeBudget")
+    browsers = browsers or config.get("poolSize", 1)
+    dedupe_threshold = None if keep_duplicates else config.get("dedupeThreshold", DEFAULT_DUPLICATE_THRESHOLD)
+    
+    content_cache = create_content_cache(config, cache_path, cache_ttl, cache_max_entries) if not no_cache else None
+    serp_cache = create_serp_cache(config, cache_path) if not no_cache else None
+    page_index = create_page_index(config) if not no_index else None
+    local_first = local_first or config.get("localFirst", False)
+    if max_html_bytes is None:
+        max_html_bytes = config.get("maxHtmlBytes", DEFAULT_MAX_HTML_BYTES)
+    oversize_policy = oversize_html or config.get("oversizeHtml", "truncate")
+    configure_extraction(
+        mode=extract_mode or config.get("extractMode", "process"),
+        workers=extract_workers or config.get("extractWorkers")
+    )
+    
+    # 如果命令行没有指定exclude_domain，但配置文件中有
+    if not exclude_domain and "excludeDomain" in config:
+        exclude_domains = config["excludeDomain"]
+        if isinstance(exclude_domains, str):
+            exclude_domain = [exclude_domains]
+        elif isinstance(exclude_domains, list):
+            exclude_domain = exclude_domains
+    
+    # HTTP快速通道与浏览器使用同一个代理
+    get_http_client(proxy=proxy)
+    
+    try:
+        # 启动浏览器，传入browser参数；多个浏览器进程时各自使用独立的用户数据目录
+        launch_started = time.perf_counter()
+        browser_instance = await launch_browser_pool(
+            size=browsers, show=show, proxy=proxy, browser=browser, profile_path=profile_path,
+            user_data_root=config.get("userDataDir"), **context_recycle_options(config), **page_pool_options(config)
+        )
+        await browser_instance["warm"]()
+        launch_seconds = time.perf_counter() - launch_started
+        
+        # 如果查询包含逗号，分割为多个查询
+        queries = [q.strip() for q in query.split(",") if q.strip()]
+        if not queries:
+            queries = [query]
+        
+        async def print_result(q, result):
+            # 流式模式下每个结果单独输出一行JSON
+            print(json.dumps({"query": q, **result}, ensure_ascii=False), flush=True)
+        
+        # 所有查询并发执行，共享并发额度和已访问URL集合
+        all_results = await search_many(
+            browser=browser_instance,
+            queries=queries,
+            concurrency=concurrency,
+            visited_urls=set(),
+            on_result=print_result if stream else None,
+            max_results=max_results,
+            exclude_domains=list(exclude_domain),
+            truncate=truncate,
+            output_budget=output_budget,
+            content_cache=content_cache,
+            serp_cache=serp_cache,
+            refresh_serp=refresh_serp,
+            ready_timeout=ready_timeout,
+            fetch_mode=fetch_mode,
+            host_scheduler=create_host_scheduler(config, host_concurrency, host_interval),
+            engine=engine,
+            fallback_engines=fallback_engines,
+            engine_mode=engine_mode,
+            hedge_delay=hedge_delay,
+            time_budget=time_budget,
+            dedupe_threshold=dedupe_threshold,
+            page_index=page_index,
+            local_first=local_first,
+            local_min_results=config.get("localMinResults"),
+            local_max_age=config.get("localMaxAge"),
+            max_html_bytes=max_html_bytes,
+            oversize_policy=oversize_policy,
+            circuit_breaker=create_circuit_breaker(config),
+            overfetch=config.get("overfetch", 1.5),
+            max_serp_pages=config.get("maxSerpPages", 3),
+            speculative_visits=config.get("speculativeVisits", 1),
+            metrics=metrics
+        )
+        
+        # 耗时明细输出到标准错误，不影响标准输出中的JSON结果
+        if metrics:
+            print(json.dumps({
+                "browser_launch": round(launch_seconds, 4),
+                "queries": [results.pop("metrics", None) for results in all_results]
+            }, ensure_ascii=False, indent=2), file=sys.stderr)
+        
+        # 在命令行模式下按查询顺序打印结果
+        if not stream:
+            for results in all_results:
+                print(json.dumps(results, ensure_ascii=False))
+        
+        # 关闭浏览器
+        await browser_instance["close"]()
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        sys.exit(1)
+    finally:
+        await close_http_client()
+        shutdown_extraction()
+
+@cli.command()
+@click.option("-q", "--query", required=True, help="搜索查询")
+@click.option("--max-results", default=10, type=int, help="最大结果数")
+@click.option("--max-age", type=float, help="只返回在这么多秒内抓取的页面")
+@click.option("--index-path", help="本地全文索引文件路径")
+@click.option("--truncate", type=int, help="截断页面内容的字符数")
+def local_search_cmd(query, max_results, max_age, index_path, truncate):
+    """在本地全文索引中检索已抓取过的页面，不启动浏览器"""
+    config = load_config()
+    page_index = PageIndex(
+        path=index_path or config.get("indexPath"),
+        max_bytes=config.get("indexMaxBytes", DEFAULT_INDEX_MAX_BYTES),
+        tokenizer=config.get("indexTokenizer", DEFAULT_TOKENIZER)
+    )
+    started = time.perf_counter()
+    hits = page_index.search(query, limit=max_results, max_age=max_age)
+    for hit in hits:
+        if truncate:
+            hit["content"] = hit["content"][:truncate]
+    print(json.dumps({
+        "query": query,
+        "results": hits,
+        "seconds": round(time.perf_counter() - started, 4)
+    }, ensure_ascii=False))
+
+@cli.command()
+@click.option("--browser", help="选择浏览器（chrome或edge）")
+def list_profiles(browser):
+    """列出浏览器配置文件"""
+    try:
+        profiles = get_browser_profiles(browser)
+        print(json.dumps(profiles, ensure_ascii=False, indent=2))
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,56 @@
+"""
+近似重复内容检测：对提取后的正文计算 SimHash 指纹，汉明距离足够小的两个页面视为同一篇内容
+（转载、镜像站、同一文章的不同URL）
+"""
+
+import re
+import hashlib
+from typing import List, Optional
+
+# 指纹位数
+FINGERPRINT_BITS = 64
+
+# 汉明距离不超过该值时视为近似重复
+DEFAULT_DUPLICATE_THRESHOLD = 3
+
+# 每个特征包含的连续词数
+SHINGLE_SIZE = 3
+
+# 少于这么多个词的正文指纹不稳定，不参与去重
+MIN_FINGERPRINT_WORDS = 30
+
+# 只对正文开头计算指纹，转载的文章开头相同，长页面也不会占用太多时间
+MAX_FINGERPRINT_CHARS = 20000
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def simhash(text: str) -> Optional[int]:
+    """计算正文的 64 位 SimHash 指纹，正文过短时返回None"""
+    words = _WORD_RE.findall(text[:MAX_FINGERPRINT_CHARS].lower())
+    if len(words) < MIN_FINGERPRINT_WORDS:
+        return None
+
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    rows = [
+        format(int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+        for shingle in shingles
+    ]
+    # 按位统计：某一位为 1 的特征超过一半时，指纹的该位为 1
+    half = len(rows) / 2
+    bits = "".join("1" if column.count("1") > half else "0" for column in zip(*rows))
+    return int(bits, 2)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个指纹之间不同的位数"""
+    return bin(a ^ b).count("1")
+
+
+def find_near_duplicate(fingerprint: int, fingerprints: List[int],
+                        threshold: int = DEFAULT_DUPLICATE_THRESHOLD) -> Optional[int]:
+    """在已有指纹中查找与 fingerprint 近似重复的一个，没有时返回None"""
+    for existing in fingerprints:
+        if hamming_distance(fingerprint, existing) <= threshold:
+            return existing
+    return None
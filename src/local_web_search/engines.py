@@ -0,0 +1,269 @@
+"""
+搜索引擎：各引擎的结果页链接提取脚本、验证码/同意页检测，以及多引擎对冲和合并
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ["google", "bing", "duckduckgo"]
+
+# single：只用主引擎；hedged：主引擎超过对冲延迟未返回（或被拦截）时启动备用引擎，取最先返回的结果；
+# merge：同时查询所有引擎并交错合并结果
+ENGINE_MODES = ["single", "hedged", "merge"]
+
+# 只遍历一次结果锚点（包含 h3 标题的 a[href]），用 主机名+路径 的 Set 去重，耗时与页面大小成线性关系
+GOOGLE_LINKS_SCRIPT = """
+    () => {
+        const links = [];
+        const seen = new Set();
+
+        const addLink = (anchor, titleElement) => {
+            const url = anchor.getAttribute('href');
+            const title = (titleElement.textContent || '').trim();
+            // 跳过站内链接（相关搜索、翻页等）和非 http(s) 链接
+            if (!url || !title || !/^https?:/.test(url) || url.includes('google.com/')) return;
+            let urlObj;
+            try {
+                urlObj = new URL(url);
+            } catch (e) {
+                return;
+            }
+            const key = urlObj.hostname + urlObj.pathname;
+            if (seen.has(key)) return;
+            seen.add(key);
+            links.push({ title: title, url: url });
+        };
+
+        const container = document.querySelector('#search') || document.querySelector('#rso') || document.body;
+
+        // 当前的结果结构：标题 h3 在结果链接内部
+        for (const anchor of container.querySelectorAll('a[href]')) {
+            const titleElement = anchor.querySelector('h3');
+            if (titleElement) addLink(anchor, titleElement);
+        }
+
+        // 旧的结果结构：结果链接在 h3 内部
+        if (links.length === 0) {
+            for (const titleElement of container.querySelectorAll('h3')) {
+                const anchor = titleElement.querySelector('a[href]');
+                if (anchor) addLink(anchor, titleElement);
+            }
+        }
+
+        return links;
+    }
+"""
+
+BING_LINKS_SCRIPT = """
+    () => {
+        const links = [];
+        const seen = new Set();
+
+        // Bing 的结果链接可能是 /ck/a 跳转链接，真实地址以 "a1" + base64url 编码放在 u 参数中
+        const resolveUrl = (href) => {
+            try {
+                const urlObj = new URL(href, location.href);
+                if (urlObj.hostname.endsWith('bing.com') && urlObj.pathname.startsWith('/ck/')) {
+                    const encoded = urlObj.searchParams.get('u');
+                    if (encoded && encoded.startsWith('a1')) {
+                        const base64 = encoded.slice(2).replace(/-/g, '+').replace(/_/g, '/');
+                        return atob(base64 + '='.repeat((4 - base64.length % 4) % 4));
+                    }
+                }
+                return urlObj.href;
+            } catch (e) {
+                return null;
+            }
+        };
+
+        document.querySelectorAll('#b_results li.b_algo').forEach(element => {
+            const anchor = element.querySelector('h2 a[href]');
+            if (!anchor) return;
+            const url = resolveUrl(anchor.getAttribute('href'));
+            const title = (anchor.textContent || '').trim();
+            if (!url || !title || !/^https?:/.test(url) || url.includes('bing.com/')) return;
+            try {
+                const urlObj = new URL(url);
+                const key = urlObj.hostname + urlObj.pathname;
+                if (seen.has(key)) return;
+                seen.add(key);
+            } catch (e) {
+                return;
+            }
+            links.push({ title: title, url: url });
+        });
+
+        return links;
+    }
+"""
+
+DUCKDUCKGO_LINKS_SCRIPT = """
+    () => {
+        const links = [];
+        const seen = new Set();
+
+        // html.duckduckgo.com 的结果链接是 /l/?uddg=<真实地址> 跳转链接
+        const resolveUrl = (href) => {
+            try {
+                const urlObj = new URL(href, location.href);
+                if (urlObj.hostname.endsWith('duckduckgo.com') && urlObj.pathname.startsWith('/l/')) {
+                    return urlObj.searchParams.get('uddg');
+                }
+                return urlObj.href;
+            } catch (e) {
+                return null;
+            }
+        };
+
+        // 同时兼容静态版（a.result__a）和脚本渲染版（result-title-a）
+        const anchors = document.querySelectorAll('a.result__a[href], a[data-testid="result-title-a"][href]');
+        anchors.forEach(anchor => {
+            const result = anchor.closest('.result, article');
+            if (result && (result.classList.contains('result--ad') || result.querySelector('.badge--ad'))) return;
+            const url = resolveUrl(anchor.getAttribute('href'));
+            const title = (anchor.textContent || '').trim();
+            if (!url || !title || !/^https?:/.test(url) || url.includes('duckduckgo.com/')) return;
+            try {
+                const urlObj = new URL(url);
+                const key = urlObj.hostname + urlObj.pathname;
+                if (seen.has(key)) return;
+                seen.add(key);
+            } catch (e) {
+                return;
+            }
+            links.push({ title: title, url: url });
+        });
+
+        return links;
+    }
+"""
+
+SERP_LINK_SCRIPTS = {
+    "google": GOOGLE_LINKS_SCRIPT,
+    "bing": BING_LINKS_SCRIPT,
+    "duckduckgo": DUCKDUCKGO_LINKS_SCRIPT,
+}
+
+# 检测验证码、异常流量、人机验证（如 Cloudflare）和 Cookie 同意页，搜索页和结果页共用
+SERP_BLOCK_SCRIPT = """
+    () => {
+        const text = (document.body ? document.body.innerText : '').slice(0, 5000).toLowerCase();
+        if (document.querySelector('#captcha-form, form[action*="sorry"], #recaptcha, .g-recaptcha, iframe[src*="recaptcha"]')) return 'captcha';
+        if (document.querySelector('.anomaly-modal__title, #challenge-form, #challenge-running, .cf-browser-verification, iframe[src*="hcaptcha"]')) return 'captcha';
+        if (text.includes('unusual traffic') || text.includes('are you a robot') || text.includes('verify you are human')) return 'captcha';
+        if (text.includes('checking your browser') || text.includes('enable javascript and cookies to continue')) return 'captcha';
+        if (document.querySelector('form[action*="consent"]') && text.includes('before you continue')) return 'consent';
+        return null;
+    }
+"""
+
+BLOCKED_URL_MARKERS = ["/sorry/", "consent.google.", "consent.youtube.", "/captcha"]
+
+
+class SerpBlockedError(Exception):
+    """搜索引擎返回了验证码或同意页，而不是搜索结果"""
+
+    def __init__(self, engine: str, reason: str):
+        super().__init__(f"{engine} 搜索页被拦截: {reason}")
+        self.engine = engine
+        self.reason = reason
+
+
+async def detect_serp_block(page) -> Optional[str]:
+    """检测当前页面是否为验证码/同意页，返回原因或None"""
+    if any(marker in page.url for marker in BLOCKED_URL_MARKERS):
+        return "consent" if "consent" in page.url else "captcha"
+    try:
+        return await page.evaluate(SERP_BLOCK_SCRIPT)
+    except Exception:
+        return None
+
+
+def _link_key(url: str) -> str:
+    try:
+        parsed = urlparse(url)
+        return (parsed.hostname or "") + parsed.path
+    except ValueError:
+        return url
+
+
+def merge_engine_links(link_lists: List[List[Dict[str, str]]], max_results: int) -> List[Dict[str, str]]:
+    """按排名交错合并多个引擎的链接并去重"""
+    merged = []
+    seen = set()
+    for rank in range(max((len(links) for links in link_lists), default=0)):
+        for links in link_lists:
+            if rank < len(links):
+                key = _link_key(links[rank]["url"])
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(links[rank])
+    return merged[:max_results]
+
+
+EngineFetcher = Callable[[str], Awaitable[List[Dict[str, str]]]]
+
+
+async def fetch_links_hedged(fetch: EngineFetcher, engines: List[str], hedge_delay: float) -> Tuple[str, List[Dict[str, str]]]:
+    """对冲请求：先请求第一个引擎，超过 hedge_delay 未返回或失败/被拦截时启动下一个引擎，
+    返回最先得到非空结果的 (引擎, 链接)
+    """
+    pending: Dict[asyncio.Task, str] = {}
+    remaining = list(engines)
+    last_error: Optional[Exception] = None
+
+    def launch_next():
+        engine = remaining.pop(0)
+        pending[asyncio.create_task(fetch(engine))] = engine
+
+    launch_next()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending.keys(),
+                timeout=hedge_delay if remaining else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                # 主引擎太慢，启动备用引擎，两者谁先返回用谁
+                logger.info(f"{', '.join(pending.values())} 超过 {hedge_delay} 秒未返回，启动 {remaining[0]}")
+                launch_next()
+                continue
+            for task in done:
+                engine = pending.pop(task)
+                try:
+                    links = task.result()
+                except Exception as e:
+                    logger.info(f"{engine} 搜索失败: {str(e)}")
+                    last_error = e
+                    continue
+                if links:
+                    return engine, links
+                logger.info(f"{engine} 没有返回结果")
+            if remaining:
+                # 已完成的引擎失败或没有结果，不必再等对冲延迟
+                launch_next()
+        if last_error:
+            raise last_error
+        return engines[0], []
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def fetch_links_merged(fetch: EngineFetcher, engines: List[str], max_results: int) -> List[Dict[str, str]]:
+    """同时请求所有引擎并合并结果，单个引擎失败不影响其他引擎"""
+    results = await asyncio.gather(*[fetch(engine) for engine in engines], return_exceptions=True)
+    link_lists = []
+    for engine, result in zip(engines, results):
+        if isinstance(result, BaseException):
+            logger.info(f"{engine} 搜索失败: {str(result)}")
+            continue
+        link_lists.append(result)
+    if not link_lists and results and isinstance(results[0], Exception):
+        raise results[0]
+    return merge_engine_links(link_lists, max_results)
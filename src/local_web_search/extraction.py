@@ -0,0 +1,230 @@
+"""
+正文提取：readability + BeautifulSoup + html2text
+
+这些步骤是纯CPU计算，放在进程池（或线程池）中运行，避免阻塞事件循环。
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from .metrics import observe, span
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_MODES = ["process", "thread", "inline"]
+
+# 页面HTML的大小上限（字节），超过时按 OVERSIZE_POLICIES 截断或跳过，None 表示不限制
+DEFAULT_MAX_HTML_BYTES = 5 * 1024 * 1024
+
+# truncate：只保留前 max_html_bytes 字节再提取；skip：放弃该页面
+OVERSIZE_POLICIES = ["truncate", "skip"]
+
+# 提取执行器配置，在第一次提取时按配置创建
+_executor: Optional[Executor] = None
+_executor_config = {"mode": "process", "workers": None}
+
+
+# readability/lxml、BeautifulSoup 和 html2text 在第一次提取时才导入（工作进程中各自导入一次）
+_libs: Optional[SimpleNamespace] = None
+
+
+def _load_extractors() -> SimpleNamespace:
+    """导入提取用到的库，返回包含 Document、BeautifulSoup、NavigableString 和 html2text 的命名空间"""
+    global _libs
+    if _libs is None:
+        from bs4 import BeautifulSoup, NavigableString
+
+        # 修复 lxml 依赖问题
+        try:
+            from readability import Document
+        except ImportError as e:
+            if "lxml.html.clean" in str(e):
+                print("错误: lxml.html.clean 模块现在是一个独立项目。")
+                print("请运行以下命令安装缺失的依赖:")
+                print("pip install lxml[html_clean] 或 pip install lxml_html_clean")
+                sys.exit(1)
+            else:
+                raise
+
+        import html2text
+
+        _libs = SimpleNamespace(Document=Document, BeautifulSoup=BeautifulSoup,
+                                NavigableString=NavigableString, html2text=html2text)
+    return _libs
+
+
+class OversizedPageError(Exception):
+    """页面HTML超过大小上限且策略为 skip，不重试也不换用其他获取方式"""
+
+    failure_reason = "oversize"
+
+    def __init__(self, url: str, size: int, limit: int):
+        super().__init__(f"页面HTML超过 {limit} 字节（至少 {size} 字节）: {url}")
+        self.url = url
+        self.size = size
+        self.limit = limit
+
+
+# 按正文字符数截断时多保留的比例，Markdown 会合并空白，截断后再精确裁剪
+TRUNCATE_MARGIN = 1.2
+
+
+def parse_html(content: str, max_chars: Optional[int] = None) -> Dict[str, str]:
+    """从页面HTML中提取标题和Markdown正文，max_chars 限制正文长度"""
+    return _parse_html_timed(content, max_chars)[0]
+
+
+def _truncate_soup(soup: "BeautifulSoup", max_chars: int) -> int:
+    """删除正文超过 max_chars 之后的所有节点，返回删除的文本字符数"""
+    limit = int(max_chars * TRUNCATE_MARGIN) + 200
+    total = 0
+    for text in soup.find_all(string=True):
+        total += len(" ".join(text.split()))
+        if total > limit:
+            following = list(text.next_elements)
+            skipped = sum(len(node) for node in following if isinstance(node, _load_extractors().NavigableString))
+            for node in following:
+                node.extract()
+            return skipped
+    return 0
+
+
+def _parse_html_timed(content: str, max_chars: Optional[int] = None) -> Tuple[Dict[str, str], Dict[str, float]]:
+    """提取标题和正文，同时返回每个步骤的耗时（在工作进程中运行，耗时随结果一起返回）
+
+    指定 max_chars 时，超出部分在转换为Markdown之前删除，不做无用的转换；
+    结果中的 skipped_chars 是因此没有转换的文本字符数。
+    """
+    libs = _load_extractors()
+    timings = {}
+
+    # 使用readability提取主要内容
+    started = time.perf_counter()
+    doc = libs.Document(content)
+    article_html = doc.summary()
+    title = doc.title()
+    timings["extract_readability"] = time.perf_counter() - started
+
+    # 删除不必要的元素（广告、导航等）
+    started = time.perf_counter()
+    soup = libs.BeautifulSoup(article_html, 'html.parser')
+    for selector in ['nav', '.ad', '.ads', '.advert', '.cookie-notice', '.popup', 'iframe']:
+        for element in soup.select(selector):
+            element.decompose()
+    skipped_chars = _truncate_soup(soup, max_chars) if max_chars else 0
+    cleaned_html = str(soup)
+    timings["extract_cleanup"] = time.perf_counter() - started
+
+    # 转换为纯文本
+    started = time.perf_counter()
+    converter = libs.html2text.HTML2Text()
+    converter.ignore_links = False
+    converter.ignore_images = True
+    converter.body_width = 0  # 不限制宽度
+    text_content = converter.handle(cleaned_html)
+    timings["extract_html2text"] = time.perf_counter() - started
+
+    result = {
+        "title": title,
+        "content": text_content
+    }
+    if max_chars:
+        result["content"] = text_content[:max_chars]
+        result["skipped_chars"] = skipped_chars + max(0, len(text_content) - max_chars)
+    return result, timings
+
+
+def configure_extraction(mode: str = "process", workers: Optional[int] = None):
+    """设置正文提取的执行方式
+
+    mode: process（进程池）、thread（线程池）或 inline（直接在事件循环中运行）
+    workers: 工作进程/线程数量，默认等于CPU核数
+    """
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"不支持的提取模式: {mode}，可选值: {', '.join(EXTRACTION_MODES)}")
+    shutdown_extraction()
+    _executor_config["mode"] = mode
+    _executor_config["workers"] = workers
+
+
+def _create_executor(mode: str, workers: Optional[int]) -> Optional[Executor]:
+    workers = workers or os.cpu_count() or 1
+    if mode == "process":
+        try:
+            # 使用spawn避免在已有线程（浏览器驱动）的进程中fork
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError) as e:
+            logger.warning(f"无法创建提取进程池，改用线程池: {str(e)}")
+            mode = "thread"
+    if mode == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract")
+    return None
+
+
+def get_extraction_executor() -> Optional[Executor]:
+    """获取（必要时创建）正文提取执行器，inline 模式返回None"""
+    global _executor
+    if _executor is None and _executor_config["mode"] != "inline":
+        _executor = _create_executor(_executor_config["mode"], _executor_config["workers"])
+    return _executor
+
+
+async def extract_html(content: str, max_chars: Optional[int] = None) -> Dict[str, str]:
+    """在执行器中提取页面HTML的标题和正文，max_chars 限制正文长度（超出部分不做转换）"""
+    with span("extract"):
+        result, timings = await _run_extraction(content, max_chars)
+    for stage, seconds in timings.items():
+        observe(stage, seconds)
+    return result
+
+
+async def _run_extraction(content: str, max_chars: Optional[int]) -> Tuple[Dict[str, str], Dict[str, float]]:
+    global _executor
+    executor = get_extraction_executor()
+    if executor is None:
+        return _parse_html_timed(content, max_chars)
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, _parse_html_timed, content, max_chars)
+    except BrokenProcessPool:
+        # 工作进程异常退出（例如被OOM杀掉），改用线程池继续
+        logger.warning("提取进程池已损坏，改用线程池")
+        _executor = _create_executor("thread", _executor_config["workers"])
+        _executor_config["mode"] = "thread"
+        return await loop.run_in_executor(_executor, _parse_html_timed, content, max_chars)
+
+
+def _warm_worker():
+    _load_extractors()
+
+
+async def warm_extraction():
+    """提前启动提取执行器的工作进程并导入提取用到的库，第一次提取时不再承担这部分开销"""
+    executor = get_extraction_executor()
+    if executor is None:
+        # inline 模式在线程中导入，不阻塞事件循环
+        await asyncio.to_thread(_warm_worker)
+        return
+    # 进程池按需启动工作进程，每个工作进程一个任务
+    workers = _executor_config["workers"] or os.cpu_count() or 1
+    await asyncio.gather(*[asyncio.wrap_future(executor.submit(_warm_worker)) for _ in range(workers)])
+
+
+def shutdown_extraction():
+    """关闭正文提取执行器"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,154 @@
+"""
+HTTP 快速通道：不启动浏览器标签页，直接通过复用连接的 HTTP 客户端获取服务端渲染的页面
+"""
+
+import re
+import logging
+from typing import TYPE_CHECKING, Optional
+
+from .extraction import OversizedPageError
+from .scheduler import parse_retry_after
+
+# httpx 在第一次使用HTTP客户端时才导入
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+FETCH_MODES = ["browser", "http", "auto"]
+
+# 与浏览器保持一致的请求头
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/237.84.2.178 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# 正文少于这么多字符的页面视为需要JS渲染
+MIN_STATIC_TEXT_LENGTH = 500
+
+# 单页应用的常见特征：空的挂载节点或提示开启JavaScript
+SPA_MARKERS = [
+    re.compile(r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>', re.I),
+    re.compile(r'<noscript[^>]*>[^<]*(?:enable|requires?|turn on)[^<]*javascript', re.I),
+    re.compile(r'<app-root[^>]*>\s*</app-root>', re.I),
+]
+
+_SCRIPT_STYLE_RE = re.compile(r'<(script|style|noscript|template)\b[^>]*>.*?</\1>', re.I | re.S)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+_client: Optional["httpx.AsyncClient"] = None
+_client_options = {"proxy": None}
+
+
+class NotStaticPageError(Exception):
+    """页面不适合走HTTP快速通道（非HTML、需要JS渲染或请求失败）
+
+    status 为错误状态码；failure_reason 为没有状态码时的失败原因：timeout、network，
+    或页面本身不适合时的 not_static（非HTML或需要JS渲染）。
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None,
+                 failure_reason: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.failure_reason = failure_reason
+
+
+def configure_http_client(proxy: Optional[str] = None):
+    """设置共享HTTP客户端的代理，客户端在第一次使用时创建"""
+    _client_options["proxy"] = proxy
+
+
+def get_http_client(proxy: Optional[str] = None) -> "httpx.AsyncClient":
+    """获取（必要时创建）共享的HTTP客户端，连接在请求之间复用"""
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx
+
+        _client = httpx.AsyncClient(
+            headers=HTTP_HEADERS,
+            follow_redirects=True,
+            verify=False,  # 与浏览器的 ignore_https_errors 保持一致
+            proxy=proxy or _client_options["proxy"],
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30)
+        )
+    return _client
+
+
+async def close_http_client():
+    """关闭共享的HTTP客户端"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def looks_js_dependent(html: str) -> bool:
+    """判断页面是否依赖JS渲染（正文过少或带有单页应用特征）"""
+    if any(marker.search(html) for marker in SPA_MARKERS):
+        return True
+    text = _TAG_RE.sub(" ", _SCRIPT_STYLE_RE.sub(" ", html))
+    return len(" ".join(text.split())) < MIN_STATIC_TEXT_LENGTH
+
+
+async def _read_body(response: "httpx.Response", url: str, max_bytes: Optional[int],
+                     oversize_policy: str) -> str:
+    """分块读取响应体，超过 max_bytes 时停止读取（截断）或抛出 OversizedPageError（跳过）"""
+    if max_bytes and oversize_policy == "skip":
+        declared = response.headers.get("content-length", "")
+        if declared.isdigit() and int(declared) > max_bytes:
+            raise OversizedPageError(url, int(declared), max_bytes)
+    chunks, size = [], 0
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            if oversize_policy == "skip":
+                raise OversizedPageError(url, size, max_bytes)
+            logger.debug(f"页面HTML超过 {max_bytes} 字节，截断后提取: {url}")
+            break
+    body = b"".join(chunks)
+    if max_bytes:
+        body = body[:max_bytes]
+    try:
+        return body.decode(response.charset_encoding or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+async def fetch_static_html(url: str, timeout: Optional[float] = None, max_bytes: Optional[int] = None,
+                            oversize_policy: str = "truncate") -> str:
+    """通过HTTP获取服务端渲染的HTML，不适合时抛出 NotStaticPageError
+
+    max_bytes: HTML大小上限，超出部分不读取；oversize_policy 为 skip 时抛出 OversizedPageError
+    """
+    import httpx
+
+    client = get_http_client()
+    try:
+        async with client.stream(
+            "GET", url, timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        ) as response:
+            if response.status_code >= 400:
+                raise NotStaticPageError(
+                    f"HTTP {response.status_code}",
+                    status=response.status_code,
+                    retry_after=parse_retry_after(response.headers.get("retry-after"))
+                )
+            content_type = response.headers.get("content-type", "")
+            if "html" not in content_type.lower():
+                raise NotStaticPageError(f"不是HTML页面: {content_type}", failure_reason="not_static")
+            html = await _read_body(response, url, max_bytes, oversize_policy)
+    except httpx.TimeoutException as e:
+        raise NotStaticPageError(f"请求超时: {str(e)}", failure_reason="timeout") from e
+    except httpx.TransportError as e:
+        raise NotStaticPageError(f"请求失败: {str(e)}", failure_reason="network") from e
+    except httpx.HTTPError as e:
+        raise NotStaticPageError(f"请求失败: {str(e)}") from e
+
+    if looks_js_dependent(html):
+        raise NotStaticPageError("页面依赖JS渲染", failure_reason="not_static")
+    return html
@@ -0,0 +1,187 @@
+"""
+本地全文索引：把提取过的页面写入 SQLite FTS5，离线时也能在毫秒级别内检索
+
+页面表保存规范化URL、原始URL、标题、正文和抓取时间，FTS5 外部内容表通过触发器与其同步。
+按输出份额提前停止提取的页面只保存正文开头（complete 为 0），不会覆盖已有的完整正文。
+正文总字节数超过上限时按抓取时间删除最旧的页面，并增量回收数据库文件空间。
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from .cache import _SqliteStore, _add_column
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(tempfile.gettempdir(), "local-web-search-index.sqlite3")
+
+# 正文总字节数上限
+DEFAULT_INDEX_MAX_BYTES = 200 * 1024 * 1024
+
+# 默认分词器；中文等不以空格分词的语言可以使用 trigram（要求查询词至少 3 个字符）
+DEFAULT_TOKENIZER = "unicode61 remove_diacritics 2"
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+# FTS5 的运算符；查询按自由文本处理，不支持查询语法，这些词直接去掉
+FTS_OPERATORS = {"AND", "OR", "NOT", "NEAR"}
+
+
+def build_match_query(query: str, match_all: bool = True) -> Optional[str]:
+    """把自由文本转换为 FTS5 查询：去掉 AND/OR/NOT/NEAR，其余每个词加引号，没有词时返回None"""
+    terms = [f'"{term}"' for term in _TERM_RE.findall(query) if term not in FTS_OPERATORS]
+    if not terms:
+        return None
+    return (" " if match_all else " OR ").join(terms)
+
+
+class PageIndex(_SqliteStore):
+    """已提取页面的全文索引，以规范化URL为键"""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DEFAULT_INDEX_MAX_BYTES,
+                 tokenizer: str = DEFAULT_TOKENIZER):
+        self.path = path or DEFAULT_INDEX_PATH
+        with self._connect() as conn:
+            # 必须在切换到 WAL 和建表之前设置，删除旧页面后才能回收文件空间；对已有的数据库不起作用
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        super().__init__(self.path)
+        self.max_bytes = max_bytes
+        self.queries = 0
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    id INTEGER PRIMARY KEY,
+                    key TEXT NOT NULL UNIQUE,
+                    url TEXT NOT NULL,
+                    title TEXT,
+                    content TEXT,
+                    fetched_at REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    complete INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+            _add_column(conn, "pages", "complete", "INTEGER NOT NULL DEFAULT 1")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_fetched ON pages(fetched_at)")
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+                    title, content, content='pages', content_rowid='id', tokenize='{tokenizer}'
+                )
+            """)
+            conn.executescript("""
+                CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+                    INSERT INTO pages_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+                    INSERT INTO pages_fts(pages_fts, rowid, title, content)
+                    VALUES ('delete', old.id, old.title, old.content);
+                END;
+            """)
+            # 正文总字节数，每次写入时更新，超过上限时才需要查询和清理
+            self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def add(self, key: str, url: str, title: str, content: str, fetched_at: Optional[float] = None,
+            complete: bool = True):
+        """写入或更新一个页面，正文总字节数超过上限时删除最旧的页面
+
+        complete 为 False 表示只有正文的开头，这样的正文不覆盖已有的完整正文。
+        """
+        size = len(content.encode("utf-8")) + len((title or "").encode("utf-8"))
+        try:
+            with self._connect() as conn:
+                old = conn.execute("SELECT size, complete FROM pages WHERE key = ?", (key,)).fetchone()
+                if old and old[1] and not complete:
+                    return
+                # 先删除再插入，由触发器同步全文索引
+                conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+                conn.execute(
+                    "INSERT INTO pages (key, url, title, content, fetched_at, size, complete) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, title, content, fetched_at or time.time(), size, int(complete))
+                )
+        except sqlite3.Error as e:
+            logger.debug(f"写入本地索引失败 {url}: {str(e)}")
+            return
+        self._bytes += size - (old[0] if old else 0)
+        if self._bytes > self.max_bytes:
+            self.prune()
+
+    def prune(self) -> int:
+        """正文总字节数超过上限时删除最旧的页面，返回删除的页面数"""
+        try:
+            with self._connect() as conn:
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+                self._bytes = total
+                if total <= self.max_bytes:
+                    return 0
+                # 按抓取时间从新到旧累加大小，超出上限的部分全部删除
+                deleted = conn.execute("""
+                    DELETE FROM pages WHERE id IN (
+                        SELECT id FROM (
+                            SELECT id, SUM(size) OVER (ORDER BY fetched_at DESC, id DESC) AS running
+                            FROM pages
+                        ) WHERE running > ?
+                    )
+                """, (self.max_bytes,)).rowcount
+                self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+            with self._connect() as conn:
+                conn.execute("PRAGMA incremental_vacuum")
+        except sqlite3.Error as e:
+            logger.debug(f"清理本地索引失败: {str(e)}")
+            return 0
+        logger.debug(f"本地索引超过 {self.max_bytes} 字节，删除了 {deleted} 个最旧的页面")
+        return deleted
+
+    def search(self, query: str, limit: int = 10, max_age: Optional[float] = None,
+               match_all: bool = True) -> List[Dict[str, Any]]:
+        """按 bm25 相关度检索页面，返回 url、title、content、snippet、fetched_at、complete 和 score（越小越相关）
+
+        max_age: 只返回在这么多秒内抓取的页面
+        """
+        match = build_match_query(query, match_all)
+        if match is None:
+            return []
+        self.queries += 1
+        min_fetched = time.time() - max_age if max_age else 0
+        try:
+            with self._connect() as conn:
+                rows = conn.execute("""
+                    SELECT pages.url, pages.title, pages.content, pages.fetched_at, pages.complete,
+                           snippet(pages_fts, 1, '', '', '…', 32), bm25(pages_fts, 5.0, 1.0)
+                    FROM pages_fts JOIN pages ON pages.id = pages_fts.rowid
+                    WHERE pages_fts MATCH ? AND pages.fetched_at >= ?
+                    ORDER BY bm25(pages_fts, 5.0, 1.0)
+                    LIMIT ?
+                """, (match, min_fetched, limit)).fetchall()
+        except sqlite3.Error as e:
+            logger.debug(f"查询本地索引失败 {query}: {str(e)}")
+            return []
+        return [
+            {"url": url, "title": title, "content": content, "snippet": snippet,
+             "fetched_at": fetched_at, "complete": bool(complete), "score": round(score, 4)}
+            for url, title, content, fetched_at, complete, snippet, score in rows
+        ]
+
+    def clear(self):
+        """清空索引"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pages")
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回页面数、正文总字节数和查询次数"""
+        try:
+            with self._connect() as conn:
+                entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        except sqlite3.Error:
+            entries, total = None, None
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "queries": self.queries
+        }
@@ -1,35 +1,36 @@
 #!/usr/bin/env python3
 import os
-import sys
 import json
+import math
+import time
 import tempfile
 import asyncio
-from typing import List, Dict, Optional, Any, Set
-from urllib.parse import urlparse, urlencode
-
-import click
-from playwright.async_api import async_playwright, Page
-from bs4 import BeautifulSoup
-
-# 修复 lxml 依赖问题
-try:
-    from readability import Document
-except ImportError as e:
-    if "lxml.html.clean" in str(e):
-        print("错误: lxml.html.clean 模块现在是一个独立项目。")
-        print("请运行以下命令安装缺失的依赖:")
-        print("pip install lxml[html_clean] 或 pip install lxml_html_clean")
-        sys.exit(1)
-    else:
-        raise
+from collections import deque
+from typing import TYPE_CHECKING, List, Dict, Optional, Any, Set, Tuple, Callable, Awaitable, AsyncIterator, Deque
+from urllib.parse import urlparse, urlunparse, urlencode, parse_qsl
 
-import html2text
 import platform
 from pathlib import Path
 import logging
 
-# 设置日志级别
-logging.basicConfig(level=logging.INFO)
+from .cache import ContentCache, SerpCache
+from .circuit import HostCircuitBreaker, PageBlockedError, is_retryable
+from .index import DEFAULT_INDEX_MAX_BYTES, DEFAULT_TOKENIZER, PageIndex
+from .extraction import DEFAULT_MAX_HTML_BYTES, OVERSIZE_POLICIES, OversizedPageError, extract_html
+from .http_fetch import FETCH_MODES, NotStaticPageError, fetch_static_html
+from .scheduler import HostScheduler, HttpStatusError, parse_retry_after
+from .engines import (
+    ENGINES, ENGINE_MODES, SERP_LINK_SCRIPTS, SerpBlockedError, detect_serp_block,
+    fetch_links_hedged, fetch_links_merged
+)
+from .network_policy import NetworkPolicy, page_network, prepare_navigation
+from .dedupe import DEFAULT_DUPLICATE_THRESHOLD, simhash, find_near_duplicate
+from .metrics import observe, span, trace_query, record_retry, record_failure, record_network, classify_failure
+
+# playwright 只在启动浏览器时导入，MCP 服务器启动时不需要加载
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
 logger = logging.getLogger(__name__)
 
 # 定义类型
@@ -106,8 +107,21 @@ def find_browser(browser_name=None):
 
 # 浏览器相关功能
 async def launch_browser(show: bool = False, proxy: Optional[str] = None, 
-                         browser: Optional[str] = None, profile_path: Optional[str] = None) -> Dict[str, Any]:
-    """启动浏览器并返回浏览器实例及相关方法"""
+                         browser: Optional[str] = None, profile_path: Optional[str] = None,
+                         user_data_dir: Optional[str] = None,
+                         page_pool_size: int = 4, page_max_uses: int = 50,
+                         page_max_lifetime: float = 300.0,
+                         network_policy: Optional[NetworkPolicy] = None) -> Dict[str, Any]:
+    """启动浏览器并返回浏览器实例及相关方法
+
+    反检测脚本在上下文上设置一次，对所有页面生效；网络策略在每个新页面上通过 CDP 设置一次，
+    由浏览器按资源类型和URL模式拦截子请求（默认只放行文档，脚本可以按域名放行）；用完的页面回到 about:blank 后
+    放回空闲列表（最多 page_pool_size 个）供下次使用，页面使用 page_max_uses 次或存在
+    page_max_lifetime 秒后关闭并由新页面代替。
+    """
+    from playwright.async_api import async_playwright
+    
+    launch_started = time.perf_counter()
     p = await async_playwright().start()
     
     # 设置浏览器启动参数
@@ -122,7 +136,7 @@ async def launch_browser(show: bool = False, proxy: Optional[str] = None,
         profile_name = os.path.basename(profile_path)
         user_data_dir = profile_dir
         browser_args.append(f"--profile-directory={profile_name}")
-    else:
+    elif not user_data_dir:
         user_data_dir = os.path.join(tempfile.gettempdir(), "local-web-search-python")
         
     # 找到本地浏览器的路径
@@ -150,9 +164,68 @@ async def launch_browser(show: bool = False, proxy: Optional[str] = None,
         proxy={"server": proxy} if proxy else None
     )
     
+    # 反检测脚本对上下文中的所有页面生效，不必在每个页面上重新设置
+    await apply_stealth_scripts(browser_context)
+    if network_policy is None:
+        network_policy = NetworkPolicy()
+    observe("browser_launch", time.perf_counter() - launch_started)
+    
+    # 记录上下文是否仍然可用（浏览器崩溃或被关闭时会触发close事件）
+    state = {"alive": True}
+    browser_context.on("close", lambda _: state.update(alive=False))
+    
+    # 空闲页面：{"page", "created", "uses"}
+    idle_pages: List[Dict[str, Any]] = []
+    page_counters = {"created": 0, "reused": 0, "recycled": 0}
+    
+    async def _close_page(page: "Page"):
+        try:
+            await page.close()
+        except Exception as e:
+            logger.debug(f"关闭页面失败: {str(e)}")
+    
+    async def _take_page() -> Dict[str, Any]:
+        """取一个空闲页面，没有可用的空闲页面时新建"""
+        while idle_pages:
+            entry = idle_pages.pop()
+            if not entry["page"].is_closed():
+                page_counters["reused"] += 1
+                return entry
+        page = await browser_context.new_page()
+        page_counters["created"] += 1
+        try:
+            await network_policy.attach(browser_context, page)
+        except Exception as e:
+            # 无法使用 CDP 时不拦截子请求，页面仍然可以正常访问
+            logger.warning(f"无法设置网络策略，不拦截子请求: {str(e)}")
+        return {"page": page, "created": time.monotonic(), "uses": 0}
+    
+    async def _return_page(entry: Dict[str, Any], reusable: bool):
+        """重置页面并放回空闲列表；出错、达到使用次数或存在时间上限的页面直接关闭"""
+        page = entry["page"]
+        entry["uses"] += 1
+        expired = entry["uses"] >= page_max_uses or time.monotonic() - entry["created"] >= page_max_lifetime
+        if not reusable or expired or len(idle_pages) >= page_pool_size or not state["alive"] or page.is_closed():
+            if expired:
+                page_counters["recycled"] += 1
+            await _close_page(page)
+            return
+        try:
+            with span("page_reset"):
+                # 清除当前站点的会话存储，再离开页面：停止页面脚本和计时器，释放页面占用的内存
+                await page.evaluate("() => { try { sessionStorage.clear(); } catch (e) {} }")
+                await page.goto("about:blank", timeout=5000)
+        except Exception as e:
+            logger.debug(f"重置页面失败，关闭页面: {str(e)}")
+            await _close_page(page)
+            return
+        idle_pages.append(entry)
+    
     # 返回浏览器相关方法
     async def close():
         """关闭浏览器"""
+        state["alive"] = False
+        idle_pages.clear()
         for page in browser_context.pages:
             await page.close()
         logging.info(f"close browser")
@@ -161,30 +234,48 @@ async def launch_browser(show: bool = False, proxy: Optional[str] = None,
         await p.stop()
     
     async def with_page(fn):
-        """使用页面执行函数"""
-        page = await browser_context.new_page()
+        """使用页面执行函数，页面来自空闲列表或新建"""
+        with span("page_setup"):
+            entry = await _take_page()
         try:
-            await apply_stealth_scripts(page)
-            await intercept_requests(page)
-            logging.info(f"apply stealth scripts")
-            result = await fn(page)
-            await page.close()  # 这里只关闭页面
-            logging.info(f"close page")
-            return result
-        except Exception as e:
-            await page.close()
-            logging.info(f"close page")
-            raise e
+            result = await fn(entry["page"])
+        except BaseException:
+            # 出错的页面可能停在任意状态，不再复用
+            _report_network(entry["page"])
+            await _return_page(entry, reusable=False)
+            raise
+        _report_network(entry["page"])
+        await _return_page(entry, reusable=True)
+        return result
+    
+    def _report_network(page: "Page"):
+        """记录页面这次使用中被拦截和放行的请求数"""
+        network = page_network(page)
+        if network is not None:
+            counts = network.take_counts()
+            record_network(counts["blocked"], counts["allowed"])
+            logger.debug(f"{page.url}: 拦截 {counts['blocked']} 个请求，放行 {counts['allowed']} 个请求")
+    
+    def is_alive() -> bool:
+        """浏览器上下文是否仍然可用"""
+        return state["alive"]
+    
+    def page_stats() -> Dict[str, Any]:
+        """新建、复用和因寿命回收的页面数量"""
+        return {**page_counters, "idle": len(idle_pages)}
     
     return {
         "close": close,
-        "with_page": with_page
+        "with_page": with_page,
+        "is_alive": is_alive,
+        "page_stats": page_stats
     }
 
-async def apply_stealth_scripts(page: Page):
-    """应用反爬虫脚本"""
-    await page.add_init_script("""
-    () => {
+async def apply_stealth_scripts(target):
+    """应用反爬虫脚本（target 为页面或浏览器上下文）"""
+    # 初始化脚本按原样执行，必须是立即调用的函数
+    await target.add_init_script("""
+    (() => {
         // 隐藏WebDriver属性
         Object.defineProperty(navigator, 'webdriver', {
             get: () => undefined
@@ -210,117 +301,13 @@ async def apply_stealth_scripts(page: Page):
             parameters.name === 'notifications' 
                 ? Promise.resolve({ state: Notification.permission }) 
                 : originalQuery(parameters);
-    }
+    })();
     """)
 
-async def intercept_requests(page: Page):
-    """拦截请求，只允许文档请求通过"""
-    await page.route("**/*", lambda route: 
-        route.continue_() if route.request.resource_type == "document" 
-        else route.abort()
-    )
-
 # 搜索结果提取功能
-async def get_search_page_links(page: Page) -> List[SearchResult]:
-    """从Google搜索结果页面提取链接"""
-    return await page.evaluate("""
-    () => {
-        const links = [];
-        const document = window.document;
-
-        const isValidUrl = (url) => {
-            // Basic check, can be improved
-            return url && (url.startsWith('http://') || url.startsWith('https://'));
-        };
-
-        try {
-            // Try selecting result blocks more generally. Google often uses divs directly under #search or #rso.
-            // Let's try finding divs that contain both an h3 and an a[href].
-            const resultsContainer = document.querySelector('#search') || document.querySelector('#rso') || document.body; // Fallback to body
-            const candidates = Array.from(resultsContainer.querySelectorAll('div')); // Consider direct children or more specific divs if needed
-
-            candidates.forEach(element => {
-                // Find the first link and h3 within this div. Be mindful that structure might vary.
-                const linkElement = element.querySelector('a[href]');
-                const titleElement = element.querySelector('h3');
-
-                if (linkElement && titleElement) {
-                    const url = linkElement.getAttribute('href');
-                    const title = titleElement.textContent || "";
-
-                    // Further checks: ensure it's a plausible result link
-                    // Avoid internal links, related searches, fragments etc.
-                    if (url && isValidUrl(url) && title && url.startsWith('http') && !url.includes('google.com/') && !url.startsWith('#')) {
-
-                        // Check if we've already added a very similar URL (e.g., http vs https, slight param diffs)
-                        let urlObj;
-                        try {
-                            urlObj = new URL(url);
-                        } catch (e) {
-                            // If URL is invalid, skip
-                            console.error(`Invalid URL encountered: ${url}`);
-                            return;
-                        }
-                        const simplifiedUrl = urlObj.hostname + urlObj.pathname;
-                        const alreadyExists = links.some(l => {
-                            try {
-                                const existingUrlObj = new URL(l.url);
-                                return (existingUrlObj.hostname + existingUrlObj.pathname) === simplifiedUrl;
-                            } catch { return false; } // Ignore errors comparing potentially invalid existing URLs
-                        });
-
-                        if (!alreadyExists) {
-                            links.push({ title: title.trim(), url: url });
-                        }
-                    }
-                }
-            });
-
-            // Fallback if the general approach yields no results
-            if (links.length === 0) {
-                 console.log("Primary selector logic failed, trying fallback class selectors...");
-                 // Example fallback selectors (these WILL change frequently and need updates)
-                 // Combine common older and newer patterns observed over time. Inspect page source for current ones.
-                 document.querySelectorAll('div.g, div.Gx5Zad, div.DhN8Cf, div.tF2Cxc, [data-hveid]').forEach(element => { // Added [data-hveid] as another potential container attribute
-                     const linkElement = element.querySelector('a[href]');
-                     const titleElement = element.querySelector('h3');
-
-                     if (linkElement && titleElement) {
-                         const url = linkElement.getAttribute('href');
-                         const title = titleElement.textContent || "";
-                         if (url && isValidUrl(url) && title && url.startsWith('http') && !url.includes('google.com/') && !url.startsWith('#')) {
-                             let urlObj;
-                             try {
-                                 urlObj = new URL(url);
-                             } catch (e) {
-                                 console.error(`Invalid URL encountered in fallback: ${url}`);
-                                 return;
-                             }
-                             const simplifiedUrl = urlObj.hostname + urlObj.pathname;
-                             const alreadyExists = links.some(l => {
-                                try {
-                                    const existingUrlObj = new URL(l.url);
-                                    return (existingUrlObj.hostname + existingUrlObj.pathname) === simplifiedUrl;
-                                } catch { return false; }
-                             });
-                             if (!alreadyExists) {
-                                 links.push({ title: title.trim(), url: url });
-                             }
-                         }
-                     }
-                 });
-            }
-
-        } catch (error) {
-            console.error('Error extracting links:', error);
-        }
-
-        // Limit the number of results explicitly here if needed, although search URL param 'num' should handle it.
-        // return links.slice(0, 10); // Example limit if too many irrelevant results are caught
-
-        return links;
-    }
-    """)
+async def get_search_page_links(page: "Page", engine: str = "google") -> List[SearchResult]:
+    """从搜索结果页面提取链接，按搜索引擎使用不同的提取脚本"""
+    return await page.evaluate(SERP_LINK_SCRIPTS.get(engine.lower(), SERP_LINK_SCRIPTS["google"]))
 
 def should_skip_domain(url: str) -> bool:
     """判断是否应该跳过某些域名"""
@@ -346,25 +333,111 @@ def should_skip_domain(url: str) -> bool:
     except:
         return True
 
-def get_search_url(query: str, engine: str = "google", exclude_domains: List[str] = None, max_results: int = 10) -> str:
-    """构建搜索URL，支持多个搜索引擎"""
+def is_excluded_domain(url: str, exclude_domains: List[str]) -> bool:
+    """URL 是否属于排除的域名（包括子域名），用于不经过搜索引擎 -site: 过滤的本地结果"""
+    host = (urlparse(url).hostname or "").lower()
+    for domain in exclude_domains:
+        domain = domain.strip().lower().lstrip(".")
+        if domain and (host == domain or host.endswith("." + domain)):
+            return True
+    return False
+
+# 不影响页面内容的跟踪参数
+TRACKING_PARAMS = {
+    "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "twclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "oly_anon_id", "oly_enc_id", "vero_id", "wickedid",
+    "ref_src", "ref_url", "spm", "scid", "srsltid", "cmpid", "ncid"
+}
+TRACKING_PARAM_PREFIXES = ("utm_", "pk_", "hsa_")
+
+def canonicalize_url(url: str) -> str:
+    """规范化URL，用作已访问集合和缓存的键
+
+    指向同一页面的不同写法得到相同的键：忽略 http/https、www. 前缀、默认端口、
+    末尾斜杠、片段和跟踪参数，其余查询参数按名称排序。
+    """
+    try:
+        parsed = urlparse(url.strip())
+        hostname = (parsed.hostname or "").lower()
+        port = parsed.port
+    except ValueError:
+        return url
+    if hostname.startswith("www."):
+        hostname = hostname[4:]
+    if port and port not in (80, 443):
+        hostname = f"{hostname}:{port}"
+    
+    path = parsed.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+    
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    scheme = parsed.scheme.lower()
+    return urlunparse((
+        "https" if scheme in ("http", "https") else scheme,
+        hostname,
+        path,
+        parsed.params,
+        urlencode(query),
+        ""  # 去掉片段
+    ))
+
+# 每个结果至少分到的字符数，太少的正文对调用方没有意义
+MIN_RESULT_CHARS = 200
+
+def allocate_output_budget(budget: int, count: int) -> List[int]:
+    """把输出预算按排名分给 count 个结果：每个结果先分到保底的字符数，
+    其余按权重分配，第 i 个结果（从0开始）的权重为 1/(i+1)，总和不超过预算"""
+    if count <= 0:
+        return []
+    # 保底最多占预算的一半，其余一半按排名加权，预算较小时也保持排名差异
+    floor = min(MIN_RESULT_CHARS, budget // (2 * count))
+    weights = [1 / (rank + 1) for rank in range(count)]
+    total = sum(weights)
+    return [floor + int((budget - floor * count) * weight / total) for weight in weights]
+
+# 各搜索引擎的默认地址；设置环境变量 LOCAL_WEB_SEARCH_BASE_URL 可以把所有引擎指向同一个地址（例如基准测试的本地服务器）
+SEARCH_BASE_URLS = {
+    "google": "https://www.google.com",
+    "bing": "https://www.bing.com",
+    # 使用不依赖脚本的静态版本，页面脚本会被拦截
+    "duckduckgo": "https://html.duckduckgo.com",
+}
+
+# DuckDuckGo 静态版本每页的结果数，不支持指定数量
+DUCKDUCKGO_PAGE_SIZE = 30
+
+def get_search_url(query: str, engine: str = "google", exclude_domains: List[str] = None, max_results: int = 10,
+                   base_url: Optional[str] = None, page: int = 0) -> str:
+    """构建搜索URL，支持多个搜索引擎；page 为结果页序号（从0开始），每页 max_results 个结果"""
     if exclude_domains is None:
         exclude_domains = []
     
     exclude_clause = " ".join([f"-site:{domain}" for domain in exclude_domains])
     search_query = f"{exclude_clause} {query}" if exclude_domains else query
     
-    if engine.lower() == "bing":
+    engine = engine.lower() if engine.lower() in SEARCH_BASE_URLS else "google"
+    base_url = (base_url or os.environ.get("LOCAL_WEB_SEARCH_BASE_URL") or SEARCH_BASE_URLS[engine]).rstrip("/")
+    
+    if engine == "bing":
         params = {
             "q": search_query,
             "count": str(max_results)
         }
-        return f"https://www.bing.com/search?{urlencode(params)}"
-    elif engine.lower() == "duckduckgo":
+        if page:
+            params["first"] = str(page * max_results + 1)
+        return f"{base_url}/search?{urlencode(params)}"
+    elif engine == "duckduckgo":
         params = {
             "q": search_query
         }
-        return f"https://duckduckgo.com/?{urlencode(params)}"
+        if page:
+            params["s"] = str(page * DUCKDUCKGO_PAGE_SIZE)
+            params["dc"] = str(page * DUCKDUCKGO_PAGE_SIZE + 1)
+        return f"{base_url}/html/?{urlencode(params)}"
     else:  # 默认Google
         params = {
             "q": search_query,
@@ -372,133 +445,762 @@ def get_search_url(query: str, engine: str = "google", exclude_domains: List[str
             "udm": "14",  # web标签
             "lr": "lang_en"
         }
-        return f"https://www.google.com/search?{urlencode(params)}"
+        if page:
+            params["start"] = str(page * max_results)
+        return f"{base_url}/search?{urlencode(params)}"
+
+# 页面就绪检测：DOM 在 quietMs 内没有变化且文本长度稳定时视为就绪，最多等待 maxMs
+PAGE_READY_SCRIPT = """
+({ quietMs, maxMs }) => new Promise(resolve => {
+    const start = performance.now();
+    const textLength = () => (document.body ? document.body.textContent.length : 0);
+
+    // 没有脚本且已加载完成的静态页面不会再变化，直接提取
+    if (document.readyState === 'complete' && document.scripts.length === 0) {
+        resolve({ reason: 'static', waited: 0, length: textLength() });
+        return;
+    }
+
+    let lastChange = start;
+    let lastLength = textLength();
+    const observer = new MutationObserver(() => { lastChange = performance.now(); });
+    observer.observe(document.documentElement, { childList: true, subtree: true, characterData: true });
+
+    const timer = setInterval(() => {
+        const now = performance.now();
+        const length = textLength();
+        if (length !== lastLength) {
+            lastLength = length;
+            lastChange = now;
+        }
+        if (now - lastChange >= quietMs && document.readyState !== 'loading') {
+            done('stable', length);
+        } else if (now - start >= maxMs) {
+            done('timeout', length);
+        }
+    }, 50);
+
+    function done(reason, length) {
+        clearInterval(timer);
+        observer.disconnect();
+        resolve({ reason, waited: performance.now() - start, length });
+    }
+})
+"""
+
+# 读取页面HTML，超过 limit 时只把前 limit 个字符传回（或不传回），过大的页面不必整个经过CDP
+PAGE_HTML_SCRIPT = """
+({ limit, truncate }) => {
+    const html = document.documentElement.outerHTML;
+    if (html.length <= limit) {
+        return { html, length: html.length };
+    }
+    return { html: truncate ? html.slice(0, limit) : null, length: html.length };
+}
+"""
+
+# 正文少于这么多字符时检查结果页是否为验证码或人机验证页
+BLOCK_CHECK_MAX_CHARS = 1000
+
+# 原来固定等待的时长（秒），用于统计节省的时间
+FIXED_READY_WAIT = 2.0
+
+# 打开结果页的导航超时（秒）
+PAGE_GOTO_TIMEOUT = 30.0
+
+# HTTP快速通道的请求超时（秒）
+HTTP_FETCH_TIMEOUT = 15.0
 
-async def extract_content(page: Page) -> Dict[str, str]:
-    """提取页面内容，改进版"""
+async def wait_for_page_ready(page: "Page", max_wait: float = FIXED_READY_WAIT, quiet_period: float = 0.25) -> Dict[str, Any]:
+    """等待页面主体内容稳定，静态页面立即返回，动态页面最多等待 max_wait 秒"""
+    await page.wait_for_selector("body", timeout=10000)
+    state = await page.evaluate(PAGE_READY_SCRIPT, {
+        "quietMs": quiet_period * 1000,
+        "maxMs": max_wait * 1000
+    })
+    logger.debug(
+        f"页面就绪 {page.url}: {state['reason']}，等待 {state['waited']:.0f}ms，"
+        f"比固定等待节省 {FIXED_READY_WAIT * 1000 - state['waited']:.0f}ms"
+    )
+    return state
+
+async def extract_content(page: "Page", ready_timeout: float = FIXED_READY_WAIT,
+                          max_chars: Optional[int] = None,
+                          max_html_bytes: Optional[int] = DEFAULT_MAX_HTML_BYTES,
+                          oversize_policy: str = "truncate") -> Dict[str, str]:
+    """提取页面内容，改进版；max_chars 限制正文长度，超出部分不做转换
+
+    max_html_bytes: 页面HTML的大小上限（浏览器中按字符数计），超过时截断，
+    oversize_policy 为 skip 时抛出 OversizedPageError
+    """
     # 等待页面加载完成
     try:
-        # 等待主体内容加载
-        await page.wait_for_selector("body", timeout=10000)
-        
-        # 尝试等待可能的动态内容加载
-        await asyncio.sleep(2)
+        # 等待主体内容加载并稳定
+        with span("page_ready"):
+            await wait_for_page_ready(page, max_wait=ready_timeout)
     except:
         pass
     
-    # 获取页面内容
-    content = await page.content()
-    
-    # 使用readability提取主要内容
-    doc = Document(content)
-    article_html = doc.summary()
-    title = doc.title()
+    # 获取页面内容，浏览器只负责提供HTML
+    with span("page_content"):
+        if max_html_bytes:
+            html = await page.evaluate(PAGE_HTML_SCRIPT, {
+                "limit": max_html_bytes,
+                "truncate": oversize_policy == "truncate"
+            })
+            if html["html"] is None:
+                raise OversizedPageError(page.url, html["length"], max_html_bytes)
+            if html["length"] > max_html_bytes:
+                logger.debug(f"页面HTML超过 {max_html_bytes} 字符，截断后提取: {page.url}")
+            content = html["html"]
+        else:
+            content = await page.content()
     
-    # 删除不必要的元素（广告、导航等）
-    soup = BeautifulSoup(article_html, 'html.parser')
-    for selector in ['nav', '.ad', '.ads', '.advert', '.cookie-notice', '.popup', 'iframe']:
-        for element in soup.select(selector):
-            element.decompose()
-    
-    # 转换为纯文本
-    converter = html2text.HTML2Text()
-    converter.ignore_links = False
-    converter.ignore_images = True
-    converter.body_width = 0  # 不限制宽度
-    text_content = converter.handle(str(soup))
-    
-    return {
-        "title": title,
-        "content": text_content
-    }
+    # readability/BeautifulSoup/html2text 在提取执行器中运行，不阻塞事件循环
+    return await extract_html(content, max_chars)
+
+async def _fetch_link_over_http(url: str, host_scheduler: Optional[HostScheduler] = None,
+                                deadline: Optional[float] = None,
+                                max_chars: Optional[int] = None,
+                                max_html_bytes: Optional[int] = DEFAULT_MAX_HTML_BYTES,
+                                oversize_policy: str = "truncate",
+                                fallback: bool = True) -> Optional[Dict[str, str]]:
+    """通过HTTP快速通道获取并提取页面，提取为空时返回None；页面过大且策略为 skip 时抛出 OversizedPageError
+
+    fallback: 之后还会用浏览器再试时为 True，页面不适合或请求出错时返回None；
+    只用HTTP时为 False，直接抛出失败（带状态码或 timeout/network 原因），由调用方记录失败原因
+    """
+    remaining = _remaining(deadline)
+    timeout = min(HTTP_FETCH_TIMEOUT, remaining) if remaining is not None else None
+    try:
+        with span("http_fetch"):
+            html = await fetch_static_html(url, timeout=timeout, max_bytes=max_html_bytes,
+                                           oversize_policy=oversize_policy)
+    except NotStaticPageError as e:
+        logger.debug(f"HTTP快速通道不可用 {url}: {str(e)}")
+        if host_scheduler:
+            host_scheduler.report(url, e.status, e.retry_after)
+        if fallback:
+            return None
+        if e.failure_reason == "timeout" and timeout is not None and timeout < HTTP_FETCH_TIMEOUT:
+            # 超时被时间预算收缩过，不算主机的失败
+            raise TimeBudgetExceededError(url) from e
+        raise
+    except OversizedPageError:
+        raise
+    except Exception as e:
+        # 无效URL、重定向过多、解码失败等没有状态码的错误，交给浏览器再试
+        logger.debug(f"HTTP快速通道请求失败 {url}: {type(e).__name__}: {str(e)}")
+        if fallback:
+            return None
+        raise
+    if host_scheduler:
+        host_scheduler.report(url, 200)
+    content = await extract_html(html, max_chars)
+    if not content.get("content", "").strip():
+        return None
+    return content
 
 # 主搜索功能
 async def search(browser, query: str, max_results: int = 10, 
                exclude_domains: List[str] = None, 
                truncate: Optional[int] = None,
                visited_urls: Set[str] = None,
-               concurrency: int = 5) -> Dict[str, Any]:
-    """执行搜索并返回结果"""
+               concurrency: int = 5,
+               content_cache: Optional[ContentCache] = None,
+               serp_cache: Optional[SerpCache] = None,
+               refresh_serp: bool = False,
+               ready_timeout: float = FIXED_READY_WAIT,
+               fetch_mode: str = "browser",
+               on_result: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+               semaphore: Optional[asyncio.Semaphore] = None,
+               host_scheduler: Optional[HostScheduler] = None,
+               engine: str = "google",
+               fallback_engines: Optional[List[str]] = None,
+               engine_mode: str = "single",
+               hedge_delay: float = 3.0,
+               time_budget: Optional[float] = None,
+               fingerprints: List[int] = None,
+               dedupe_threshold: Optional[int] = DEFAULT_DUPLICATE_THRESHOLD,
+               output_budget: Optional[int] = None,
+               page_index: Optional[PageIndex] = None,
+               local_first: bool = False,
+               local_min_results: Optional[int] = None,
+               local_max_age: Optional[float] = None,
+               max_html_bytes: Optional[int] = DEFAULT_MAX_HTML_BYTES,
+               oversize_policy: str = "truncate",
+               circuit_breaker: Optional[HostCircuitBreaker] = None,
+               overfetch: float = 1.5,
+               max_serp_pages: int = 3,
+               speculative_visits: int = 1,
+               metrics: bool = False) -> Dict[str, Any]:
+    """执行搜索并返回结果
+
+    fetch_mode: browser（总是用浏览器打开结果页）、http（只用HTTP获取）
+    或 auto（先用HTTP获取，页面依赖JS渲染或请求失败时再用浏览器）
+    on_result: 每个结果提取完成时调用的回调，用于在全部完成前报告进度
+    semaphore: 多个查询共享的并发额度，传入时忽略 concurrency
+    host_scheduler: 按主机限制并发和请求间隔的调度器，多个查询之间应共享
+    engine_mode: single（只用 engine）、hedged（engine 超过 hedge_delay 秒未返回、失败或被拦截时
+    依次启动 fallback_engines，取最先返回的结果）或 merge（同时查询所有引擎并合并结果）
+    time_budget: 整个搜索的时间预算（秒），用尽时取消未完成的页面并返回已完成的结果，
+    返回值中 timed_out 为 True，skipped 列出未完成的URL
+    visited_urls: 已访问的URL（规范化后的键），多个查询共享时重复的页面只访问一次
+    fingerprints: 已返回页面的正文指纹，与 visited_urls 一样可以在多个查询之间共享
+    dedupe_threshold: 正文指纹的汉明距离不超过该值时视为近似重复（转载、镜像）并丢弃，None 表示不去重
+    output_budget: 所有结果正文加起来的字符数上限，按结果完成的先后分配（先完成的分得更多，
+    排名靠前的链接失败或重复时份额留给其他结果），提取时超出份额的部分不做转换；
+    返回值中 budget 给出每个结果的字符数和跳过的字符数
+    page_index: 本地全文索引，新提取的页面会写入其中
+    local_first: 为 True 时先从 page_index 中检索，得到至少 local_min_results（默认为 max_results）个结果时
+    不再打开搜索页，否则用搜索页的结果补足；本地结果排在前面，带有 source="local" 和 fetched_at
+    local_max_age: 本地优先时只使用在这么多秒内抓取的页面
+    max_html_bytes: 页面HTML的大小上限，None 表示不限制；超过时按 oversize_policy 处理：
+    truncate（只提取前 max_html_bytes 字节）或 skip（放弃该页面，失败原因记为 oversize）
+    circuit_breaker: 按主机的熔断器，熔断中的主机的链接直接跳过（失败原因记为 circuit_open），
+    每个页面的成功和失败都会报告给它；多个查询之间应共享
+    overfetch: 搜索结果页每页请求 max_results * overfetch 个链接，被跳过、失败或重复的链接由多取的候选补上，
+    目标是返回 max_results 个成功的结果，达到后立即停止
+    max_serp_pages: 候选链接不够时最多翻到第几页，下一页在访问进行中并发获取
+    speculative_visits: 在还需要的结果数之外多访问的候选数，减少失败后再补访问的等待
+    metrics: 为 True 时返回值中 metrics 给出该查询各阶段的耗时、重试次数和失败原因
+    """
+    status = {}
+    collected = []
+    with trace_query(query) as trace:
+        async for rank, result in _search_stream(
+            browser, query, max_results=max_results, exclude_domains=exclude_domains,
+            truncate=truncate, visited_urls=visited_urls, concurrency=concurrency,
+            content_cache=content_cache, serp_cache=serp_cache, refresh_serp=refresh_serp,
+            ready_timeout=ready_timeout, fetch_mode=fetch_mode, semaphore=semaphore,
+            host_scheduler=host_scheduler, engine=engine, fallback_engines=fallback_engines,
+            engine_mode=engine_mode, hedge_delay=hedge_delay, time_budget=time_budget,
+            fingerprints=fingerprints, dedupe_threshold=dedupe_threshold, output_budget=output_budget,
+            page_index=page_index, local_first=local_first, local_min_results=local_min_results,
+            local_max_age=local_max_age, max_html_bytes=max_html_bytes, oversize_policy=oversize_policy,
+            circuit_breaker=circuit_breaker, overfetch=overfetch, max_serp_pages=max_serp_pages,
+            speculative_visits=speculative_visits, status=status
+        ):
+            collected.append((rank, result))
+            if on_result:
+                await on_result(result)
+    
+    # 按搜索结果页中的顺序返回
+    collected.sort(key=lambda item: item[0])
+    final_results = {
+        "query": query,
+        "results": [result for _, result in collected]
+    }
+    if status.get("timed_out"):
+        final_results["timed_out"] = True
+        final_results["skipped"] = status.get("skipped", [])
+    if output_budget:
+        usage = [{key: value for key, value in item.items() if key != "rank"}
+                 for item in sorted(status.get("budget", []), key=lambda item: item["rank"])]
+        final_results["budget"] = {
+            "limit": output_budget,
+            "used": sum(item["chars"] for item in usage),
+            "skipped_chars": sum(item["skipped_chars"] for item in usage),
+            "per_result": usage
+        }
+    if metrics:
+        final_results["metrics"] = trace.summary()
+    
+    # 只在调试模式下输出最终结果
+    logger.debug(json.dumps(final_results, ensure_ascii=False))
+    
+    return final_results
+
+async def search_many(browser, queries: List[str], concurrency: int = 5,
+                      visited_urls: Set[str] = None,
+                      fingerprints: List[int] = None,
+                      on_result: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+                      **options) -> List[Dict[str, Any]]:
+    """并发执行多个查询，按查询分组返回结果
+
+    所有查询的搜索页和结果页共享同一个并发额度；visited_urls 和 fingerprints 在所有查询间共享，
+    哪个查询的搜索页先返回，重复的链接就归哪个查询，近似重复的正文只返回最先完成的一份。
+    on_result 以 (查询, 结果) 调用；其余参数与 search 相同。
+    """
+    if visited_urls is None:
+        visited_urls = set()
+    if fingerprints is None:
+        fingerprints = []
+    if options.get("host_scheduler") is None:
+        options["host_scheduler"] = HostScheduler()
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    def result_callback(query):
+        if on_result is None:
+            return None
+        return lambda result: on_result(query, result)
+    
+    return await asyncio.gather(*[
+        search(browser, query, visited_urls=visited_urls, fingerprints=fingerprints, semaphore=semaphore,
+               on_result=result_callback(query), **options)
+        for query in queries
+    ])
+
+async def search_iter(browser, query: str, **options) -> AsyncIterator[Dict[str, Any]]:
+    """执行搜索，每个结果提取完成后立即产出（按完成顺序），参数与 search 相同"""
+    async for _, result in _search_stream(browser, query, **options):
+        yield result
+
+async def _search_stream(browser, query: str, max_results: int = 10, 
+                         exclude_domains: List[str] = None, 
+                         truncate: Optional[int] = None,
+                         visited_urls: Set[str] = None,
+                         concurrency: int = 5,
+                         content_cache: Optional[ContentCache] = None,
+                         serp_cache: Optional[SerpCache] = None,
+                         refresh_serp: bool = False,
+                         ready_timeout: float = FIXED_READY_WAIT,
+                         fetch_mode: str = "browser",
+                         semaphore: Optional[asyncio.Semaphore] = None,
+                         host_scheduler: Optional[HostScheduler] = None,
+                         engine: str = "google",
+                         fallback_engines: Optional[List[str]] = None,
+                         engine_mode: str = "single",
+                         hedge_delay: float = 3.0,
+                         time_budget: Optional[float] = None,
+                         fingerprints: List[int] = None,
+                         dedupe_threshold: Optional[int] = DEFAULT_DUPLICATE_THRESHOLD,
+                         output_budget: Optional[int] = None,
+                         page_index: Optional[PageIndex] = None,
+                         local_first: bool = False,
+                         local_min_results: Optional[int] = None,
+                         local_max_age: Optional[float] = None,
+                         max_html_bytes: Optional[int] = DEFAULT_MAX_HTML_BYTES,
+                         oversize_policy: str = "truncate",
+                         circuit_breaker: Optional[HostCircuitBreaker] = None,
+                         overfetch: float = 1.5,
+                         max_serp_pages: int = 3,
+                         speculative_visits: int = 1,
+                         status: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """搜索流水线：按完成顺序产出 (结果在搜索结果页中的序号, 结果)
+
+    status: 传入的字典会被写入 timed_out（时间预算是否用尽）、skipped（未完成的URL）
+    和 budget（有 output_budget 时每个结果的字符数、份额和跳过的字符数）
+    """
+    if fetch_mode not in FETCH_MODES:
+        raise ValueError(f"不支持的获取方式: {fetch_mode}，可选值: {', '.join(FETCH_MODES)}")
+    if engine_mode not in ENGINE_MODES:
+        raise ValueError(f"不支持的搜索引擎模式: {engine_mode}，可选值: {', '.join(ENGINE_MODES)}")
+    if oversize_policy not in OVERSIZE_POLICIES:
+        raise ValueError(f"不支持的超大页面策略: {oversize_policy}，可选值: {', '.join(OVERSIZE_POLICIES)}")
+    for name in [engine] + list(fallback_engines or []):
+        if name not in ENGINES:
+            raise ValueError(f"不支持的搜索引擎: {name}，可选值: {', '.join(ENGINES)}")
+
     if visited_urls is None:
         visited_urls = set()
     
+    if fingerprints is None:
+        fingerprints = []
+    
     if exclude_domains is None:
         exclude_domains = []
     
-    # 构建搜索URL
-    url = get_search_url(query, exclude_domains=exclude_domains, max_results=max_results)
+    if status is None:
+        status = {}
+    status.update(timed_out=False, skipped=[], budget=[])
+    
+    # 时间预算换算成截止时间，后续的超时和重试都按剩余时间收缩
+    deadline = time.monotonic() + time_budget if time_budget else None
+    
+    # 使用传入的concurrency参数创建信号量，多个查询共享时由调用方传入
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(concurrency)
+    
+    # 同一主机的请求（包括搜索引擎）按主机限速
+    if host_scheduler is None:
+        host_scheduler = HostScheduler()
+    
+    # 每个结果的正文字符数上限：输出预算分成 max_results 份，按结果完成的先后依次分配（第一个完成的结果分得最多），
+    # 与 truncate 同时指定时取较小值。排名靠前的链接失败或重复时，它的份额留给之后完成的结果；
+    # 份额随序号递减，返回的结果不超过 max_results 个，份额之和不超过预算
+    shares = allocate_output_budget(output_budget, max_results) if output_budget else []
+    finished = 0
+    
+    def limit_for(position: int) -> Optional[int]:
+        """第 position 个完成的结果（从0开始）的正文上限"""
+        share = shares[min(position, len(shares) - 1)] if shares else None
+        if share is None:
+            return truncate
+        return min(share, truncate) if truncate else share
+    
+    def finish(rank, link, content, skipped_chars=0):
+        """确定一个结果：分配下一份份额并截断正文"""
+        nonlocal finished
+        limit = limit_for(finished)
+        finished += 1
+        skipped_chars += truncate_to_limit(limit, content)
+        if output_budget:
+            status["budget"].append({
+                "rank": rank,
+                "url": link["url"],
+                "share": limit,
+                "chars": len(content["content"]),
+                "skipped_chars": skipped_chars
+            })
+        return rank, {**link, **content}
+    
+    def truncate_to_limit(limit: Optional[int], content) -> int:
+        """把正文截断到上限，返回截掉的字符数"""
+        if limit is None:
+            return 0
+        skipped_chars = max(0, len(content["content"]) - limit)
+        content["content"] = content["content"][:limit]
+        return skipped_chars
+    
+    def covers(content: Dict[str, Any], limit: Optional[int]) -> bool:
+        """缓存或索引中的正文是否够用：完整的正文，或只有开头但不短于需要的上限"""
+        return content.get("complete", True) or (limit is not None and len(content["content"]) >= limit)
+    
+    async def is_duplicate(url: str, text: str) -> bool:
+        """正文与已返回的页面近似重复时返回True，否则记录该页面的指纹"""
+        if dedupe_threshold is None:
+            return False
+        fingerprint = await asyncio.to_thread(simhash, text)
+        if fingerprint is None:
+            return False
+        # 查找和加入指纹之间没有 await，并发完成的两个重复页面只会保留一个
+        if find_near_duplicate(fingerprint, fingerprints, dedupe_threshold) is not None:
+            logger.debug(f"丢弃近似重复的页面: {url}")
+            record_failure("near_duplicate")
+            return True
+        fingerprints.append(fingerprint)
+        return False
     
-    # 获取搜索结果链接
-    links = await browser["with_page"](lambda page: _search_page(page, url))
+    # 本地优先：先从本地索引取结果，数量足够时不再打开搜索页
+    local_count = 0
+    if page_index and local_first:
+        with span("local_search"):
+            hits = await asyncio.to_thread(page_index.search, query, max_results, local_max_age)
+        for hit in hits:
+            key = canonicalize_url(hit["url"])
+            if key in visited_urls or should_skip_domain(hit["url"]) or is_excluded_domain(hit["url"], exclude_domains):
+                continue
+            if not covers(hit, limit_for(finished)):
+                # 索引中只有正文开头，不够这个结果的份额，留给搜索重新提取
+                continue
+            visited_urls.add(key)
+            if await is_duplicate(hit["url"], hit["content"]):
+                continue
+            content = {"title": hit["title"], "content": hit["content"], "fetched_at": hit["fetched_at"],
+                       "source": "local"}
+            yield finish(local_count, {"url": hit["url"]}, content)
+            local_count += 1
+        if local_count >= (local_min_results or max_results):
+            logger.info(f"本地索引返回 {local_count} 个结果，不再搜索: {query}")
+            return
+    
+    # 每页多取一些链接，跳过、失败和重复的链接由后面的候选补上
+    serp_size = max(max_results, math.ceil(max_results * overfetch))
+    
+    # 获取某个搜索引擎第 page 页的结果链接（命中缓存时不再打开搜索页）
+    async def fetch_engine_links(engine_name: str, page: int = 0) -> List[Dict[str, str]]:
+        # 构建搜索URL
+        url = get_search_url(query, engine=engine_name, exclude_domains=exclude_domains, max_results=serp_size,
+                             page=page)
+        
+        async def fetch_links():
+            async with host_scheduler.slot(url), semaphore:
+                try:
+                    return await browser["with_page"](lambda page: _search_page(page, url, host_scheduler, engine_name))
+                except Exception as e:
+                    record_failure(f"serp_{classify_failure(e)}")
+                    raise
+        
+        if serp_cache:
+            key = SerpCache.make_key(query, engine_name, exclude_domains, serp_size, page)
+            return await serp_cache.get_or_fetch(key, fetch_links, refresh=refresh_serp)
+        return await fetch_links()
+    
+    async def fetch_serp_links(page: int = 0) -> List[Dict[str, str]]:
+        engines = [engine] + [name for name in (fallback_engines or [e for e in ENGINES if e != engine]) if name != engine]
+        fetch = lambda engine_name: fetch_engine_links(engine_name, page)
+        if engine_mode == "hedged":
+            used_engine, links = await fetch_links_hedged(fetch, engines, hedge_delay)
+            logger.info(f"hedged search answered by {used_engine}")
+            return links
+        if engine_mode == "merge":
+            return await fetch_links_merged(fetch, engines, serp_size)
+        return await fetch(engine)
+    
+    async def fetch_next_page(page: int) -> List[Dict[str, str]]:
+        """获取后续的搜索结果页，失败时返回空列表（不再翻页）"""
+        try:
+            with span("serp_total"):
+                return await fetch_serp_links(page)
+        except Exception as e:
+            logger.info(f"获取第 {page + 1} 页搜索结果失败: {str(e)}")
+            return []
+    
+    try:
+        with span("serp_total"):
+            links = await asyncio.wait_for(fetch_serp_links(), timeout=_remaining(deadline))
+    except asyncio.TimeoutError:
+        logger.info(f"时间预算在获取搜索结果页时用尽: {query}")
+        status["timed_out"] = True
+        return
     logging.info(f"search_page_links: {links}")
     if not links:
-        return {"query": query, "results": []}
+        return
     
-    # 过滤已访问链接和需要跳过的域名
-    filtered_links = []
-    for link in links:
-        if link["url"] in visited_urls or should_skip_domain(link["url"]):
-            continue
-        visited_urls.add(link["url"])
-        filtered_links.append(link)
+    # 候选链接：过滤需要跳过的域名和已访问的链接，按规范化的URL判断，跟踪参数、http/https、www. 等不同写法只访问一次。
+    # 候选链接在开始访问时才加入 visited_urls，多取的链接没有用到时，批量搜索中的其他查询仍然可以访问；
+    # 开始访问但结果没有用到的链接在结束时移除
+    candidates: Deque[Dict[str, str]] = deque()
+    queued_keys: Set[str] = set()
     
-    if not filtered_links:
-        return {"query": query, "results": []}
+    def add_candidates(new_links: List[Dict[str, str]]):
+        for link in new_links:
+            key = canonicalize_url(link["url"])
+            if key in visited_urls or key in queued_keys or should_skip_domain(link["url"]):
+                continue
+            queued_keys.add(key)
+            candidates.append(link)
+    
+    add_candidates(links)
     
     # 只在调试模式下输出初始搜索结果
     logger.debug(json.dumps({
         "query": query, 
-        "results": filtered_links
+        "results": list(candidates)
     }, ensure_ascii=False))
     
-    # 使用传入的concurrency参数创建信号量
-    semaphore = asyncio.Semaphore(concurrency)
-    
-    async def process_link(link):
-        async with semaphore:
+    async def process_link(rank, link, extract_limit):
+        """访问一个链接，成功时返回 (序号, (链接, 内容, 提取时跳过的字符数))，失败或重复时返回 (序号, None)
+
+        extract_limit: 这个结果最多能分到的份额，超出部分提取时不做转换；
+        这样提取的正文写入缓存和本地索引时标记为不完整，需要更长的正文时会重新提取
+        """
+        cache_key = canonicalize_url(link["url"])
+        if content_cache:
+            with span("cache_lookup"):
+                cached = await asyncio.to_thread(content_cache.get, cache_key)
+            if cached and cached.get("content") and covers(cached, extract_limit):
+                logger.debug(f"Content cache hit: {link['url']}")
+                del cached["complete"]
+                if await is_duplicate(link["url"], cached["content"]):
+                    return rank, None
+                return rank, (link, cached, 0)
+        
+        # 先等主机额度再占用全局额度，排队等待某个主机时不会挡住其他主机
+        async with host_scheduler.slot(link["url"]), semaphore:
             try:
-                content = await browser["with_page"](lambda page: _visit_link_with_retry(page, link["url"]))
+                content = None
+                if fetch_mode in ("http", "auto"):
+                    content = await _fetch_link_over_http(link["url"], host_scheduler, deadline, extract_limit,
+                                                          max_html_bytes, oversize_policy,
+                                                          fallback=fetch_mode == "auto")
+                    if content is None and fetch_mode == "auto":
+                        record_retry("http_fallback")
+                if content is None and fetch_mode != "http":
+                    await host_scheduler.wait_for_backoff(link["url"])
+                    content = await browser["with_page"](lambda page: _visit_link_with_retry(
+                        page, link["url"], ready_timeout=ready_timeout, host_scheduler=host_scheduler,
+                        deadline=deadline, max_chars=extract_limit,
+                        max_html_bytes=max_html_bytes, oversize_policy=oversize_policy
+                    ))
                 if content and content.get("content"):
-                    if truncate:
-                        content["content"] = content["content"][:truncate]
-                    return {**link, **content}
+                    skipped_chars = content.pop("skipped_chars", 0)
+                    complete = skipped_chars == 0
+                    if content_cache:
+                        await asyncio.to_thread(content_cache.set, cache_key, content["title"], content["content"],
+                                                complete)
+                    if page_index:
+                        await asyncio.to_thread(page_index.add, cache_key, link["url"], content["title"],
+                                                content["content"], None, complete)
+                    if circuit_breaker:
+                        await asyncio.to_thread(circuit_breaker.record_success, link["url"])
+                    if await is_duplicate(link["url"], content["content"]):
+                        return rank, None
+                    return rank, (link, content, skipped_chars)
+                reason = "empty"
             except Exception as e:
                 logger.debug(f"Error visiting {link['url']}: {str(e)}")
-            return None
+                reason = classify_failure(e)
+            record_failure(reason)
+            if circuit_breaker and _remaining(deadline) != 0:
+                # 时间预算用尽时的失败不计入熔断
+                await asyncio.to_thread(circuit_breaker.record_failure, link["url"], reason)
+            return rank, None
     
-    # 使用asyncio.gather处理所有链接
-    results = await asyncio.gather(*[process_link(link) for link in filtered_links])
-    results = [r for r in results if r]  # 过滤掉None结果
+    # 目标是 target 个成功的结果：先并发访问 target + speculative_visits 个候选，每有一个失败就补上下一个候选，
+    # 候选不够时并发获取下一页搜索结果；达到目标后取消其余的页面。哪个先完成就先产出哪个
+    target = max_results - local_count
+    if target <= 0:
+        return
+    active: Dict[asyncio.Task, Dict[str, str]] = {}
+    serp_task: Optional[asyncio.Task] = None
+    next_page = 1
+    succeeded = 0
+    next_rank = local_count
     
-    final_results = {
-        "query": query,
-        "results": results
-    }
+    def launch_visits():
+        nonlocal next_rank
+        while candidates and len(active) < target - succeeded + speculative_visits:
+            link = candidates.popleft()
+            key = canonicalize_url(link["url"])
+            # 检查和加入 visited_urls 之间没有 await，多个查询并发时也不会重复访问
+            if key in visited_urls:
+                continue
+            if circuit_breaker and not circuit_breaker.allow(link["url"]):
+                # 该主机最近连续失败，冷却期内不再访问
+                record_failure("circuit_open")
+                continue
+            visited_urls.add(key)
+            # 还没有完成的结果中，这个链接最多能分到下一份份额
+            active[asyncio.create_task(process_link(next_rank, link, limit_for(finished)))] = link
+            next_rank += 1
     
-    # 只在调试模式下输出最终结果
-    logger.debug(json.dumps(final_results, ensure_ascii=False))
+    def maybe_fetch_next_page():
+        nonlocal serp_task, next_page
+        if serp_task is not None or next_page >= max_serp_pages:
+            return
+        # 即使进行中的页面和剩余的候选全部成功，也凑不够目标（加上推测访问的余量）时翻页
+        if len(candidates) + len(active) < target - succeeded + speculative_visits:
+            serp_task = asyncio.create_task(fetch_next_page(next_page))
+            next_page += 1
     
-    return final_results
+    launch_visits()
+    maybe_fetch_next_page()
+    try:
+        while active or serp_task:
+            pending = list(active) + ([serp_task] if serp_task else [])
+            done, _ = await asyncio.wait(pending, timeout=_remaining(deadline), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # 时间预算用尽：未完成的页面取消并标记为跳过
+                status["timed_out"] = True
+                for link in active.values():
+                    status["skipped"].append(link["url"])
+                    record_failure("time_budget")
+                logger.info(f"时间预算用尽，跳过 {len(status['skipped'])} 个页面: {query}")
+                return
+            if serp_task in done:
+                new_links = serp_task.result()
+                serp_task = None
+                if new_links:
+                    add_candidates(new_links)
+                else:
+                    # 没有更多结果，不再翻页
+                    next_page = max_serp_pages
+            # 同时完成的页面按排名确定，排名靠前的先分到较大的份额
+            for task in sorted((task for task in done if task in active), key=lambda task: task.result()[0]):
+                del active[task]
+                rank, outcome = task.result()
+                if outcome:  # 过滤掉失败和重复的链接
+                    succeeded += 1
+                    yield finish(rank, *outcome)
+                    if succeeded >= target:
+                        return
+            launch_visits()
+            maybe_fetch_next_page()
+    finally:
+        # 达到目标、时间预算用尽或调用方提前停止迭代时取消剩余的页面；没有用到的页面（被取消的，
+        # 或达到目标后才完成的推测访问）从 visited_urls 中移除，批量搜索中的其他查询仍然可以返回它们
+        for task, link in active.items():
+            task.cancel()
+            visited_urls.discard(canonicalize_url(link["url"]))
+        if serp_task:
+            serp_task.cancel()
 
-async def _search_page(page: Page, url: str) -> List[Dict[str, str]]:
+async def _search_page(page: "Page", url: str, host_scheduler: Optional[HostScheduler] = None,
+                       engine: str = "google") -> List[Dict[str, str]]:
     """导航到搜索页并提取链接"""
-    await page.goto(url, wait_until="domcontentloaded")
-    links = await get_search_page_links(page)
+    with span("serp_goto"):
+        await _goto(page, url, host_scheduler, wait_until="domcontentloaded")
+    with span("serp_links"):
+        links = await get_search_page_links(page, engine)
+    if not links:
+        # 没有结果时检查是否被验证码或同意页拦截，拦截时让该搜索引擎退避
+        reason = await detect_serp_block(page)
+        if reason:
+            if host_scheduler:
+                host_scheduler.report(url, 429)
+            raise SerpBlockedError(engine, reason)
     logger.info(f"Extracted links from {url}: {links}")
     return links
 
-async def _visit_link_with_retry(page: Page, url: str, max_retries: int = 3) -> Dict[str, str]:
-    """访问链接并提取内容，支持重试"""
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    """距离截止时间的剩余秒数，没有截止时间时返回None"""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+async def _goto(page: "Page", url: str, host_scheduler: Optional[HostScheduler] = None, **kwargs):
+    """导航到URL，把状态码报告给主机调度器，返回错误状态码（4xx/5xx）时抛出 HttpStatusError"""
+    await prepare_navigation(page, url)
+    response = await page.goto(url, **kwargs)
+    if response is None:
+        return None
+    if host_scheduler:
+        host_scheduler.report(url, response.status, parse_retry_after(response.headers.get("retry-after")))
+    if response.status >= 400:
+        raise HttpStatusError(url, response.status, parse_retry_after(response.headers.get("retry-after")))
+    return response
+
+class TimeBudgetExceededError(asyncio.TimeoutError):
+    """时间预算用尽或导航超时被时间预算收缩后超时；与主机无关，不计入熔断"""
+
+    failure_reason = "time_budget"
+
+    def __init__(self, url: str):
+        super().__init__(f"时间预算已用尽: {url}")
+        self.url = url
+
+async def _visit_link_with_retry(page: "Page", url: str, max_retries: int = 3,
+                                 ready_timeout: float = FIXED_READY_WAIT,
+                                 host_scheduler: Optional[HostScheduler] = None,
+                                 deadline: Optional[float] = None,
+                                 max_chars: Optional[int] = None,
+                                 max_html_bytes: Optional[int] = DEFAULT_MAX_HTML_BYTES,
+                                 oversize_policy: str = "truncate") -> Dict[str, str]:
+    """访问链接并提取内容，支持重试
+
+    有截止时间时，导航超时、就绪等待和重试间隔都收缩到剩余时间内，剩余时间不够时不再重试。
+    只重试暂时性的失败（限流、5xx、网络错误）；超时、4xx、验证码和页面过大直接抛出，不再等待重试。
+    """
     for attempt in range(max_retries):
+        goto_timeout = PAGE_GOTO_TIMEOUT
+        page_ready_timeout = ready_timeout
+        remaining = _remaining(deadline)
+        if remaining is not None:
+            if remaining <= 0:
+                raise TimeBudgetExceededError(url)
+            goto_timeout = min(goto_timeout, remaining)
+            page_ready_timeout = min(ready_timeout, remaining)
         try:
-            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            return await extract_content(page)
+            with span("page_goto"):
+                await _goto(page, url, host_scheduler, wait_until="domcontentloaded", timeout=goto_timeout * 1000)
+            content = await extract_content(page, ready_timeout=page_ready_timeout, max_chars=max_chars,
+                                            max_html_bytes=max_html_bytes, oversize_policy=oversize_policy)
+            if len(content.get("content", "").strip()) < BLOCK_CHECK_MAX_CHARS:
+                # 正文很短时检查是否为验证码或人机验证页，这样的页面不应作为结果返回
+                reason = await detect_serp_block(page)
+                if reason:
+                    raise PageBlockedError(url, reason)
+            return content
         except Exception as e:
-            if attempt == max_retries - 1:
-                # 最后一次尝试失败，抛出异常
+            if goto_timeout < PAGE_GOTO_TIMEOUT and classify_failure(e) == "timeout":
+                # 导航超时被时间预算收缩过，说明不了主机慢，按时间预算用尽处理
+                raise TimeBudgetExceededError(url) from e
+            retry_delay = 2.0
+            remaining = _remaining(deadline)
+            if not is_retryable(e):
+                raise
+            if attempt == max_retries - 1 or (remaining is not None and remaining <= retry_delay):
+                # 最后一次尝试失败或剩余时间不够再试一次，抛出异常
                 raise
             logger.debug(f"重试访问 {url}，尝试 {attempt+1}/{max_retries}，错误：{str(e)}")
-            await asyncio.sleep(2)  # 等待2秒再重试
+            record_retry("page_visit")
+            if isinstance(e, HttpStatusError) and host_scheduler:
+                # 被限流时按主机的退避时间等待
+                await host_scheduler.wait_for_backoff(url)
+            else:
+                await asyncio.sleep(retry_delay)  # 等待2秒再重试
 
 def get_browser_profiles(browser_name=None):
     """获取浏览器配置文件列表"""
@@ -553,13 +1255,6 @@ def get_browser_profiles(browser_name=None):
     
     return profiles
 
-# 命令行接口
-@click.group()
-def cli():
-    """本地网页搜索工具"""
-    pass
-
-
 def load_config():
     """从配置文件加载设置"""
     try:
@@ -568,87 +1263,93 @@ def load_config():
     except:
         return {}
 
-@cli.command()
-@click.option("-q", "--query", required=True, help="搜索查询")
-@click.option("-c", "--concurrency", default=5, help="并发数量")
-@click.option("--show", is_flag=True, help="显示浏览器")
-@click.option("--browser", help="选择浏览器（chrome或edge）")
-@click.option("--max-results", default=10, type=int, help="每个查询的最大结果数")
-@click.option("--exclude-domain", multiple=True, help="排除的域名")
-@click.option("--truncate", type=int, help="截断页面内容的字符数")
-@click.option("--proxy", help="使用代理")
-@click.option("--profile-path", help="浏览器配置文件路径")
-def search_cmd(query, concurrency, show, browser, max_results, exclude_domain, truncate, proxy, profile_path):
-    """执行搜索命令"""
-    # 使用 asyncio.run 运行异步函数
-    asyncio.run(_search_cmd_async(query, concurrency, show, browser, max_results, exclude_domain, truncate, proxy, profile_path))
-
-# 将原来的 search_cmd 函数移到这里，并重命名
-async def _search_cmd_async(query, concurrency, show, browser, max_results, exclude_domain, truncate, proxy, profile_path):
-    # 合并配置文件和命令行参数
-    config = load_config()
-    
-    # 命令行参数优先级高于配置文件
-    if not query and "query" in config:
-        query = config["query"]
-    
-    concurrency = concurrency or config.get("concurrency", 5)
-    show = show or config.get("show", False)
-    browser = browser or config.get("browser")
-    max_results = max_results or config.get("maxResults", 10)
-    truncate = truncate or config.get("truncate")
-    proxy = proxy or config.get("proxy")
-    
-    # 如果命令行没有指定exclude_domain，但配置文件中有
-    if not exclude_domain and "excludeDomain" in config:
-        exclude_domains = config["excludeDomain"]
-        if isinstance(exclude_domains, str):
-            exclude_domain = [exclude_domains]
-        elif isinstance(exclude_domains, list):
-            exclude_domain = exclude_domains
-    
+def create_content_cache(config: Dict[str, Any], path: Optional[str] = None, ttl: Optional[float] = None,
+                         max_entries: Optional[int] = None) -> Optional[ContentCache]:
+    """根据配置创建页面内容缓存，配置中 contentCache 为 false 时返回None"""
+    if not config.get("contentCache", True):
+        return None
     try:
-        # 启动浏览器，传入browser参数
-        browser_instance = await launch_browser(show=show, proxy=proxy, browser=browser, profile_path=profile_path)
-        
-        # 如果查询包含逗号，分割为多个查询
-        queries = [q.strip() for q in query.split(",") if q.strip()]
-        if not queries:
-            queries = [query]
-        
-        # 创建已访问URL集合
-        visited_urls = set()
-        
-        # 执行搜索
-        for q in queries:
-            results = await search(
-                browser=browser_instance,
-                query=q,
-                max_results=max_results,
-                exclude_domains=list(exclude_domain),
-                truncate=truncate,
-                visited_urls=visited_urls,
-                concurrency=concurrency
-            )
-            # 在命令行模式下打印结果
-            print(json.dumps(results, ensure_ascii=False))
-        
-        # 关闭浏览器
-        await browser_instance["close"]()
+        return ContentCache(
+            path=path or config.get("cachePath"),
+            ttl=ttl or config.get("cacheTtl", 24 * 3600),
+            max_entries=max_entries or config.get("cacheMaxEntries", 5000)
+        )
     except Exception as e:
-        logger.error(f"Error: {str(e)}")
-        sys.exit(1)
+        logger.warning(f"无法打开页面内容缓存: {str(e)}")
+        return None
 
-@cli.command()
-@click.option("--browser", help="选择浏览器（chrome或edge）")
-def list_profiles(browser):
-    """列出浏览器配置文件"""
+def create_serp_cache(config: Dict[str, Any], path: Optional[str] = None) -> Optional[SerpCache]:
+    """根据配置创建搜索结果页缓存，配置中 serpCache 为 false 时返回None"""
+    if not config.get("serpCache", True):
+        return None
     try:
-        profiles = get_browser_profiles(browser)
-        print(json.dumps(profiles, ensure_ascii=False, indent=2))
+        return SerpCache(
+            path=path or config.get("cachePath"),
+            ttl=config.get("serpCacheTtl", 600)
+        )
     except Exception as e:
-        print(f"Error: {str(e)}", file=sys.stderr)
-        sys.exit(1)
+        logger.warning(f"无法打开搜索结果页缓存: {str(e)}")
+        return None
+
+def create_circuit_breaker(config: Dict[str, Any], path: Optional[str] = None) -> Optional[HostCircuitBreaker]:
+    """根据配置创建按主机的熔断器（状态与页面内容缓存保存在同一个文件中），配置中 circuitBreaker 为 false 时返回None"""
+    if not config.get("circuitBreaker", True):
+        return None
+    try:
+        return HostCircuitBreaker(
+            path=path or config.get("cachePath"),
+            failure_threshold=config.get("circuitFailureThreshold", 3),
+            cooldown=config.get("circuitCooldown", 600),
+            max_cooldown=config.get("circuitMaxCooldown", 6 * 3600)
+        )
+    except Exception as e:
+        logger.warning(f"无法打开熔断状态: {str(e)}")
+        return None
+
+def create_page_index(config: Dict[str, Any], path: Optional[str] = None) -> Optional[PageIndex]:
+    """根据配置创建本地全文索引，配置中 pageIndex 为 false 时返回None"""
+    if not config.get("pageIndex", True):
+        return None
+    try:
+        return PageIndex(
+            path=path or config.get("indexPath"),
+            max_bytes=config.get("indexMaxBytes", DEFAULT_INDEX_MAX_BYTES),
+            tokenizer=config.get("indexTokenizer", DEFAULT_TOKENIZER)
+        )
+    except Exception as e:
+        logger.warning(f"无法打开本地索引: {str(e)}")
+        return None
+
+def page_pool_options(config: Dict[str, Any]) -> Dict[str, Any]:
+    """从配置中读取页面复用参数和网络策略，传给 launch_browser / launch_browser_pool"""
+    options = {"network_policy": NetworkPolicy.from_config(config)}
+    for key, name in [("pagePoolSize", "page_pool_size"), ("pageMaxUses", "page_max_uses"),
+                      ("pageMaxLifetime", "page_max_lifetime")]:
+        if config.get(key) is not None:
+            options[name] = config[key]
+    return options
+
+def context_recycle_options(config: Dict[str, Any]) -> Dict[str, Any]:
+    """从配置中读取浏览器上下文的回收条件（页面数和内存上限），传给 launch_browser_pool"""
+    options = {}
+    if config.get("maxPagesPerContext") is not None:
+        options["max_pages_per_context"] = config["maxPagesPerContext"]
+    if config.get("contextMaxRssMb"):
+        options["max_context_rss"] = int(config["contextMaxRssMb"] * 1024 * 1024)
+    if config.get("rssCheckInterval"):
+        options["rss_check_interval"] = config["rssCheckInterval"]
+    return options
+
+def create_host_scheduler(config: Dict[str, Any], max_per_host: Optional[int] = None,
+                          min_interval: Optional[float] = None) -> HostScheduler:
+    """根据配置创建按主机限速的调度器"""
+    return HostScheduler(
+        max_per_host=max_per_host or config.get("hostConcurrency", 2),
+        min_interval=min_interval if min_interval is not None else config.get("hostMinInterval", 0.0),
+        host_overrides=config.get("hostOverrides")
+    )
 
 if __name__ == "__main__":
-    cli() 
\ No newline at end of file
+    # 命令行接口在 cli 模块中，保留 python -m local_web_search.local_web_search 的用法
+    from .cli import cli
+    cli()
@@ -1,63 +1,381 @@
 #!/usr/bin/env python3
 
+import os
+import json
+import time
+import asyncio
 import logging
-from mcp.server.fastmcp import FastMCP
+import importlib
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from mcp.server.fastmcp import Context, FastMCP
 
 # 从当前包导入搜索函数
-from .local_web_search import search, launch_browser
+from .local_web_search import (
+    search, search_many, load_config, create_content_cache, create_serp_cache, create_page_index,
+    create_circuit_breaker, create_host_scheduler, page_pool_options, context_recycle_options, allocate_output_budget, FIXED_READY_WAIT
+)
+from .browser_pool import launch_browser_pool
+from .cache import ContentCache, SerpCache
+from .circuit import HostCircuitBreaker
+from .index import PageIndex
+from .scheduler import HostScheduler
+from .dedupe import DEFAULT_DUPLICATE_THRESHOLD
+from .extraction import DEFAULT_MAX_HTML_BYTES, configure_extraction, shutdown_extraction, warm_extraction
+from .http_fetch import configure_http_client, close_http_client
+from .memory import process_rss
+from .metrics import get_metrics, write_metrics_file
+
+# 服务器级别的浏览器池，在首次搜索时创建，服务器退出时关闭
+_browser_pool: Optional[Dict[str, Any]] = None
+_browser_pool_lock = asyncio.Lock()
+
+# 服务器配置（与命令行工具共用 local-web-search.json）和下面的共享状态都在服务器启动时创建（init_server_state），
+# 导入本模块不会读取配置或创建 SQLite 文件
+_config: Dict[str, Any] = {}
+
+# 服务器级别的页面内容缓存和搜索结果页缓存
+_content_cache: Optional[ContentCache] = None
+_serp_cache: Optional[SerpCache] = None
+
+# 已提取页面的本地全文索引
+_page_index: Optional[PageIndex] = None
+
+# 所有搜索共享的按主机限速调度器
+_host_scheduler: Optional[HostScheduler] = None
+
+# 所有搜索共享的按主机熔断器，状态在重启之间保留
+_circuit_breaker: Optional[HostCircuitBreaker] = None
+_state_initialized = False
+
+
+def init_server_state():
+    """读取配置并创建缓存、本地索引、主机调度器和熔断器，重复调用时不做任何事"""
+    global _content_cache, _serp_cache, _page_index, _host_scheduler, _circuit_breaker, _state_initialized
+    if _state_initialized:
+        return
+    _config.update(load_config())
+    _content_cache = create_content_cache(_config)
+    _serp_cache = create_serp_cache(_config)
+    _page_index = create_page_index(_config)
+    _host_scheduler = create_host_scheduler(_config)
+    _circuit_breaker = create_circuit_breaker(_config)
+    _state_initialized = True
+
+
+def _write_metrics():
+    """配置了 metricsFile 时把指标写入文件（.prom/.txt 为 Prometheus 文本格式，其余为JSON）"""
+    path = _config.get("metricsFile")
+    if not path:
+        return
+    try:
+        write_metrics_file(path)
+    except OSError as e:
+        logging.warning(f"无法写入指标文件 {path}: {str(e)}")
+
+
+async def get_browser_pool() -> Dict[str, Any]:
+    """获取（必要时创建）服务器共享的浏览器池"""
+    global _browser_pool
+    async with _browser_pool_lock:
+        if _browser_pool is None:
+            _browser_pool = await launch_browser_pool(
+                size=_config.get("poolSize", 1),
+                show=False,
+                proxy=_config.get("proxy"),
+                browser=_config.get("browser"),
+                user_data_root=_config.get("userDataDir"),
+                **context_recycle_options(_config),
+                **page_pool_options(_config)
+            )
+        return _browser_pool
+
+
+async def close_browser_pool():
+    """关闭服务器共享的浏览器池"""
+    global _browser_pool
+    async with _browser_pool_lock:
+        if _browser_pool is not None:
+            await _browser_pool["close"]()
+            _browser_pool = None
+
+
+async def prewarm():
+    """在后台启动浏览器池和提取工作进程，第一次搜索不再承担冷启动的开销"""
+    started = time.perf_counter()
+    try:
+        # 先在线程中导入 playwright，导入期间事件循环可以继续处理 MCP 握手
+        await asyncio.to_thread(importlib.import_module, "playwright.async_api")
+        browser_pool = await get_browser_pool()
+        await asyncio.gather(browser_pool["warm"](), warm_extraction())
+    except Exception as e:
+        # 预热失败不影响服务器，第一次搜索时会重新尝试启动
+        logging.warning(f"预热失败: {str(e)}")
+        return
+    logging.info(f"预热完成，耗时 {time.perf_counter() - started:.2f} 秒")
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """服务器生命周期：创建共享状态，配置正文提取执行器，按配置在后台预热，退出时关闭浏览器池和执行器"""
+    init_server_state()
+    configure_extraction(
+        mode=_config.get("extractMode", "process"),
+        workers=_config.get("extractWorkers")
+    )
+    configure_http_client(proxy=_config.get("proxy"))
+    prewarm_task = asyncio.create_task(prewarm()) if _config.get("prewarm", False) else None
+    try:
+        yield
+    finally:
+        if prewarm_task:
+            prewarm_task.cancel()
+            await asyncio.gather(prewarm_task, return_exceptions=True)
+        _write_metrics()
+        await close_browser_pool()
+        await close_http_client()
+        shutdown_extraction()
+
 
 # 初始化 FastMCP 服务器
-mcp = FastMCP("web_search")
+mcp = FastMCP("web_search", lifespan=server_lifespan)
+
+def _search_options(max_results: int, refresh: bool, fetch_mode: Optional[str], engine: Optional[str],
+                    time_budget: Optional[float], max_chars: Optional[int]) -> Dict[str, Any]:
+    """web_search 和 web_search_batch 共用的搜索参数，未指定的参数使用服务器配置"""
+    return dict(
+        max_results=max_results,
+        # truncate=3000,  # 限制内容长度
+        output_budget=max_chars or _config.get("outputBudget"),
+        content_cache=_content_cache,
+        serp_cache=_serp_cache,
+        refresh_serp=refresh,
+        ready_timeout=_config.get("readyTimeout", FIXED_READY_WAIT),
+        fetch_mode=fetch_mode or _config.get("fetchMode", "browser"),
+        host_scheduler=_host_scheduler,
+        engine=engine or _config.get("engine", "google"),
+        fallback_engines=_config.get("fallbackEngines"),
+        engine_mode=_config.get("engineMode", "single"),
+        hedge_delay=_config.get("hedgeDelay", 3.0),
+        time_budget=time_budget or _config.get("timeBudget"),
+        dedupe_threshold=_config.get("dedupeThreshold", DEFAULT_DUPLICATE_THRESHOLD),
+        page_index=_page_index,
+        local_first=_config.get("localFirst", False),
+        local_min_results=_config.get("localMinResults"),
+        local_max_age=_config.get("localMaxAge"),
+        max_html_bytes=_config.get("maxHtmlBytes", DEFAULT_MAX_HTML_BYTES),
+        oversize_policy=_config.get("oversizeHtml", "truncate"),
+        circuit_breaker=_circuit_breaker,
+        overfetch=_config.get("overfetch", 1.5),
+        max_serp_pages=_config.get("maxSerpPages", 3),
+        speculative_visits=_config.get("speculativeVisits", 1)
+    )
+
+
+def _format_results(query: str, results: Dict[str, Any], max_results: int) -> str:
+    """把一个查询的搜索结果格式化为文本"""
+    # 时间预算用尽时说明哪些页面没有完成
+    notes = ""
+    if results.get("timed_out"):
+        notes = "\n\n（时间预算已用尽，部分结果未完成）"
+        if results.get("skipped"):
+            notes += "\n未完成的URL:\n" + "\n".join(results["skipped"])
+    
+    # 说明输出预算截掉了多少内容
+    budget = results.get("budget")
+    if budget and budget["skipped_chars"]:
+        notes += (f"\n\n（输出预算 {budget['limit']} 字符，已使用 {budget['used']} 字符，"
+                  f"截掉 {budget['skipped_chars']} 字符）")
+    
+    if not results or not results.get("results"):
+        return f"搜索查询: {query}\n\n未找到搜索结果。" + notes
+    
+    # 格式化结果
+    formatted_results = []
+    for i, result in enumerate(results["results"], 1):
+        if i > max_results:
+            break
+            
+        formatted_result = f"""
+结果 {i}:
+标题: {result.get('title', '无标题')}
+URL: {result.get('url', '无URL')}
+"""
+        # 来自本地索引的结果注明抓取时间
+        if result.get("fetched_at"):
+            fetched = time.strftime("%Y-%m-%d %H:%M", time.localtime(result["fetched_at"]))
+            formatted_result += f"抓取时间: {fetched}（本地索引）\n"
+        formatted_result += f"内容: {result.get('content', '无内容')}\n"
+        formatted_results.append(formatted_result)
+    
+    return f"搜索查询: {query}\n\n" + "\n---\n".join(formatted_results) + notes
+
 
 @mcp.tool()
-async def web_search(query: str, max_results: int = 5) -> str:
+async def web_search(query: str, max_results: int = 5, refresh: bool = False,
+                     fetch_mode: Optional[str] = None, engine: Optional[str] = None,
+                     time_budget: Optional[float] = None, max_chars: Optional[int] = None,
+                     ctx: Context = None) -> str:
     """执行网络搜索并返回结果。
     
     Args:
         query: 搜索查询
         max_results（可选）: 要返回的结果数量（默认为5）
+        refresh（可选）: 是否忽略缓存的搜索结果页、重新搜索（默认为False）
+        fetch_mode（可选）: 结果页获取方式，browser、http 或 auto（默认使用服务器配置，未配置时为browser）
+        engine（可选）: 搜索引擎，google、bing 或 duckduckgo（默认使用服务器配置，未配置时为google）
+        time_budget（可选）: 时间预算（秒），用尽时返回已完成的结果（默认使用服务器配置的timeBudget）
+        max_chars（可选）: 所有结果内容的总字符数上限，排名靠前的结果分得更多（默认使用服务器配置的outputBudget）
     """
-    # 处理排除域名
-    exclude_domains_list = []
+    # 从浏览器池借用浏览器
+    browser_instance = await get_browser_pool()
     
-    # 启动浏览器
-    browser_instance = await launch_browser(show=False)
+    # 每个结果完成时发送进度通知，客户端无需等到最慢的页面
+    completed = 0
     
-    try:
-        # 执行搜索并直接获取结果
-        logging.info(f"search: {query}")
-        results = await search(
-            browser=browser_instance,
-            query=query,
-            max_results=max_results,
-            # exclude_domains=exclude_domains_list,
-            # truncate=3000,  # 限制内容长度
-            concurrency=5
-        )
-        
-        if not results or not results.get("results"):
-            return "未找到搜索结果。"
-        
-        # 格式化结果
-        formatted_results = []
-        for i, result in enumerate(results["results"], 1):
-            if i > max_results:
-                break
-                
-            formatted_result = f"""
-结果 {i}:
-标题: {result.get('title', '无标题')}
-URL: {result.get('url', '无URL')}
-内容: {result.get('content', '无内容')}
-"""
-            formatted_results.append(formatted_result)
-        
-        return f"搜索查询: {query}\n\n" + "\n---\n".join(formatted_results)
-    finally:
-        # 关闭浏览器
-        await browser_instance["close"]()
+    async def report_result(result):
+        nonlocal completed
+        completed += 1
+        if ctx:
+            await ctx.report_progress(min(completed, max_results), max_results)
+    
+    # 执行搜索并直接获取结果
+    logging.info(f"search: {query}")
+    results = await search(
+        browser=browser_instance,
+        query=query,
+        concurrency=5,
+        on_result=report_result,
+        **_search_options(max_results, refresh, fetch_mode, engine, time_budget, max_chars)
+    )
+    _write_metrics()
+    
+    return _format_results(query, results, max_results)
+
+
+@mcp.tool()
+async def web_search_batch(queries: List[str], max_results: int = 5, refresh: bool = False,
+                           fetch_mode: Optional[str] = None, engine: Optional[str] = None,
+                           time_budget: Optional[float] = None, max_chars: Optional[int] = None,
+                           ctx: Context = None) -> str:
+    """在一次调用中并发执行多个相关的网络搜索，按查询分组返回结果。
+    
+    所有查询使用同一个浏览器池；多个查询搜到的同一个页面（包括正文近似重复的页面）只返回一次。
+    
+    Args:
+        queries: 搜索查询列表（最多 maxBatchQueries 个，默认为8）
+        max_results（可选）: 每个查询要返回的结果数量（默认为5）
+        refresh（可选）: 是否忽略缓存的搜索结果页、重新搜索（默认为False）
+        fetch_mode（可选）: 结果页获取方式，browser、http 或 auto（默认使用服务器配置，未配置时为browser）
+        engine（可选）: 搜索引擎，google、bing 或 duckduckgo（默认使用服务器配置，未配置时为google）
+        time_budget（可选）: 每个查询的时间预算（秒），用尽时返回已完成的结果（默认使用服务器配置的timeBudget）
+        max_chars（可选）: 每个查询所有结果内容的总字符数上限（默认使用服务器配置的outputBudget）
+    """
+    # 去掉空查询和重复的查询，保持原有顺序
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries:
+        return "未提供搜索查询。"
+    max_queries = _config.get("maxBatchQueries", 8)
+    if len(queries) > max_queries:
+        raise ValueError(f"一次最多执行 {max_queries} 个查询，收到 {len(queries)} 个")
+    
+    browser_instance = await get_browser_pool()
+    
+    # 进度按所有查询的结果总数计算
+    total = max_results * len(queries)
+    completed = 0
+    
+    async def report_result(query, result):
+        nonlocal completed
+        completed += 1
+        if ctx:
+            await ctx.report_progress(min(completed, total), total)
+    
+    logging.info(f"batch search: {queries}")
+    all_results = await search_many(
+        browser=browser_instance,
+        queries=queries,
+        concurrency=_config.get("batchConcurrency", 10),
+        on_result=report_result,
+        **_search_options(max_results, refresh, fetch_mode, engine, time_budget, max_chars)
+    )
+    _write_metrics()
+    
+    return "\n\n===\n\n".join(
+        _format_results(query, results, max_results) for query, results in zip(queries, all_results)
+    )
+
+@mcp.tool()
+async def local_search(query: str, max_results: int = 5, max_age: Optional[float] = None,
+                       max_chars: Optional[int] = None) -> str:
+    """在本地全文索引中检索以前搜索时抓取过的页面，不访问网络，通常在几毫秒内返回。
+    
+    Args:
+        query: 搜索查询
+        max_results（可选）: 要返回的结果数量（默认为5）
+        max_age（可选）: 只返回在这么多秒内抓取的页面（默认不限）
+        max_chars（可选）: 所有结果内容的总字符数上限，排名靠前的结果分得更多（默认使用服务器配置的outputBudget）
+    """
+    if _page_index is None:
+        return "本地索引未启用（配置中 pageIndex 为 false）。"
+    hits = await asyncio.to_thread(_page_index.search, query, max_results, max_age)
+    budget = max_chars or _config.get("outputBudget")
+    if budget:
+        for hit, share in zip(hits, allocate_output_budget(budget, len(hits))):
+            hit["content"] = hit["content"][:share]
+    return _format_results(query, {"results": hits}, max_results)
+
+
+@mcp.resource("stats://cache")
+def cache_stats() -> str:
+    """页面内容缓存和搜索结果页缓存的命中/未命中统计，以及本地索引的页面数和大小"""
+    return json.dumps({
+        "content": _content_cache.stats() if _content_cache else {"enabled": False},
+        "serp": _serp_cache.stats() if _serp_cache else {"enabled": False},
+        "index": _page_index.stats() if _page_index else {"enabled": False}
+    }, ensure_ascii=False)
+
+@mcp.resource("stats://hosts")
+def host_stats() -> str:
+    """每个主机的并发数、排队深度、等待时间和限流次数"""
+    return json.dumps(_host_scheduler.stats() if _host_scheduler else {}, ensure_ascii=False)
+
+@mcp.resource("stats://circuits")
+def circuit_stats() -> str:
+    """熔断中的主机（剩余冷却时间和最近的失败原因）、正在累计失败的主机和因熔断跳过的链接数"""
+    if _circuit_breaker is None:
+        return json.dumps({"enabled": False}, ensure_ascii=False)
+    return json.dumps(_circuit_breaker.stats(), ensure_ascii=False)
+
+@mcp.resource("stats://browsers")
+def browser_stats() -> str:
+    """浏览器池中每个分片的未完成页面数、已打开页面数和重启次数"""
+    if _browser_pool is None:
+        return json.dumps({"started": False}, ensure_ascii=False)
+    return json.dumps(_browser_pool["stats"](), ensure_ascii=False)
+
+@mcp.resource("stats://memory")
+def memory_stats() -> str:
+    """服务器进程和每个浏览器进程树的常驻内存（字节），以及因内存超限回收的上下文数"""
+    if _browser_pool is None:
+        return json.dumps({"python": {"pid": os.getpid(), "rss": process_rss()}, "started": False},
+                          ensure_ascii=False)
+    return json.dumps(_browser_pool["memory"](), ensure_ascii=False)
+
+@mcp.resource("stats://metrics")
+def metrics_json() -> str:
+    """各阶段耗时直方图、重试次数和失败原因（JSON）"""
+    return json.dumps(get_metrics().to_dict(), ensure_ascii=False)
+
+@mcp.resource("stats://metrics/prometheus")
+def metrics_prometheus() -> str:
+    """各阶段耗时直方图、重试次数和失败原因（Prometheus 文本格式）"""
+    return get_metrics().to_prometheus()
 
 def main():
+    # 日志只在服务器入口配置，导入本包不会修改调用方的日志设置
+    logging.basicConfig(level=logging.INFO)
     # 初始化并运行服务器
     logging.info("初始化并运行服务器")
     mcp.run(transport='stdio')
@@ -0,0 +1,124 @@
+"""
+内存统计：本进程和浏览器进程树的常驻内存（RSS）
+
+安装了 psutil 时使用 psutil，否则在 Linux 上读取 /proc；两者都不可用时返回None。
+浏览器进程按启动参数中的 --user-data-dir 查找（每个浏览器上下文的用户数据目录都不同），
+统计时包括其所有子进程（渲染、GPU、网络等进程）。
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+_PROC = "/proc"
+
+
+def _psutil():
+    """psutil 是可选依赖，没有安装时返回None"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil
+
+
+def process_rss(pid: Optional[int] = None) -> Optional[int]:
+    """进程的常驻内存（字节），默认为当前进程"""
+    pid = pid or os.getpid()
+    psutil = _psutil()
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"{_PROC}/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _proc_table() -> Dict[int, Dict[str, Any]]:
+    """读取 /proc 中所有进程的父进程和启动参数"""
+    table = {}
+    try:
+        entries = os.listdir(_PROC)
+    except OSError:
+        return table
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"{_PROC}/{entry}/stat", encoding="utf-8") as f:
+                # 进程名可能包含空格和括号，父进程号在最后一个右括号之后的第二个字段
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"{_PROC}/{entry}/cmdline", "rb") as f:
+                cmdline = f.read().decode("utf-8", "replace").split("\0")
+        except (OSError, ValueError, IndexError):
+            continue
+        table[int(entry)] = {"ppid": ppid, "cmdline": cmdline}
+    return table
+
+
+def find_browser_pid(user_data_dir: str) -> Optional[int]:
+    """查找使用该用户数据目录的浏览器主进程（没有 --type= 参数的那个进程）"""
+    flag = f"--user-data-dir={os.path.abspath(user_data_dir)}"
+    psutil = _psutil()
+    if psutil is not None:
+        for process in psutil.process_iter(["pid", "cmdline"]):
+            cmdline = process.info.get("cmdline") or []
+            if flag in cmdline and not any(arg.startswith("--type=") for arg in cmdline):
+                return process.info["pid"]
+        return None
+    for pid, info in _proc_table().items():
+        cmdline = info["cmdline"]
+        if flag in cmdline and not any(arg.startswith("--type=") for arg in cmdline):
+            return pid
+    return None
+
+
+def process_tree_rss(pid: int) -> Optional[Dict[str, Any]]:
+    """进程及其所有子进程的常驻内存之和，进程不存在或无法统计时返回None
+
+    各进程之间共享的内存会被重复计算，结果偏大，适合用作回收的阈值和趋势。
+    """
+    psutil = _psutil()
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return {"pid": pid, "processes": len(processes), "rss": total}
+
+    table = _proc_table()
+    if pid not in table:
+        return None
+    children: Dict[int, List[int]] = {}
+    for child, info in table.items():
+        children.setdefault(info["ppid"], []).append(child)
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    rss = [process_rss(member) for member in tree]
+    if all(value is None for value in rss):
+        return None
+    return {"pid": pid, "processes": len(tree), "rss": sum(value or 0 for value in rss)}
+
+
+def browser_memory(user_data_dir: str) -> Optional[Dict[str, Any]]:
+    """使用该用户数据目录的浏览器进程树的内存，找不到浏览器进程时返回None"""
+    pid = find_browser_pid(user_data_dir)
+    if pid is None:
+        return None
+    return process_tree_rss(pid)
@@ -0,0 +1,267 @@
+"""
+搜索流水线的分阶段计时和指标
+
+span() 记录一个阶段的耗时：写入进程级别的直方图，查询期间（trace_query() 内）
+同时写入该查询的明细。asyncio 任务会继承创建时的上下文，所以在查询内创建的
+页面任务会把耗时记到同一个查询上。
+"""
+
+import json
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .engines import SerpBlockedError
+
+# 直方图的桶上界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 各阶段名称
+STAGES = [
+    "browser_launch",       # 启动浏览器上下文
+    "page_setup",           # 取得页面（复用空闲页面或新建）
+    "page_reset",           # 用完的页面回到 about:blank 以便复用
+    "serp_goto",            # 打开搜索结果页
+    "serp_links",           # 在搜索结果页中提取链接
+    "serp_total",           # 获取搜索结果（包括排队和缓存）
+    "cache_lookup",         # 查询页面内容缓存
+    "http_fetch",           # HTTP快速通道获取页面
+    "page_goto",            # 打开结果页
+    "page_ready",           # 等待页面内容稳定
+    "page_content",         # 读取页面HTML
+    "extract",              # 正文提取（包括在执行器中排队）
+    "extract_readability",  # readability 提取正文
+    "extract_cleanup",      # BeautifulSoup 删除无关元素
+    "extract_html2text",    # html2text 转换为Markdown
+    "query_total",          # 整个查询
+]
+
+
+class QueryTrace:
+    """一个查询的分阶段耗时、重试次数和失败原因"""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.retries: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.network: Dict[str, int] = {"blocked": 0, "allowed": 0}
+
+    def add(self, stage: str, seconds: float):
+        entry = self.stages.setdefault(stage, {"count": 0, "total": 0.0, "max": 0.0})
+        entry["count"] += 1
+        entry["total"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        """按阶段汇总的耗时明细（秒）"""
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return {
+            "query": self.query,
+            "total": round(end - self.started, 4),
+            "stages": {
+                stage: {
+                    "count": entry["count"],
+                    "total": round(entry["total"], 4),
+                    "avg": round(entry["total"] / entry["count"], 4),
+                    "max": round(entry["max"], 4)
+                }
+                for stage, entry in sorted(self.stages.items(), key=lambda item: -item[1]["total"])
+            },
+            "retries": dict(self.retries),
+            "failures": dict(self.failures),
+            "requests": dict(self.network)
+        }
+
+
+class MetricsRegistry:
+    """进程级别的指标：每个阶段一个直方图，另有重试和失败原因计数"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.histograms: Dict[str, Dict[str, Any]] = {}
+        self.retries: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.network: Dict[str, int] = {"blocked": 0, "allowed": 0}
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            self.histograms[stage] = histogram
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                histogram["counts"][i] += 1
+                break
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+    def reset(self):
+        self.histograms.clear()
+        self.retries.clear()
+        self.failures.clear()
+        self.network = {"blocked": 0, "allowed": 0}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON 格式：每个阶段的累计桶计数、总耗时和次数"""
+        stages = {}
+        for stage, histogram in self.histograms.items():
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets, histogram["counts"]):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets["+Inf"] = histogram["count"]
+            stages[stage] = {
+                "count": histogram["count"],
+                "sum": round(histogram["sum"], 6),
+                "avg": round(histogram["sum"] / histogram["count"], 6) if histogram["count"] else 0.0,
+                "buckets": buckets
+            }
+        return {"stages": stages, "retries": dict(self.retries), "failures": dict(self.failures),
+                "requests": dict(self.network)}
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        lines = [
+            "# HELP local_web_search_stage_seconds Duration of search pipeline stages.",
+            "# TYPE local_web_search_stage_seconds histogram"
+        ]
+        for stage, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram["counts"]):
+                cumulative += count
+                lines.append(f'local_web_search_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'local_web_search_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'local_web_search_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]:.6f}')
+            lines.append(f'local_web_search_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+
+        lines.append("# HELP local_web_search_retries_total Retried operations by stage.")
+        lines.append("# TYPE local_web_search_retries_total counter")
+        for stage, count in sorted(self.retries.items()):
+            lines.append(f'local_web_search_retries_total{{stage="{stage}"}} {count}')
+
+        lines.append("# HELP local_web_search_failures_total Failed pages by reason.")
+        lines.append("# TYPE local_web_search_failures_total counter")
+        for reason, count in sorted(self.failures.items()):
+            lines.append(f'local_web_search_failures_total{{reason="{reason}"}} {count}')
+
+        lines.append("# HELP local_web_search_subrequests_total Page subrequests by network policy outcome.")
+        lines.append("# TYPE local_web_search_subrequests_total counter")
+        for outcome, count in sorted(self.network.items()):
+            lines.append(f'local_web_search_subrequests_total{{outcome="{outcome}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+_current_trace: contextvars.ContextVar[Optional[QueryTrace]] = contextvars.ContextVar(
+    "local_web_search_trace", default=None
+)
+
+
+def get_metrics() -> MetricsRegistry:
+    """返回进程级别的指标"""
+    return _registry
+
+
+def current_trace() -> Optional[QueryTrace]:
+    """返回当前查询的明细，不在查询中时返回None"""
+    return _current_trace.get()
+
+
+def observe(stage: str, seconds: float):
+    """记录一个阶段的耗时"""
+    _registry.observe(stage, seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """计时一个阶段；阶段抛出异常时同样记录耗时"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def trace_query(query: str) -> Iterator[QueryTrace]:
+    """在当前上下文中开始记录一个查询的明细"""
+    trace = QueryTrace(query)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.finished = time.perf_counter()
+        _current_trace.reset(token)
+        _registry.observe("query_total", trace.finished - trace.started)
+
+
+def record_retry(stage: str):
+    """记录一次重试"""
+    _registry.retries[stage] = _registry.retries.get(stage, 0) + 1
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.retries[stage] = trace.retries.get(stage, 0) + 1
+
+
+def record_failure(reason: str):
+    """记录一个失败的页面及原因"""
+    _registry.failures[reason] = _registry.failures.get(reason, 0) + 1
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.failures[reason] = trace.failures.get(reason, 0) + 1
+
+
+def record_network(blocked: int, allowed: int):
+    """记录一个页面被网络策略拦截和放行的请求数"""
+    _registry.network["blocked"] += blocked
+    _registry.network["allowed"] += allowed
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.network["blocked"] += blocked
+        trace.network["allowed"] += allowed
+
+
+def classify_failure(error: BaseException) -> str:
+    """把异常归类为失败原因，异常带有 failure_reason 属性时直接使用"""
+    reason = getattr(error, "failure_reason", None)
+    if reason:
+        return reason
+    status = getattr(error, "status", None)
+    if isinstance(status, int):
+        return f"http_{status}"
+    if isinstance(error, SerpBlockedError):
+        return "blocked"
+    # playwright 的超时异常不是 asyncio.TimeoutError 的子类
+    if isinstance(error, asyncio.TimeoutError) or "Timeout" in type(error).__name__:
+        return "timeout"
+    # playwright 的网络错误（连接被重置、拒绝、DNS 失败等）
+    if "net::ERR_" in str(error):
+        return "network"
+    return type(error).__name__
+
+
+def write_metrics_file(path: str):
+    """把指标写入文件：.prom/.txt 使用 Prometheus 文本格式，其余使用JSON"""
+    if path.endswith((".prom", ".txt")):
+        content = _registry.to_prometheus()
+    else:
+        content = json.dumps(_registry.to_dict(), ensure_ascii=False, indent=2)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def stage_summary(names: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    """每个阶段的次数和平均耗时，可以只取部分阶段"""
+    stages = _registry.to_dict()["stages"]
+    if names is not None:
+        stages = {name: stages[name] for name in names if name in stages}
+    return {name: {"count": entry["count"], "avg": entry["avg"], "sum": entry["sum"]}
+            for name, entry in stages.items()}
@@ -0,0 +1,199 @@
+"""
+网络策略：按资源类型和URL模式拦截子请求，按域名允许脚本
+
+拦截完全由浏览器通过 CDP 执行，在页面创建时设置一次，放行的请求不经过 Python：
+按资源类型拦截使用 Fetch.enable 的 resourceType 模式，只有要拦截的类型会暂停，
+由会话上的事件处理直接以 BlockedByClient 结束；文档不在模式中，重定向后的目标也总是放行。
+广告统计域名等URL模式通过 Network.setBlockedURLs 交给浏览器匹配。
+xhr/fetch 等只由脚本发出的请求只在允许脚本的页面上放行。
+只有拦截规则需要变化时（导航到允许脚本的域名，或导航目标本身会被某个URL模式匹配）才在导航前更新该页面的规则。
+"""
+
+import logging
+import weakref
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+from .scheduler import get_host
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Page
+
+logger = logging.getLogger(__name__)
+
+# 默认拦截的资源类型；文档请求总是放行
+DEFAULT_BLOCKED_RESOURCE_TYPES = ["image", "media", "font", "stylesheet", "script"]
+
+# 可配置的资源类型对应的 CDP 资源类型
+RESOURCE_TYPES = {
+    "image": "Image",
+    "media": "Media",
+    "font": "Font",
+    "stylesheet": "Stylesheet",
+    "script": "Script",
+}
+
+# 其他非文档请求（主要由脚本发出），只在允许脚本的页面上放行
+SCRIPT_REQUEST_TYPES = ["XHR", "Fetch", "EventSource", "Ping", "Manifest", "TextTrack", "Prefetch", "Other"]
+
+# 常见的广告和统计域名，允许脚本的页面上也拦截
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*facebook.net*",
+    "*scorecardresearch.com*",
+    "*hotjar.com*",
+]
+
+# 被拦截的请求的失败原因
+BLOCKED_ERROR = "net::ERR_BLOCKED_BY_CLIENT"
+
+# 页面到其网络状态的映射，页面关闭后自动释放
+_page_states: "weakref.WeakKeyDictionary[Page, PageNetwork]" = weakref.WeakKeyDictionary()
+
+
+class NetworkPolicy:
+    """浏览器上下文的网络策略
+
+    block_resource_types: 拦截的资源类型（image、media、font、stylesheet、script）
+    block_url_patterns: 另外拦截的URL模式
+    allow_script_domains: 允许脚本的域名（包括子域名），这些页面上不拦截外部脚本
+    """
+
+    def __init__(self, block_resource_types: Optional[Iterable[str]] = None,
+                 block_url_patterns: Optional[Iterable[str]] = None,
+                 allow_script_domains: Optional[Iterable[str]] = None):
+        self.block_resource_types = list(DEFAULT_BLOCKED_RESOURCE_TYPES if block_resource_types is None
+                                         else block_resource_types)
+        unknown = set(self.block_resource_types) - set(RESOURCE_TYPES)
+        if unknown:
+            raise ValueError(f"不支持的资源类型: {', '.join(sorted(unknown))}，"
+                             f"可选值: {', '.join(RESOURCE_TYPES)}")
+        self.block_url_patterns = list(DEFAULT_BLOCKED_URL_PATTERNS if block_url_patterns is None
+                                       else block_url_patterns)
+        self.allow_script_domains = [domain.lower().lstrip(".") for domain in (allow_script_domains or [])]
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "NetworkPolicy":
+        """从配置中的 networkPolicy 创建"""
+        policy = config.get("networkPolicy") or {}
+        return cls(
+            block_resource_types=policy.get("blockResourceTypes"),
+            block_url_patterns=policy.get("blockUrlPatterns"),
+            allow_script_domains=policy.get("allowScriptDomains")
+        )
+
+    def scripts_allowed(self, url: str) -> bool:
+        """该URL所在的域名是否允许脚本"""
+        if "script" not in self.block_resource_types:
+            return True
+        host = get_host(url)
+        return any(host == domain or host.endswith("." + domain) for domain in self.allow_script_domains)
+
+    def blocked_resource_types(self, allow_scripts: bool) -> List[str]:
+        """传给 Fetch.enable 的 CDP 资源类型；允许脚本时放行脚本和 xhr/fetch 等请求"""
+        types = [RESOURCE_TYPES[resource_type] for resource_type in self.block_resource_types
+                 if not (resource_type == "script" and allow_scripts)]
+        if not allow_scripts:
+            types.extend(SCRIPT_REQUEST_TYPES)
+        return types
+
+    def blocked_patterns(self, navigation_url: Optional[str] = None) -> List[str]:
+        """传给 Network.setBlockedURLs 的URL模式
+
+        模式按子串匹配（* 为通配符，不要求匹配整个URL），会匹配导航目标本身的模式在这次导航中不使用，
+        保证文档请求不被拦截。
+        """
+        patterns = list(self.block_url_patterns)
+        if navigation_url:
+            patterns = [pattern for pattern in patterns if not url_matches(navigation_url, pattern)]
+        return patterns
+
+    async def attach(self, context: "BrowserContext", page: "Page") -> "PageNetwork":
+        """在新页面上设置拦截规则并开始统计请求"""
+        state = PageNetwork(self, page)
+        session = await context.new_cdp_session(page)
+        await session.send("Network.enable")
+        state.session = session
+        session.on("Fetch.requestPaused", state._on_request_paused)
+        await state.apply(allow_scripts=False)
+        _page_states[page] = state
+        return state
+
+
+def url_matches(url: str, pattern: str) -> bool:
+    """与浏览器相同的匹配方式：按 * 切分后的各段依次作为子串出现在URL中"""
+    position = 0
+    for part in pattern.split("*"):
+        position = url.find(part, position)
+        if position < 0:
+            return False
+        position += len(part)
+    return True
+
+
+class PageNetwork:
+    """一个页面的网络状态：当前的拦截规则和拦截/放行的请求数"""
+
+    def __init__(self, policy: NetworkPolicy, page: "Page"):
+        self.policy = policy
+        self.session = None
+        self.patterns: Optional[List[str]] = None
+        self.resource_types: Optional[List[str]] = None
+        self.requests = 0
+        self.blocked = 0
+        page.on("request", self._on_request)
+        page.on("requestfailed", self._on_request_failed)
+
+    def _on_request(self, request):
+        self.requests += 1
+
+    def _on_request_failed(self, request):
+        if request.failure == BLOCKED_ERROR:
+            self.blocked += 1
+
+    async def _on_request_paused(self, event: Dict[str, Any]):
+        """Fetch.enable 只暂停要拦截的资源类型，直接结束这些请求"""
+        try:
+            await self.session.send("Fetch.failRequest", {"requestId": event["requestId"],
+                                                          "errorReason": "BlockedByClient"})
+        except Exception as e:
+            # 页面已经关闭或导航走了
+            logger.debug(f"拦截请求失败: {str(e)}")
+
+    async def apply(self, allow_scripts: bool, navigation_url: Optional[str] = None):
+        """更新拦截规则，规则没有变化时不发送命令"""
+        patterns = self.policy.blocked_patterns(navigation_url)
+        if patterns != self.patterns:
+            await self.session.send("Network.setBlockedURLs", {"urls": patterns})
+            self.patterns = patterns
+        resource_types = self.policy.blocked_resource_types(allow_scripts)
+        if resource_types != self.resource_types:
+            if resource_types:
+                await self.session.send("Fetch.enable", {"patterns": [
+                    {"urlPattern": "*", "resourceType": resource_type, "requestStage": "Request"}
+                    for resource_type in resource_types
+                ]})
+            else:
+                await self.session.send("Fetch.disable")
+            self.resource_types = resource_types
+
+    def take_counts(self) -> Dict[str, int]:
+        """返回自上次调用以来拦截和放行的请求数，并清零"""
+        counts = {"blocked": self.blocked, "allowed": self.requests - self.blocked}
+        self.requests = 0
+        self.blocked = 0
+        return counts
+
+
+async def prepare_navigation(page: "Page", url: str):
+    """导航前按目标URL设置页面的拦截规则，页面没有网络策略时不做任何事"""
+    state = _page_states.get(page)
+    if state is not None:
+        await state.apply(state.policy.scripts_allowed(url), url)
+
+
+def page_network(page: "Page") -> Optional[PageNetwork]:
+    """返回页面的网络状态，没有设置网络策略时返回None"""
+    return _page_states.get(page)
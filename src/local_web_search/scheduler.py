@@ -0,0 +1,167 @@
+"""
+按主机调度请求：限制每个主机的并发数和请求间隔，被限流（429/503）时指数退避
+"""
+
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# 被视为限流的状态码
+THROTTLE_STATUSES = (429, 503)
+
+# 搜索引擎默认更保守，被限流后往往需要很久才能恢复
+DEFAULT_HOST_OVERRIDES = {
+    "www.google.com": {"max_concurrency": 2, "min_interval": 0.5},
+    "www.bing.com": {"max_concurrency": 2, "min_interval": 0.5},
+    "html.duckduckgo.com": {"max_concurrency": 2, "min_interval": 0.5},
+}
+
+
+class HttpStatusError(Exception):
+    """页面返回了限流或错误状态码"""
+
+    def __init__(self, url: str, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}: {url}")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或HTTP日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_host(url: str) -> str:
+    """返回URL的主机名，无法解析时返回空字符串"""
+    try:
+        return (urlparse(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+class HostScheduler:
+    """按主机限制并发数和最小请求间隔，并在被限流时退避
+
+    每个主机的请求在 slot() 中排队；report() 报告响应状态码，
+    429/503 会让该主机在 Retry-After（没有时按指数退避）之前暂停发出新请求。
+    """
+
+    def __init__(self, max_per_host: int = 2, min_interval: float = 0.0,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 host_overrides: Optional[Dict[str, Dict[str, float]]] = None):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.host_overrides = DEFAULT_HOST_OVERRIDES if host_overrides is None else host_overrides
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+
+    def _host_state(self, host: str) -> Dict[str, Any]:
+        state = self._hosts.get(host)
+        if state is None:
+            override = self.host_overrides.get(host, {})
+            max_concurrency = int(override.get("max_concurrency", self.max_per_host))
+            state = {
+                "semaphore": asyncio.Semaphore(max(1, max_concurrency)),
+                "lock": asyncio.Lock(),
+                "max_concurrency": max_concurrency,
+                "min_interval": override.get("min_interval", self.min_interval),
+                "next_allowed": 0.0,
+                "blocked_until": 0.0,
+                "failures": 0,
+                "active": 0,
+                "waiting": 0,
+                "requests": 0,
+                "throttled": 0,
+                "total_wait": 0.0,
+                "max_wait": 0.0
+            }
+            self._hosts[host] = state
+        return state
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """等待该主机的并发额度、请求间隔和退避时间后进入"""
+        state = self._host_state(get_host(url))
+        started = time.monotonic()
+        state["waiting"] += 1
+        try:
+            await state["semaphore"].acquire()
+            try:
+                async with state["lock"]:
+                    # 同一主机的请求依次计算等待时间，保证最小间隔
+                    now = time.monotonic()
+                    delay = max(state["next_allowed"], state["blocked_until"]) - now
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    state["next_allowed"] = time.monotonic() + state["min_interval"]
+            except BaseException:
+                state["semaphore"].release()
+                raise
+        finally:
+            state["waiting"] -= 1
+
+        waited = time.monotonic() - started
+        state["total_wait"] += waited
+        state["max_wait"] = max(state["max_wait"], waited)
+        state["requests"] += 1
+        state["active"] += 1
+        try:
+            yield
+        finally:
+            state["active"] -= 1
+            state["semaphore"].release()
+
+    def report(self, url: str, status: Optional[int], retry_after: Optional[float] = None):
+        """报告响应状态码；429/503 时让该主机进入退避"""
+        if status is None:
+            return
+        state = self._host_state(get_host(url))
+        if status in THROTTLE_STATUSES:
+            state["failures"] += 1
+            state["throttled"] += 1
+            delay = retry_after if retry_after is not None else \
+                self.backoff_base * (2 ** (state["failures"] - 1))
+            delay = min(delay, self.backoff_max)
+            state["blocked_until"] = max(state["blocked_until"], time.monotonic() + delay)
+            logger.info(f"{get_host(url)} 返回 {status}，暂停 {delay:.1f} 秒")
+        elif status < 400:
+            state["failures"] = 0
+
+    async def wait_for_backoff(self, url: str):
+        """如果该主机正在退避，等待退避结束"""
+        state = self._host_state(get_host(url))
+        delay = state["blocked_until"] - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回每个主机的队列深度和等待时间"""
+        now = time.monotonic()
+        return {
+            host: {
+                "active": state["active"],
+                "queued": state["waiting"],
+                "requests": state["requests"],
+                "throttled": state["throttled"],
+                "avg_wait": state["total_wait"] / state["requests"] if state["requests"] else 0.0,
+                "max_wait": state["max_wait"],
+                "backoff_remaining": max(0.0, state["blocked_until"] - now)
+            }
+            for host, state in self._hosts.items()
+        }
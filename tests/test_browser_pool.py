@@ -0,0 +1,160 @@
+import os
+import asyncio
+
+from local_web_search import browser_pool
+
+
+def fake_launcher(launched, instances=None):
+    """代替 launch_browser：记录启动时使用的目录，目录仍被未关闭的上下文占用时启动失败"""
+    open_dirs = set()
+
+    async def launch(user_data_dir=None, **kwargs):
+        if user_data_dir in open_dirs:
+            raise RuntimeError(f"ProcessSingleton: profile {user_data_dir} is in use")
+        open_dirs.add(user_data_dir)
+        launched.append(user_data_dir)
+        state = {"alive": True}
+
+        async def with_page(fn):
+            return await fn(None)
+
+        async def close():
+            await asyncio.sleep(0.01)
+            state["alive"] = False
+            open_dirs.discard(user_data_dir)
+
+        instance = {"with_page": with_page, "close": close, "is_alive": lambda: state["alive"],
+                    "page_stats": lambda: {}, "state": state}
+        if instances is not None:
+            instances.append(instance)
+        return instance
+
+    return launch
+
+
+def test_recycle_with_active_page_uses_another_dir(tmp_path, monkeypatch):
+    launched = []
+    monkeypatch.setattr(browser_pool, "launch_browser", fake_launcher(launched))
+
+    async def main():
+        pool = await browser_pool.launch_browser_pool(size=1, max_pages_per_context=2,
+                                                      user_data_root=str(tmp_path))
+        release = asyncio.Event()
+
+        async def hold(page):
+            await release.wait()
+
+        async def quick(page):
+            return "ok"
+
+        # 第二个页面使上下文达到上限被回收，而第一个页面仍在进行中
+        first = asyncio.create_task(pool["with_page"](hold))
+        await asyncio.sleep(0)
+        assert await pool["with_page"](quick) == "ok"
+        assert await pool["with_page"](quick) == "ok"
+        release.set()
+        await first
+        stats = pool["stats"]()
+        await pool["close"]()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["recycled"] == 1
+    assert len(launched) == 2
+    assert launched[0] == str(tmp_path / "0")
+    assert launched[1] != launched[0]
+
+
+def test_crashed_context_relaunches_while_old_one_is_closing(tmp_path, monkeypatch):
+    launched, instances = [], []
+    monkeypatch.setattr(browser_pool, "launch_browser", fake_launcher(launched, instances))
+
+    async def quick(page):
+        return "ok"
+
+    async def main():
+        pool = await browser_pool.launch_browser_pool(size=1, user_data_root=str(tmp_path))
+        assert await pool["with_page"](quick) == "ok"
+        # 上下文已经不可用，但浏览器进程还没有退出，目录上的锁仍在
+        instances[0]["state"]["alive"] = False
+        assert await pool["with_page"](quick) == "ok"
+        stats = pool["stats"]()
+        await pool["close"]()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["relaunches"] == 1
+    assert len(launched) == 2
+    assert launched[1] != launched[0]
+
+
+def test_dir_locked_by_another_process_after_pool_creation(tmp_path, monkeypatch):
+    launched = []
+    monkeypatch.setattr(browser_pool, "launch_browser", fake_launcher(launched))
+
+    async def main():
+        pool = await browser_pool.launch_browser_pool(size=2, user_data_root=str(tmp_path))
+        # 另一个服务器进程在这个浏览器池创建之后才启动了分片 1
+        (tmp_path / "1").mkdir()
+        (tmp_path / "1" / "SingletonLock").symlink_to(f"otherhost-{os.getpid()}")
+        await asyncio.gather(*[pool["with_page"](lambda page: asyncio.sleep(0.01)) for _ in range(2)])
+        await pool["close"]()
+
+    asyncio.run(main())
+    assert str(tmp_path / "0") in launched
+    assert str(tmp_path / "1") not in launched
+    assert len(launched) == 2
+
+
+def test_profile_lock_error_retries_in_temp_dir(tmp_path, monkeypatch):
+    launched = []
+    launch = fake_launcher(launched)
+
+    async def locked_once(user_data_dir=None, **kwargs):
+        if user_data_dir == str(tmp_path / "0"):
+            raise RuntimeError("Failed to create a ProcessSingleton for your profile directory")
+        return await launch(user_data_dir=user_data_dir, **kwargs)
+
+    monkeypatch.setattr(browser_pool, "launch_browser", locked_once)
+
+    async def main():
+        pool = await browser_pool.launch_browser_pool(size=1, user_data_root=str(tmp_path))
+        result = await pool["with_page"](lambda page: asyncio.sleep(0, "ok"))
+        await pool["close"]()
+        return result
+
+    assert asyncio.run(main()) == "ok"
+    assert len(launched) == 1
+    assert launched[0] != str(tmp_path / "0")
+
+
+def test_memory_recycle_with_pages_in_flight(tmp_path, monkeypatch):
+    launched = []
+    monkeypatch.setattr(browser_pool, "launch_browser", fake_launcher(launched))
+    monkeypatch.setattr(browser_pool, "browser_memory", lambda data_dir: {"rss": 2 * 2**30})
+
+    async def main():
+        pool = await browser_pool.launch_browser_pool(size=1, user_data_root=str(tmp_path),
+                                                      max_context_rss=2**30, rss_check_interval=2)
+        release = asyncio.Event()
+
+        async def hold(page):
+            await release.wait()
+            return "held"
+
+        first = asyncio.create_task(pool["with_page"](hold))
+        await asyncio.sleep(0)
+        # 第二个页面触发内存检查并回收上下文，第一个页面还没有结束
+        second = asyncio.create_task(pool["with_page"](hold))
+        await asyncio.sleep(0.01)
+        assert await pool["with_page"](lambda page: asyncio.sleep(0, "ok")) == "ok"
+        release.set()
+        assert await asyncio.gather(first, second) == ["held", "held"]
+        stats = pool["stats"]()
+        await pool["close"]()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["recycled_memory"] == 1
+    assert len(launched) == 2
+    assert launched[1] != launched[0]
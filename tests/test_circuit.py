@@ -0,0 +1,128 @@
+import pytest
+
+from local_web_search import circuit
+from local_web_search.circuit import HostCircuitBreaker, PageBlockedError, failure_kind, is_retryable
+from local_web_search.http_fetch import NotStaticPageError
+
+URL = "https://example.com/a"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit.time, "time", clock)
+    return clock
+
+
+@pytest.mark.parametrize("reason, kind", [
+    ("http_429", "throttled"),
+    ("http_503", "throttled"),
+    ("http_500", "http_5xx"),
+    ("http_403", "denied"),
+    ("http_401", "denied"),
+    ("http_404", "http_4xx"),
+    ("blocked", "captcha"),
+    ("timeout", "timeout"),
+    ("network", "network"),
+    ("empty", "empty"),
+    ("oversize", "oversize"),
+    ("http_abc", "other"),
+    ("time_budget", "other"),
+])
+def test_failure_kind(reason, kind):
+    assert failure_kind(reason) == kind
+
+
+def test_is_retryable():
+    assert is_retryable(NotStaticPageError("503", status=503))
+    assert is_retryable(NotStaticPageError("reset", failure_reason="network"))
+    assert not is_retryable(NotStaticPageError("404", status=404))
+    assert not is_retryable(NotStaticPageError("timeout", failure_reason="timeout"))
+    assert not is_retryable(PageBlockedError(URL, "captcha"))
+
+
+def test_opens_after_threshold(tmp_path, clock):
+    breaker = HostCircuitBreaker(str(tmp_path / "circuit.sqlite3"), failure_threshold=3, cooldown=100)
+    for _ in range(2):
+        breaker.record_failure(URL, "timeout")
+        assert breaker.allow(URL)
+    assert "example.com" in breaker.stats()["failing"]
+
+    breaker.record_failure("https://example.com/b", "http_503")
+    assert not breaker.allow(URL)
+    assert breaker.skipped == 1
+    assert breaker.stats()["open"]["example.com"]["reason"] == "http_503"
+    # 其他主机不受影响
+    assert breaker.allow("https://other.org/")
+
+
+def test_page_level_failures_do_not_count(tmp_path, clock):
+    breaker = HostCircuitBreaker(str(tmp_path / "circuit.sqlite3"), failure_threshold=1)
+    for reason in ("http_404", "empty", "oversize", "not_static", "time_budget"):
+        breaker.record_failure(URL, reason)
+    assert breaker.allow(URL)
+    assert breaker.stats()["failing"] == {}
+
+
+def test_half_open_probe(tmp_path, clock):
+    breaker = HostCircuitBreaker(str(tmp_path / "circuit.sqlite3"), failure_threshold=1,
+                                 cooldown=100, max_cooldown=300)
+    breaker.record_failure(URL, "timeout")
+    assert not breaker.allow(URL)
+
+    # 冷却期结束后只放行一个探测请求
+    clock.now += 101
+    assert breaker.allow(URL)
+    assert not breaker.allow(URL)
+
+    # 探测失败时以加倍的冷却期重新熔断
+    breaker.record_failure(URL, "timeout")
+    assert breaker.stats()["open"]["example.com"]["opens"] == 2
+    clock.now += 150
+    assert not breaker.allow(URL)
+    clock.now += 51
+    assert breaker.allow(URL)
+
+    # 冷却期不超过 max_cooldown
+    breaker.record_failure(URL, "timeout")
+    breaker.record_failure(URL, "timeout")
+    assert breaker.stats()["open"]["example.com"]["remaining"] == 300
+
+    breaker.record_success(URL)
+    assert breaker.allow(URL)
+    assert breaker.stats()["open"] == {}
+
+
+def test_probe_not_visited_allows_another(tmp_path, clock):
+    breaker = HostCircuitBreaker(str(tmp_path / "circuit.sqlite3"), failure_threshold=1, cooldown=100)
+    breaker.record_failure(URL, "timeout")
+    clock.now += 101
+    assert breaker.allow(URL)
+    clock.now += circuit.PROBE_TIMEOUT + 1
+    assert breaker.allow(URL)
+
+
+def test_state_persists(tmp_path, clock):
+    path = str(tmp_path / "circuit.sqlite3")
+    breaker = HostCircuitBreaker(path, failure_threshold=2, cooldown=100)
+    breaker.record_failure(URL, "network")
+    breaker.record_failure(URL, "network")
+
+    reopened = HostCircuitBreaker(path, failure_threshold=2, cooldown=100)
+    assert not reopened.allow(URL)
+    reopened.record_success(URL)
+    assert HostCircuitBreaker(path, failure_threshold=2).allow(URL)
+
+    # 很久没有更新的状态在启动时删除
+    breaker.record_failure("https://stale.org/", "timeout")
+    breaker.record_failure("https://stale.org/", "timeout")
+    clock.now += circuit.STALE_AFTER + 1
+    assert HostCircuitBreaker(path, failure_threshold=2).allow("https://stale.org/")
@@ -0,0 +1,43 @@
+import pytest
+
+from local_web_search.dedupe import find_near_duplicate, hamming_distance, simhash
+from local_web_search.local_web_search import canonicalize_url
+
+ARTICLE = " ".join(f"word{i % 37} token{i % 11} item{i}" for i in range(400))
+
+
+@pytest.mark.parametrize("url", [
+    "https://example.com/article",
+    "http://example.com/article",
+    "https://www.example.com/article/",
+    "https://EXAMPLE.com:443/article#section",
+    "https://example.com/article?utm_source=x&utm_medium=y",
+    "https://example.com/article?gclid=abc&fbclid=def",
+])
+def test_canonicalize_same_page(url):
+    assert canonicalize_url(url) == "https://example.com/article"
+
+
+def test_canonicalize_keeps_meaningful_parts():
+    assert canonicalize_url("https://example.com/a?b=2&a=1") == canonicalize_url("https://example.com/a?a=1&b=2")
+    assert canonicalize_url("https://example.com/a?id=1") != canonicalize_url("https://example.com/a?id=2")
+    assert canonicalize_url("https://example.com:8080/a") != canonicalize_url("https://example.com/a")
+    assert canonicalize_url("https://example.com/A") != canonicalize_url("https://example.com/a")
+    assert canonicalize_url("https://example.com") == canonicalize_url("https://example.com/")
+    assert canonicalize_url("https://[invalid/") == "https://[invalid/"
+
+
+def test_simhash_near_duplicate():
+    fingerprint = simhash(ARTICLE)
+    # 转载时改动了少量文字
+    reposted = simhash(ARTICLE.replace("item50 ", "item50x ") + " via example.com")
+    other = simhash(" ".join(f"other{i % 13} text{i}" for i in range(120)))
+
+    assert fingerprint == simhash(ARTICLE.upper())
+    assert hamming_distance(fingerprint, reposted) <= 3
+    assert find_near_duplicate(reposted, [other, fingerprint]) == fingerprint
+    assert find_near_duplicate(other, [fingerprint]) is None
+
+
+def test_simhash_short_text():
+    assert simhash("too short to fingerprint") is None
@@ -0,0 +1,49 @@
+from local_web_search.index import PageIndex, build_match_query
+
+
+def test_build_match_query():
+    assert build_match_query("python asyncio") == '"python" "asyncio"'
+    assert build_match_query("python asyncio", match_all=False) == '"python" OR "asyncio"'
+    # FTS5 运算符和标点不会被当作查询语法
+    assert build_match_query("cats AND dogs NOT birds") == '"cats" "dogs" "birds"'
+    assert build_match_query('c++ "quoted" title:x*') == '"c" "quoted" "title" "x"'
+    assert build_match_query("and or") == '"and" "or"'
+    assert build_match_query("AND OR") is None
+    assert build_match_query(" ?! ") is None
+
+
+def test_search_and_complete(tmp_path):
+    index = PageIndex(str(tmp_path / "index.sqlite3"))
+    index.add("example.com/a", "https://example.com/a", "Asyncio guide", "event loop and tasks")
+    index.add("example.com/b", "https://example.com/b", "Cooking", "pasta and tomatoes")
+
+    results = index.search("asyncio tasks")
+    assert [result["url"] for result in results] == ["https://example.com/a"]
+    assert results[0]["complete"]
+    assert index.search("asyncio pasta") == []
+    assert len(index.search("asyncio pasta", match_all=False)) == 2
+    assert index.search("NOT") == []
+
+    # 只有开头的正文不覆盖完整的正文，完整的正文可以覆盖只有开头的正文
+    index.add("example.com/a", "https://example.com/a", "Asyncio guide", "event", complete=False)
+    assert index.search("tasks")[0]["complete"]
+    index.add("example.com/c", "https://example.com/c", "Partial", "partial text", complete=False)
+    assert not index.search("partial")[0]["complete"]
+    index.add("example.com/c", "https://example.com/c", "Partial", "partial text in full")
+    assert index.search("partial")[0]["complete"]
+    assert index.stats()["entries"] == 3
+
+
+def test_prune_oldest(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = PageIndex(path, max_bytes=250)
+    for i in range(5):
+        index.add(f"example.com/{i}", f"https://example.com/{i}", f"page {i}", "word " * 20, fetched_at=1000 + i)
+
+    stats = index.stats()
+    assert stats["bytes"] <= 250
+    assert stats["entries"] == 2
+    assert sorted(result["url"] for result in index.search("page", limit=5)) == [
+        "https://example.com/3", "https://example.com/4"]
+    # 重新打开时从数据库恢复正文总字节数
+    assert PageIndex(path, max_bytes=250)._bytes == stats["bytes"]
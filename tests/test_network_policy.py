@@ -0,0 +1,55 @@
+import pytest
+
+from local_web_search.network_policy import SCRIPT_REQUEST_TYPES, NetworkPolicy, url_matches
+
+
+@pytest.mark.parametrize("url, pattern, matched", [
+    ("https://ad.doubleclick.net/x.js", "*doubleclick.net*", True),
+    ("https://example.com/", "*doubleclick.net*", False),
+    ("https://example.com/a/b.js", "*example.com*.js", True),
+    ("https://example.com/a.js/b", "*example.com*.js", True),
+    ("https://example.com/a.css", "*example.com*.js", False),
+    # 各段按顺序出现
+    ("https://cdn.org/example.com", "*example.com*cdn*", False),
+    # 不要求匹配整个URL
+    ("https://tracker.io/pixel?id=1", "tracker.io/pixel", True),
+    ("https://example.com/", "*", True),
+])
+def test_url_matches(url, pattern, matched):
+    assert url_matches(url, pattern) is matched
+
+
+def test_blocked_patterns_keep_navigation_target():
+    policy = NetworkPolicy(block_url_patterns=["*googletagmanager.com*", "*example.com/ads*"])
+    assert policy.blocked_patterns() == ["*googletagmanager.com*", "*example.com/ads*"]
+    assert policy.blocked_patterns("https://example.com/article") == policy.blocked_patterns()
+    # 导航目标本身会被匹配的模式在这次导航中不使用
+    assert policy.blocked_patterns("https://example.com/ads/landing") == ["*googletagmanager.com*"]
+
+
+def test_blocked_resource_types():
+    policy = NetworkPolicy(block_resource_types=["image", "script"])
+    assert policy.blocked_resource_types(allow_scripts=False) == ["Image", "Script"] + SCRIPT_REQUEST_TYPES
+    assert policy.blocked_resource_types(allow_scripts=True) == ["Image"]
+    assert "Document" not in NetworkPolicy().blocked_resource_types(allow_scripts=False)
+
+
+def test_scripts_allowed():
+    policy = NetworkPolicy(allow_script_domains=[".Example.com"])
+    assert policy.scripts_allowed("https://example.com/")
+    assert policy.scripts_allowed("https://docs.example.com/")
+    assert not policy.scripts_allowed("https://notexample.com/")
+    assert NetworkPolicy(block_resource_types=["image"]).scripts_allowed("https://other.org/")
+
+
+def test_unknown_resource_type():
+    with pytest.raises(ValueError):
+        NetworkPolicy(block_resource_types=["image", "video"])
+
+
+def test_from_config():
+    policy = NetworkPolicy.from_config({"networkPolicy": {"blockResourceTypes": ["font"],
+                                                          "allowScriptDomains": ["example.com"]}})
+    assert policy.block_resource_types == ["font"]
+    assert policy.allow_script_domains == ["example.com"]
+    assert NetworkPolicy.from_config({}).blocked_patterns() == NetworkPolicy().blocked_patterns()
@@ -0,0 +1,22 @@
+import pytest
+
+from local_web_search.local_web_search import MIN_RESULT_CHARS, allocate_output_budget
+
+
+@pytest.mark.parametrize("budget, count", [(12000, 5), (2000, 10), (500, 8), (100, 3), (7, 3)])
+def test_allocate_output_budget(budget, count):
+    shares = allocate_output_budget(budget, count)
+    assert len(shares) == count
+    assert sum(shares) <= budget
+    # 排名靠前的结果分到的不少于靠后的
+    assert shares == sorted(shares, reverse=True)
+    # 保底最多占预算的一半
+    assert min(shares) >= min(MIN_RESULT_CHARS, budget // (2 * count))
+
+
+def test_allocate_output_budget_ranks():
+    shares = allocate_output_budget(10000, 4)
+    assert shares[0] > shares[1] > shares[2] > shares[3] >= MIN_RESULT_CHARS
+    assert sum(shares) >= 10000 - 4
+    assert allocate_output_budget(1000, 1) == [1000]
+    assert allocate_output_budget(1000, 0) == []
@@ -0,0 +1,53 @@
+import asyncio
+
+from local_web_search.cache import SerpCache
+
+LINKS = [{"title": "a", "url": "https://example.com/a"}]
+
+
+def test_leader_cancelled_follower_still_gets_links(tmp_path):
+    cache = SerpCache(path=str(tmp_path / "cache.sqlite3"))
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return LINKS
+
+    async def main():
+        leader = asyncio.create_task(cache.get_or_fetch("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_fetch("key", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == LINKS
+        assert leader.cancelled()
+
+    asyncio.run(main())
+    assert len(calls) == 1
+    assert cache.shared == 1
+    assert cache.get("key") == LINKS
+
+
+def test_fetch_cancelled_when_all_waiters_leave(tmp_path):
+    cache = SerpCache(path=str(tmp_path / "cache.sqlite3"))
+    started = []
+
+    async def fetch():
+        started.append(1)
+        await asyncio.sleep(10)
+        return LINKS
+
+    async def quick_fetch():
+        return LINKS
+
+    async def main():
+        waiter = asyncio.create_task(cache.get_or_fetch("key", fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert not cache._inflight
+        # 之后到达的相同请求重新发起，而不是拿到被取消的结果
+        assert await cache.get_or_fetch("key", quick_fetch) == LINKS
+
+    asyncio.run(main())